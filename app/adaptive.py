@@ -0,0 +1,92 @@
+import time
+from typing import Any, Dict
+
+
+def _clamp(v: float, lo: float, hi: float) -> float:
+    return lo if v < lo else hi if v > hi else v
+
+
+class BatchTuner:
+    """
+    Picks batch size and linger time for the Batcher from what it observes:
+      - arrival rate (EWMA of enqueued events/sec)
+      - flush latency (EWMA of insert_batch seconds)
+      - queue depth
+
+    Rules, applied every tick:
+      - size ~ events that arrive in `target_linger` seconds, so low traffic
+        gets small, quick batches and high traffic gets big ones
+      - queue backlog (more than one batch per worker waiting) doubles the
+        size and drops linger to the minimum: we're behind, amortize harder
+      - slow flushes without a backlog shrink the size
+      - linger ~ time to fill one batch at the current rate
+    Everything stays within the configured min/max bounds.
+    """
+
+    def __init__(
+        self,
+        size_min: int,
+        size_max: int,
+        linger_min: float,
+        linger_max: float,
+        target_linger: float,
+        max_flush_sec: float,
+        workers: int,
+        alpha: float = 0.3,
+    ):
+        self.size_min = size_min
+        self.size_max = max(size_min, size_max)
+        self.linger_min = linger_min
+        self.linger_max = max(linger_min, linger_max)
+        self.target_linger = target_linger
+        self.max_flush_sec = max_flush_sec
+        self.workers = workers
+        self.alpha = alpha
+
+        self.batch_size = int(_clamp(size_min * 2, self.size_min, self.size_max))
+        self.linger_sec = self.linger_min
+
+        self.rate = 0.0
+        self.flush_sec = 0.0
+        self._last_t = time.monotonic()
+        self._last_enqueued = 0
+
+    def observe_flush(self, seconds: float) -> None:
+        if self.flush_sec == 0.0:
+            self.flush_sec = seconds
+        else:
+            self.flush_sec += self.alpha * (seconds - self.flush_sec)
+
+    def tune(self, enqueued_total: int, qsize: int) -> None:
+        now = time.monotonic()
+        dt = now - self._last_t
+        if dt <= 0:
+            return
+        inst = (enqueued_total - self._last_enqueued) / dt
+        self._last_t = now
+        self._last_enqueued = enqueued_total
+        self.rate += self.alpha * (inst - self.rate)
+
+        target = self.rate * self.target_linger
+        backlog = qsize > self.batch_size * self.workers
+        if backlog:
+            target = max(target, self.batch_size * 2)
+        elif self.max_flush_sec > 0 and self.flush_sec > self.max_flush_sec:
+            target = min(target, self.batch_size * 0.75)
+
+        # smooth so one noisy tick doesn't swing the size
+        size = 0.5 * self.batch_size + 0.5 * target
+        self.batch_size = int(_clamp(size, self.size_min, self.size_max))
+
+        if backlog or self.rate <= 0:
+            self.linger_sec = self.linger_min
+        else:
+            self.linger_sec = _clamp(self.batch_size / self.rate, self.linger_min, self.linger_max)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batch_size": self.batch_size,
+            "linger_sec": round(self.linger_sec, 4),
+            "arrival_rate": round(self.rate, 1),
+            "flush_sec_ewma": round(self.flush_sec, 4),
+        }
@@ -0,0 +1,160 @@
+import argparse
+import asyncio
+import hashlib
+import secrets
+from typing import Any, Dict, Optional
+
+import app.db as db
+from .settings import API_KEYS_ENABLED, API_KEYS_REFRESH_SEC, INGEST_TOKEN
+
+ANY_TENANT = "*"
+
+# resolved raw keys kept in memory; cleared on refresh or when it grows past this
+_RESOLVED_MAX = 100_000
+
+
+def hash_key(key: str) -> bytes:
+    # keys are 32 random bytes, so a fast hash is enough (nothing to brute-force)
+    return hashlib.sha256(key.encode("utf-8")).digest()
+
+
+def new_key() -> tuple:
+    """(key_id, full key); only the hash of the full key is stored."""
+    key_id = secrets.token_hex(4)
+    return key_id, f"lis_{key_id}_{secrets.token_urlsafe(32)}"
+
+
+class ApiKeyStore:
+    """
+    In-memory view of the api_keys table: sha256 -> tenant binding.
+
+    A background task reloads all active keys every refresh_sec, so auth
+    never waits on the DB. Valid keys seen before are resolved by a single
+    dict lookup on the raw header value; anything else costs one sha256.
+    New or revoked keys take effect within one refresh. INGEST_TOKEN, if
+    set, stays valid for every tenant. Enabled with API_KEYS_ENABLED.
+    """
+
+    def __init__(self, enabled: bool = API_KEYS_ENABLED, refresh_sec: float = API_KEYS_REFRESH_SEC):
+        self.enabled = enabled
+        self.refresh_sec = refresh_sec
+        self._by_hash: Dict[bytes, str] = {}
+        self._resolved: Dict[str, str] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.loaded = False
+        self.refreshes = 0
+        self.refresh_errors = 0
+
+    @property
+    def open(self) -> bool:
+        """No credentials configured at all: auth is off (local dev)."""
+        return not INGEST_TOKEN and not self.enabled
+
+    def resolve(self, key: str) -> Optional[str]:
+        """Tenant the key may write (ANY_TENANT for all), or None if invalid."""
+        scope = self._resolved.get(key)
+        if scope is not None:
+            return scope
+        if INGEST_TOKEN and secrets.compare_digest(key, INGEST_TOKEN):
+            scope = ANY_TENANT
+        else:
+            scope = self._by_hash.get(hash_key(key))
+        # only valid keys are cached: random bearer tokens must not evict them
+        if scope is not None:
+            if len(self._resolved) >= _RESOLVED_MAX:
+                self._resolved.clear()
+            self._resolved[key] = scope
+        return scope
+
+    async def refresh(self) -> None:
+        async with db.acquire() as conn:
+            rows = await conn.fetch("SELECT key_hash, tenant_id FROM api_keys WHERE revoked_at IS NULL")
+        self._by_hash = {bytes(r["key_hash"]): r["tenant_id"] for r in rows}
+        # drop cached results so revocations apply now
+        self._resolved = {}
+        self.loaded = True
+        self.refreshes += 1
+
+    async def start(self) -> None:
+        if not self.enabled:
+            return
+        try:
+            await self.refresh()
+        except Exception:
+            # e.g. migration not applied yet: INGEST_TOKEN still works
+            self.refresh_errors += 1
+        self._task = asyncio.create_task(self._run(), name="api-key-refresh")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_sec)
+            try:
+                await self.refresh()
+            except Exception:
+                # keep serving the last good snapshot
+                self.refresh_errors += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "loaded": self.loaded,
+            "keys": len(self._by_hash),
+            "resolved_cache": len(self._resolved),
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+        }
+
+
+store = ApiKeyStore()
+
+
+# ---- CLI: python -m app.apikeys create|revoke|list ----
+
+async def _cli(args: argparse.Namespace) -> None:
+    await db.connect()
+    try:
+        async with db.acquire() as conn:
+            if args.cmd == "create":
+                key_id, key = new_key()
+                await conn.execute(
+                    "INSERT INTO api_keys (key_id, key_hash, tenant_id, label) VALUES ($1, $2, $3, $4)",
+                    key_id, hash_key(key), args.tenant, args.label,
+                )
+                print(key)
+            elif args.cmd == "revoke":
+                status = await conn.execute(
+                    "UPDATE api_keys SET revoked_at = now() WHERE key_id = $1 AND revoked_at IS NULL", args.key_id
+                )
+                print(status)
+            else:
+                for r in await conn.fetch(
+                    "SELECT key_id, tenant_id, label, created_at, revoked_at FROM api_keys ORDER BY created_at"
+                ):
+                    print(dict(r))
+    finally:
+        await db.disconnect()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(prog="python -m app.apikeys")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    c = sub.add_parser("create", help="create a key and print it (shown once)")
+    c.add_argument("--tenant", required=True, help=f"tenantId the key may write, or '{ANY_TENANT}'")
+    c.add_argument("--label")
+    r = sub.add_parser("revoke")
+    r.add_argument("key_id")
+    sub.add_parser("list")
+    asyncio.run(_cli(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,511 @@
+"""
+Cold storage for expired log events (ARCHIVE_ENABLED).
+
+Before retention (app/partitions.py) drops a partition or deletes a
+tenant's expired rows, Archiver streams them out with a server-side cursor
+and writes zstd-compressed Parquet files, one tenant per file, sorted by
+occurred_at. Every file is read back from the store and checked (row count,
+time range, sha256) before it goes into the log_archives catalog, and rows
+are only removed once all of their files checked out.
+
+read_archive() serves GET /v1/archive/logs from the catalog: it opens only
+the files overlapping the requested range, each once the merge reaches it,
+and skips row groups by their occurred_at statistics, so whole files are
+never loaded.
+"""
+import asyncio
+import hashlib
+from abc import ABC, abstractmethod
+import heapq
+import json
+import os
+import shutil
+import tempfile
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import SplitResult, quote, urlsplit
+
+import app.db as db
+from . import repo
+from .settings import (
+    ARCHIVE_COMPRESSION,
+    ARCHIVE_FETCH_ROWS,
+    ARCHIVE_FILE_MAX_ROWS,
+    ARCHIVE_ROW_GROUP_ROWS,
+    ARCHIVE_URL,
+)
+
+try:  # optional: only needed with ARCHIVE_ENABLED
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = pc = pq = None
+
+
+# ---- Stores ----
+
+class ArchiveStore(ABC):
+    """Where archive files live. Keys are relative, '/'-separated paths."""
+
+    @abstractmethod
+    def put(self, local_path: str, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def open(self, key: str) -> BinaryIO:
+        """A seekable binary file; Parquet readers only fetch what they need."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+
+class LocalStore(ArchiveStore):
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def put(self, local_path: str, key: str) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # readers never see a half-written file
+        shutil.copyfile(local_path, path + ".part")
+        os.replace(path + ".part", path)
+
+    def open(self, key: str) -> BinaryIO:
+        return open(self._path(key), "rb")
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+# URL scheme -> store factory; register object stores here (e.g. STORES["s3"] = ...)
+STORES: Dict[str, Callable[[SplitResult], ArchiveStore]] = {
+    "file": lambda u: LocalStore(u.netloc + u.path),
+}
+
+
+def make_store(url: str = ARCHIVE_URL) -> ArchiveStore:
+    u = urlsplit(url)
+    factory = STORES.get(u.scheme or "file")
+    if factory is None:
+        raise ValueError(f"unsupported archive store: {url!r}")
+    return factory(u)
+
+
+# ---- File format ----
+
+# (column, SELECT expression); compact rows are rendered back to plain text
+_FIELDS = (
+    ("id", "id::text"),
+    ("occurred_at", "occurred_at"),
+    ("received_at", "received_at"),
+    ("tenant_id", "tenant_id"),
+    ("source", "source"),
+    ("environment", "environment"),
+    ("level", "level"),
+    ("type", "type"),
+    ("message", repo._MESSAGE_SQL),
+    ("trace_id", "trace_id"),
+    ("span_id", "span_id"),
+    ("correlation_id", "correlation_id"),
+    ("request_id", "request_id"),
+    ("user_id", "user_id"),
+    ("path", "path"),
+    ("method", "method"),
+    ("status_code", "status_code"),
+    ("duration_ms", "duration_ms"),
+    ("exception", f"({repo._EXCEPTION_SQL})::text"),
+    ("properties", "properties::text"),
+    ("sample_rate", "sample_rate"),
+)
+_I_TENANT = 3
+_I_OCCURRED = 1
+
+# API field names, for rows read back out of the archive
+_API_NAMES = {
+    "id": "id", "occurred_at": "occurredAt", "received_at": "receivedAt",
+    "tenant_id": "tenantId", "source": "source", "environment": "environment",
+    "level": "level", "type": "type", "message": "message",
+    "trace_id": "traceId", "span_id": "spanId", "correlation_id": "correlationId",
+    "request_id": "requestId", "user_id": "userId", "path": "path", "method": "method",
+    "status_code": "statusCode", "duration_ms": "durationMs",
+    "exception": "exception", "properties": "properties", "sample_rate": "sampleRate",
+}
+
+
+def _schema():
+    ts = pa.timestamp("us", tz="UTC")
+    types = {
+        "occurred_at": ts, "received_at": ts,
+        "status_code": pa.int32(), "duration_ms": pa.int32(), "sample_rate": pa.float32(),
+    }
+    return pa.schema([
+        pa.field(name, types.get(name, pa.string()), nullable=name not in ("id", "occurred_at"))
+        for name, _ in _FIELDS
+    ])
+
+
+@dataclass
+class ArchiveFile:
+    key: str
+    tenant_id: str
+    min_ts: datetime
+    max_ts: datetime
+    rows: int
+    bytes: int = 0
+    sha256: str = ""
+
+
+def _sha256(f: BinaryIO) -> str:
+    h = hashlib.sha256()
+    for chunk in iter(lambda: f.read(1 << 20), b""):
+        h.update(chunk)
+    return h.hexdigest()
+
+
+def _time_range(md) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """occurred_at min/max over all row groups, from the footer statistics."""
+    lo = hi = None
+    for i in range(md.num_row_groups):
+        st = md.row_group(i).column(_I_OCCURRED).statistics
+        if st is None or not st.has_min_max:
+            return None, None
+        lo = st.min if lo is None else min(lo, st.min)
+        hi = st.max if hi is None else max(hi, st.max)
+    return lo, hi
+
+
+class _Writer:
+    """One Parquet file being written to a local temp file (blocking calls)."""
+
+    def __init__(self, schema, key: str, tenant_id: str):
+        fd, self.path = tempfile.mkstemp(suffix=".parquet")
+        os.close(fd)
+        self.writer = pq.ParquetWriter(self.path, schema, compression=ARCHIVE_COMPRESSION)
+        self.schema = schema
+        self.info = ArchiveFile(key, tenant_id, None, None, 0)
+
+    def write(self, records: List[Any]) -> None:
+        # one call = one row group
+        cols = {name: [r[i] for r in records] for i, (name, _) in enumerate(_FIELDS)}
+        self.writer.write_table(pa.table(cols, schema=self.schema), row_group_size=len(records))
+        info = self.info
+        first, last = records[0][_I_OCCURRED], records[-1][_I_OCCURRED]
+        info.min_ts = first if info.min_ts is None else min(info.min_ts, first)
+        info.max_ts = last if info.max_ts is None else max(info.max_ts, last)
+        info.rows += len(records)
+
+    def finish(self, store: ArchiveStore) -> ArchiveFile:
+        """Closes, uploads and verifies the stored copy."""
+        self.writer.close()
+        info = self.info
+        try:
+            with open(self.path, "rb") as f:
+                info.sha256 = _sha256(f)
+            info.bytes = os.path.getsize(self.path)
+            store.put(self.path, info.key)
+        finally:
+            os.remove(self.path)
+        try:
+            verify(store, info)
+        except Exception:
+            store.delete(info.key)
+            raise
+        return info
+
+    def abort(self) -> None:
+        try:
+            self.writer.close()
+        finally:
+            os.remove(self.path)
+
+
+def verify(store: ArchiveStore, info: ArchiveFile) -> None:
+    """Raises RuntimeError unless the stored file matches what was written."""
+    with store.open(info.key) as f:
+        if _sha256(f) != info.sha256:
+            raise RuntimeError(f"archive {info.key}: checksum mismatch")
+        f.seek(0)
+        md = pq.read_metadata(f)
+    if md.num_rows != info.rows:
+        raise RuntimeError(f"archive {info.key}: {md.num_rows} rows, expected {info.rows}")
+    if _time_range(md) != (info.min_ts, info.max_ts):
+        raise RuntimeError(f"archive {info.key}: time range does not match")
+
+
+# ---- Writing ----
+
+_CATALOG_SQL = """
+INSERT INTO log_archives (key, tenant_id, min_ts, max_ts, row_count, bytes, sha256, source_rel)
+VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+"""
+
+
+class Archiver:
+    """
+    Exports rows to the archive store; used by PartitionManager.expire.
+
+    Whole partitions are detached first (no new rows can land in them),
+    archived, then dropped. Row-level retention (short tenant windows,
+    default-partition stragglers) archives and deletes in one REPEATABLE
+    READ transaction: the DELETE removes exactly the rows the cursor saw,
+    and a failure rolls back both the catalog rows and the delete.
+
+    Runs are serialized by PartitionManager's advisory lock; keys also carry
+    a per-export id, so two exports can never overwrite each other's files.
+    """
+
+    def __init__(self, store: Optional[ArchiveStore] = None):
+        if pa is None:
+            raise RuntimeError("ARCHIVE_ENABLED needs pyarrow installed")
+        self.store = store or make_store()
+        self.schema = _schema()
+
+        self.files = 0
+        self.rows = 0
+        self.bytes = 0
+        self.last_file: Optional[str] = None
+
+    async def pending(self, conn) -> List[str]:
+        """Partitions detached by an earlier run that did not finish."""
+        await conn.execute("DELETE FROM log_archive_jobs WHERE to_regclass(quote_ident(rel)) IS NULL")
+        return [r["rel"] for r in await conn.fetch("SELECT rel FROM log_archive_jobs ORDER BY rel")]
+
+    async def detach(self, conn, parent: str, rel: str) -> None:
+        async with conn.transaction():
+            await conn.execute("INSERT INTO log_archive_jobs (rel) VALUES ($1) ON CONFLICT DO NOTHING", rel)
+            await conn.execute(f'ALTER TABLE {parent} DETACH PARTITION "{rel}"')
+
+    async def finish(self, conn, rel: str) -> None:
+        await conn.execute("DELETE FROM log_archive_jobs WHERE rel = $1", rel)
+
+    async def archive_table(self, conn, rel: str) -> int:
+        """Archives a whole detached partition; returns the row count."""
+        async with conn.transaction():
+            # leftovers of an attempt that failed after writing its catalog rows
+            for r in await conn.fetch("DELETE FROM log_archives WHERE source_rel = $1 RETURNING key", rel):
+                await asyncio.to_thread(self.store.delete, r["key"])
+            files = await self._export(conn, f'"{rel}"', "TRUE", (), rel)
+            n = sum(f.rows for f in files)
+            expected = await conn.fetchval(f'SELECT count(*) FROM "{rel}"')
+            if n != expected:
+                await self._discard(files)
+                raise RuntimeError(f"archived {n} rows of {rel}, table has {expected}")
+            await self._record(conn, files, rel)
+        return n
+
+    async def archive_and_delete(self, conn, table: str, where: str, *args: Any, source: str) -> int:
+        """Archives, then deletes, the rows of table matching where."""
+        async with conn.transaction(isolation="repeatable_read"):
+            files = await self._export(conn, table, where, args, source)
+            n = sum(f.rows for f in files)
+            if n == 0:
+                return 0
+            await self._record(conn, files, source)
+            status = await conn.execute(f"DELETE FROM {table} WHERE {where}", *args)
+            deleted = int(status.rsplit(" ", 1)[-1])
+            if deleted != n:
+                await self._discard(files)
+                raise RuntimeError(f"archived {n} rows from {table}, delete matched {deleted}")
+        return n
+
+    async def _record(self, conn, files: List[ArchiveFile], source: str) -> None:
+        await conn.executemany(_CATALOG_SQL, [
+            (f.key, f.tenant_id, f.min_ts, f.max_ts, f.rows, f.bytes, f.sha256, source) for f in files
+        ])
+        self.files += len(files)
+        self.rows += sum(f.rows for f in files)
+        self.bytes += sum(f.bytes for f in files)
+        if files:
+            self.last_file = files[-1].key
+
+    async def _discard(self, files: List[ArchiveFile]) -> None:
+        for f in files:
+            await asyncio.to_thread(self.store.delete, f.key)
+
+    async def _export(self, conn, table: str, where: str, args: Tuple, source: str) -> List[ArchiveFile]:
+        """
+        Streams the matching rows (caller holds a transaction) into one file
+        per tenant, rolled over every ARCHIVE_FILE_MAX_ROWS. Returns the
+        uploaded and verified files; on error, removes what it uploaded.
+        """
+        # tenant DESC + occurred_at ASC = backward scan of the (tenant_id, occurred_at DESC) index
+        sql = (
+            f"SELECT {', '.join(expr for _, expr in _FIELDS)} FROM {table} WHERE {where} "
+            f"ORDER BY tenant_id DESC, occurred_at, id"
+        )
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:8]
+        files: List[ArchiveFile] = []
+        writer: Optional[_Writer] = None
+        buf: List[Any] = []
+
+        async def flush() -> None:
+            if buf:
+                await asyncio.to_thread(writer.write, list(buf))
+                buf.clear()
+
+        async def close() -> None:
+            nonlocal writer
+            await flush()
+            files.append(await asyncio.to_thread(writer.finish, self.store))
+            writer = None
+
+        try:
+            async for r in conn.cursor(sql, *args, prefetch=ARCHIVE_FETCH_ROWS):
+                tenant = r[_I_TENANT]
+                if writer is not None and (
+                    writer.info.tenant_id != tenant
+                    or writer.info.rows + len(buf) >= ARCHIVE_FILE_MAX_ROWS
+                ):
+                    await close()
+                if writer is None:
+                    day = r[_I_OCCURRED].astimezone(timezone.utc).strftime("%Y-%m-%d")
+                    key = (
+                        f"tenant={quote(tenant, safe='-_.')}/date={day}/"
+                        f"{quote(source, safe='-_.')}-{stamp}-{len(files):04d}.parquet"
+                    )
+                    writer = await asyncio.to_thread(_Writer, self.schema, key, tenant)
+                buf.append(r)
+                if len(buf) >= ARCHIVE_ROW_GROUP_ROWS:
+                    await flush()
+            if writer is not None:
+                await close()
+        except BaseException:
+            if writer is not None:
+                await asyncio.to_thread(writer.abort)
+            await self._discard(files)
+            raise
+        return files
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "files": self.files,
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "last_file": self.last_file,
+        }
+
+
+# ---- Reading ----
+
+_FILES_SQL = """
+SELECT key, min_ts FROM log_archives
+WHERE tenant_id = $1 AND max_ts >= $2 AND min_ts < $3
+ORDER BY min_ts
+"""
+
+
+def _doc(row: Dict[str, Any]) -> Tuple[datetime, str, str]:
+    out = {}
+    for name, value in row.items():
+        if value is None:
+            continue
+        if name in ("occurred_at", "received_at"):
+            value = value.isoformat()
+        elif name in ("exception", "properties"):
+            value = json.loads(value)
+        elif name == "sample_rate":
+            if value == 1:
+                continue
+            value = round(value, 6)
+        out[_API_NAMES[name]] = value
+    return row["occurred_at"], row["id"], json.dumps(out, separators=(",", ":"))
+
+
+def _read_file(
+    store: ArchiveStore,
+    key: str,
+    since: datetime,
+    until: datetime,
+    after: Optional[Tuple[datetime, str]],
+) -> Iterator[Tuple[datetime, str, str]]:
+    """(occurred_at, id, json) in file order, one row group in memory at a time."""
+    lo = max(since, after[0]) if after else since
+    with store.open(key) as f:
+        pf = pq.ParquetFile(f)
+        for i in range(pf.metadata.num_row_groups):
+            st = pf.metadata.row_group(i).column(_I_OCCURRED).statistics
+            if st is not None and st.has_min_max and (st.max < lo or st.min >= until):
+                continue
+            t = pf.read_row_group(i)
+            ts = t.column("occurred_at")
+            t = t.filter(pc.and_(pc.greater_equal(ts, pa.scalar(lo, ts.type)), pc.less(ts, pa.scalar(until, ts.type))))
+            for row in t.to_pylist():
+                if after and (row["occurred_at"], row["id"]) <= after:
+                    continue
+                yield _doc(row)
+
+
+def _read_page(
+    store: ArchiveStore,
+    files: List[Tuple[str, datetime]],
+    since: datetime,
+    until: datetime,
+    after: Optional[Tuple[datetime, str]],
+    limit: int,
+) -> List[Tuple[datetime, str, str]]:
+    """
+    files are (key, min_ts) ordered by min_ts. They can overlap in time (late
+    rows, per-tenant retention), so rows are merged; but a file is only
+    opened once the merge reaches its min_ts and is closed when used up, so
+    the fan-in is the files overlapping one point in time, not the range.
+    """
+    pending = deque(files)
+    heap: List[Tuple[Tuple[datetime, str, str], int, Iterator]] = []
+    out = []
+    try:
+        while len(out) < limit:
+            while pending and (not heap or pending[0][1] <= heap[0][0][0]):
+                key, _ = pending.popleft()
+                it = _read_file(store, key, since, until, after)
+                first = next(it, None)
+                if first is not None:
+                    heapq.heappush(heap, (first, len(pending), it))
+            if not heap:
+                break
+            item, n, it = heapq.heappop(heap)
+            out.append(item)
+            nxt = next(it, None)
+            if nxt is not None:
+                heapq.heappush(heap, (nxt, n, it))
+    finally:
+        for _, _, it in heap:
+            it.close()
+    return out
+
+
+async def read_archive(
+    store: ArchiveStore,
+    *,
+    tenant_id: str,
+    since: datetime,
+    until: datetime,
+    cursor: Optional[Tuple[datetime, Any]] = None,
+    limit: int = 1000,
+) -> AsyncIterator[str]:
+    """
+    Archived events of one tenant as NDJSON, oldest first, followed by a
+    {"nextCursor": ...} line when the page is full (same cursor format as
+    GET /v1/logs).
+    """
+    after = (cursor[0], str(cursor[1])) if cursor else None
+    async with db.acquire() as conn:
+        # files that end before the cursor have nothing left for this page
+        rows = await conn.fetch(_FILES_SQL, tenant_id, max(since, after[0]) if after else since, until)
+    files = [(r["key"], r["min_ts"]) for r in rows]
+    page = await asyncio.to_thread(_read_page, store, files, since, until, after, limit)
+    for _, _, doc in page:
+        yield doc + "\n"
+    if len(page) == limit:
+        ts, event_id, _ = page[-1]
+        yield json.dumps({"nextCursor": repo.encode_cursor(ts, event_id)}) + "\n"
@@ -1,64 +1,389 @@
 import asyncio
-from typing import List, Optional
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
 from .models import LogEvent
-from .settings import BATCH_MAX, BATCH_FLUSH_SEC, QUEUE_MAX
-from . import repo
+from .settings import (
+    BATCH_MAX,
+    BATCH_FLUSH_SEC,
+    QUEUE_MAX,
+    DB_POOL_MAX,
+    FLUSH_WORKERS,
+    SPOOL_ENABLED,
+    SPOOL_DIR,
+    SPOOL_SEGMENT_BYTES,
+    SPOOL_FSYNC,
+    SPOOL_OVERFLOW,
+    SPOOL_REPLAY_SEC,
+    BATCH_ADAPTIVE,
+    BATCH_SIZE_MIN,
+    BATCH_SIZE_MAX,
+    BATCH_LINGER_MIN_SEC,
+    BATCH_LINGER_MAX_SEC,
+    BATCH_TARGET_LINGER_SEC,
+    BATCH_MAX_FLUSH_SEC,
+    BATCH_TUNE_SEC,
+    DEDUP_ENABLED,
+    SHUTDOWN_DRAIN_SEC,
+)
+from .adaptive import BatchTuner
+from .dedup import DedupWindow
+from .fairqueue import FairQueue
+from .sampling import Sampler
+from .tenants import TenantLimits
+from .spool import Spool
+from . import metrics, repo
+from .repo import COL, Row
 
+_I_TENANT = COL["tenant_id"]
+_I_DEDUP = COL["dedup_key"]
+
+
+class WorkerStats:
+    """Counters for one flush worker (shown in /internal/batcher)."""
+
+    __slots__ = ("batches", "flushed", "flush_errors", "last_batch_size", "busy")
 
-class Batcher:
     def __init__(self):
-        self._q: asyncio.Queue[LogEvent] = asyncio.Queue(maxsize=QUEUE_MAX)
-        self._task: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.flushed = 0
+        self.flush_errors = 0
+        self.last_batch_size = 0
+        self.busy = False
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+
+# called with every batch of rows right after it is committed
+FlushHook = Callable[[List[Row]], None]
+
+
+async def isolate_poison(
+    rows: List[Row],
+    exc: Exception,
+    send: Callable[[List[Row]], Awaitable[None]],
+    dead_letter: Callable[[List[Row], Exception], Awaitable[None]],
+    written: FlushHook,
+) -> List[Row]:
+    """
+    `rows` failed as a whole with a data error. Bisects until each bad row
+    is alone: the good parts go to send() (then written()), each bad row to
+    dead_letter(), so one poison row can't sink everything around it.
+    Returns the rows left unsent when some other error (DB gone) cuts the
+    bisection short.
+    """
+    if len(rows) == 1:
+        await dead_letter(rows, exc)
+        return []
+    mid = len(rows) // 2
+    todo = [rows[mid:], rows[:mid]]
+    while todo:
+        part = todo.pop()
+        try:
+            await send(part)
+        except repo.POISON_ERRORS as e:
+            if len(part) == 1:
+                await dead_letter(part, e)
+            else:
+                mid = len(part) // 2
+                todo += [part[mid:], part[:mid]]
+            continue
+        except Exception:
+            return part + [r for p in reversed(todo) for r in p]
+        written(part)
+    return []
+
+# where batches go; default is repo.write_rows (Postgres)
+Sink = Callable[[List[Row]], Awaitable[None]]
+
+
+class Batcher:
+    def __init__(
+        self,
+        workers: int = FLUSH_WORKERS,
+        spool: Optional[Spool] = None,
+        adaptive: bool = BATCH_ADAPTIVE,
+        sink: Optional[Sink] = None,
+        limits: Optional[TenantLimits] = None,
+    ):
+        # queue holds ready-to-write rows (repo.COLUMNS order), not models,
+        # in one sub-queue per tenant drained round robin (see fairqueue.py)
+        self.limits = limits if limits is not None else TenantLimits()
+        self._q = FairQueue(QUEUE_MAX, self._tenant_limit)
+        # sampling/shedding before rows are queued (see sampling.py)
+        self.sampler = Sampler(lambda: self.limits.sampling)
+        # recently queued dedup keys; retries inside the window are acked and dropped
+        self.dedup: Optional[DedupWindow] = DedupWindow() if DEDUP_ENABLED else None
+        self._tasks: List[asyncio.Task] = []
+        self._replay_task: Optional[asyncio.Task] = None
+        self._tune_task: Optional[asyncio.Task] = None
         self._stopping = asyncio.Event()
+        # set on shutdown (or POST /internal/drain): no new rows, writers keep going
+        self.draining = False
+        self._stopping_started = False
         self._flush_lock = asyncio.Lock()
+        self._flush_hooks: List[FlushHook] = []
+        self._taps: List[FlushHook] = []
+        self._sink = sink
+
+        # each worker holds one pool connection while writing, so more
+        # workers than DB_POOL_MAX would just queue up on acquire().
+        # With a custom sink (broker publish) workers = in-flight window.
+        self.workers = max(1, min(workers, DB_POOL_MAX) if sink is None else workers)
+        self.worker_stats: List[WorkerStats] = [WorkerStats() for _ in range(self.workers)]
+
+        if spool is None and SPOOL_ENABLED:
+            spool = Spool(SPOOL_DIR, SPOOL_SEGMENT_BYTES, fsync=SPOOL_FSYNC)
+        self.spool = spool
+
+        # static mode: BATCH_MAX, flush as soon as something is queued
+        self.tuner: Optional[BatchTuner] = None
+        if adaptive:
+            self.tuner = BatchTuner(
+                size_min=BATCH_SIZE_MIN,
+                size_max=BATCH_SIZE_MAX,
+                linger_min=BATCH_LINGER_MIN_SEC,
+                linger_max=BATCH_LINGER_MAX_SEC,
+                target_linger=BATCH_TARGET_LINGER_SEC,
+                max_flush_sec=BATCH_MAX_FLUSH_SEC,
+                workers=self.workers,
+            )
 
         # simple counters (optional but useful)
         self.enqueued = 0
         self.dropped = 0
         self.flushed = 0
         self.flush_errors = 0
+        self.hook_errors = 0
+        self.spooled = 0
+        self.replayed = 0
+        self.replay_errors = 0
+        self.dead_lettered = 0  # rows refused as bad data, set aside (see _isolate)
+        self.drain_left = 0  # rows still queued at the drain deadline (spooled)
+        self.drain_sec: Optional[float] = None
 
     async def start(self) -> None:
         self._stopping.clear()
-        self._task = asyncio.create_task(self._run(), name="log-batcher")
+        self.draining = False
+        self._stopping_started = False
+        self._tasks = [
+            asyncio.create_task(self._run(i), name=f"log-batcher-{i}")
+            for i in range(self.workers)
+        ]
+        if self.spool is not None:
+            self._replay_task = asyncio.create_task(self._replay_loop(), name="log-spool-replay")
+        if self.tuner is not None:
+            self._tune_task = asyncio.create_task(self._tune_loop(), name="log-batch-tuner")
+
+    def begin_drain(self) -> None:
+        """Stops accepting rows; queued ones are still written."""
+        self.draining = True
+
+    def resume(self) -> bool:
+        """Undoes begin_drain(); not possible once stop() has started."""
+        if self._stopping_started:
+            return False
+        self.draining = False
+        return True
+
+    async def stop(self, deadline: float = SHUTDOWN_DRAIN_SEC) -> None:
+        """
+        Shutdown drain: rejects new rows and lets all workers flush the
+        queue (no linger) for up to `deadline` seconds. Whatever is left
+        after that, queued or cut off mid-write, goes to the spool.
+        """
+        self.begin_drain()
+        self._stopping_started = True
+        t0 = time.monotonic()
+        # the replayer would compete with the drain for connections
+        await self._cancel([t for t in (self._replay_task, self._tune_task) if t])
+        self._replay_task = None
+        self._tune_task = None
+
+        end = t0 + deadline
+        while self._tasks and time.monotonic() < end:
+            if self._q.empty() and not any(w.busy for w in self.worker_stats):
+                break
+            await asyncio.sleep(0.01)
 
-    async def stop(self) -> None:
         self._stopping.set()
-        if self._task:
-            self._task.cancel()
+        await self._cancel(self._tasks)
+        self._tasks = []
+
+        left = self._drain_up_to(self._q.qsize())
+        self.drain_left = len(left)
+        for i in range(0, len(left), BATCH_MAX):
+            await self._spill(left[i:i + BATCH_MAX])
+        self.drain_sec = time.monotonic() - t0
+        if self.spool is not None:
+            self.spool.close()
+
+    @staticmethod
+    async def _cancel(tasks: List[asyncio.Task]) -> None:
+        for t in tasks:
+            t.cancel()
+        for t in tasks:
             try:
-                await self._task
+                await t
             except asyncio.CancelledError:
                 pass
-        # final flush on shutdown
-        await self.flush_now()
 
     def enqueue_nowait(self, e: LogEvent) -> bool:
         """
         Fast path for HTTP handlers.
-        Returns True if queued, False if dropped (queue full).
+        Returns True if queued (or spooled, with SPOOL_OVERFLOW), False if
+        dropped (queue full).
         """
+        return self.enqueue_row_nowait(repo.event_row(e, repo.utc_now()))
+
+    def enqueue_row_nowait(self, row: Row) -> bool:
+        """Same as enqueue_nowait, for rows already built by the fast path."""
+        if self.draining:
+            self.dropped += 1
+            return False
+        key = self._dedup_key(row)
+        if key is not None and self.dedup.seen(key):
+            return True
+        admitted = self.sampler.admit(row, self._fill_ratio(row[_I_TENANT]))
+        if admitted is None:
+            # dropped by policy, not by overload: still "accepted"
+            self._remember(key)
+            return True
         try:
-            self._q.put_nowait(e)
+            self._q.put_nowait(admitted)
             self.enqueued += 1
+            self._remember(key)
             return True
         except asyncio.QueueFull:
+            if SPOOL_OVERFLOW and self.spool is not None:
+                try:
+                    # buffered sequential write; the replayer flushes/seals it
+                    self.spool.append([admitted])
+                    self.spooled += 1
+                    self._remember(key)
+                    return True
+                except OSError:
+                    pass
             self.dropped += 1
             return False
 
     async def enqueue(self, e: LogEvent) -> None:
-        await self._q.put(e)
-        self.enqueued += 1
+        await self.enqueue_row(repo.event_row(e, repo.utc_now()))
+
+    async def enqueue_row(self, row: Row) -> bool:
+        """
+        Waits for queue space instead of dropping (streaming ingest).
+        False only when draining.
+        """
+        if self.draining:
+            return False
+        key = self._dedup_key(row)
+        if key is not None and self.dedup.seen(key):
+            return True
+        admitted = self.sampler.admit(row, self._fill_ratio(row[_I_TENANT]))
+        if admitted is not None:
+            await self._q.put(admitted)
+            self.enqueued += 1
+        self._remember(key)
+        return True
+
+    def _dedup_key(self, row: Row):
+        if self.dedup is None or row[_I_DEDUP] is None:
+            return None
+        return row[_I_TENANT], row[_I_DEDUP]
+
+    def _remember(self, key) -> None:
+        # only once the row is accepted, so a 503'd request can be retried
+        if key is not None:
+            self.dedup.add(key)
+
+    def add_flush_hook(self, hook: FlushHook) -> None:
+        """
+        Registers a callback for committed rows (cache invalidation, rollups...).
+        Hooks run inline on the writer task, so keep them cheap and non-blocking.
+        """
+        self._flush_hooks.append(hook)
+
+    def add_tap(self, tap: FlushHook) -> None:
+        """
+        Like a flush hook, but called with each batch right before it is
+        written (live tail). Must never block; errors are counted and ignored.
+        """
+        self._taps.append(tap)
+
+    def _notify_flushed(self, rows: List[Row]) -> None:
+        for hook in self._flush_hooks:
+            try:
+                hook(rows)
+            except Exception:
+                # a broken hook must never turn a committed batch into a retry
+                self.hook_errors += 1
+
+    def qsize(self) -> int:
+        return self._q.qsize()
+
+    def full(self) -> bool:
+        return self._q.full()
+
+    def has_room(self, tenant: str) -> bool:
+        """False if the queue or this tenant's share of it is full."""
+        return self._q.has_room(tenant)
+
+    def _fill_ratio(self, tenant: str) -> float:
+        # the fuller of the whole queue and this tenant's share of it
+        return max(
+            self._q.qsize() / QUEUE_MAX,
+            self._q.tenant_size(tenant) / self.limits.get(tenant).queue_max,
+        )
+
+    def _tenant_limit(self, tenant: str):
+        lim = self.limits.get(tenant)
+        return lim.weight, lim.queue_max
+
+    @property
+    def batch_size(self) -> int:
+        return self.tuner.batch_size if self.tuner is not None else BATCH_MAX
+
+    @property
+    def linger_sec(self) -> float:
+        if self.draining:
+            return 0.0  # write what is there, don't wait for more
+        return self.tuner.linger_sec if self.tuner is not None else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self._q.qsize(),
+            "queued_by_tenant": self._q.tenant_depths(),
+            "sampling": self.sampler.stats(),
+            "dedup": self.dedup.stats() if self.dedup is not None else None,
+            "enqueued": self.enqueued,
+            "flushed": self.flushed,
+            "dropped": self.dropped,
+            "flush_errors": self.flush_errors,
+            "hook_errors": self.hook_errors,
+            "batch_size": self.batch_size,
+            "linger_sec": round(self.linger_sec, 4),
+            "adaptive": self.tuner.stats() if self.tuner is not None else None,
+            "spooled": self.spooled,
+            "replayed": self.replayed,
+            "replay_errors": self.replay_errors,
+            "dead_lettered": self.dead_lettered,
+            "spool": self.spool.stats() if self.spool is not None else None,
+            "draining": self.draining,
+            "drain_left": self.drain_left,
+            "drain_sec": round(self.drain_sec, 3) if self.drain_sec is not None else None,
+            "workers": [w.as_dict() for w in self.worker_stats],
+        }
 
     async def flush_now(self) -> None:
         async with self._flush_lock:
-            batch = self._drain_up_to(BATCH_MAX)
+            batch = self._drain_up_to(self.batch_size)
             if batch:
                 await self._write_batch(batch)
 
-    def _drain_up_to(self, n: int) -> List[LogEvent]:
-        items: List[LogEvent] = []
+    def _drain_up_to(self, n: int) -> List[Row]:
+        items: List[Row] = []
         while len(items) < n:
             try:
                 items.append(self._q.get_nowait())
@@ -66,44 +391,180 @@ class Batcher:
                 break
         return items
 
-    async def _write_batch(self, batch: List[LogEvent]) -> None:
+    async def _write_batch(self, batch: List[Row], ws: Optional[WorkerStats] = None) -> None:
+        metrics.batch_size.observe(len(batch))
+        for tap in self._taps:
+            try:
+                tap(batch)
+            except Exception:
+                self.hook_errors += 1
+        t0 = time.perf_counter()
         try:
-            await repo.insert_batch(batch)  # one transaction inside repo (we’ll ensure that)
+            await self._send(batch)
+            elapsed = time.perf_counter() - t0
+            metrics.insert_batch_seconds.observe(elapsed, "ok")
+            if self.tuner is not None:
+                self.tuner.observe_flush(elapsed)
             self.flushed += len(batch)
-        except Exception:
+            if ws is not None:
+                ws.flushed += len(batch)
+        except Exception as exc:
+            metrics.insert_batch_seconds.observe(time.perf_counter() - t0, "error")
             self.flush_errors += 1
-            # Minimal behavior: drop on error (MVP).
-            # Later we can add retry/spool file, etc.
-            # We do NOT requeue to avoid infinite loops.
+            if ws is not None:
+                ws.flush_errors += 1
+            if isinstance(exc, repo.POISON_ERRORS):
+                # bad rows in here: write around them
+                written, batch = await self._isolate(batch, exc)
+                self.flushed += written
+                if ws is not None:
+                    ws.flushed += written
+            # We do NOT requeue to avoid infinite loops; the batch goes to the
+            # on-disk spool and the replayer retries it once the DB is back.
+            if batch:
+                await self._spill(batch)
+        else:
+            self._notify_flushed(batch)
+
+    async def _isolate(self, rows: List[Row], exc: Exception) -> Tuple[int, List[Row]]:
+        """
+        Writes what it can of a batch refused as bad data (isolate_poison).
+        Returns (rows written, rows left).
+        """
+        written = 0
+
+        def _written(part: List[Row]) -> None:
+            nonlocal written
+            written += len(part)
+            self._notify_flushed(part)
+
+        left = await isolate_poison(rows, exc, self._send, self._dead_letter, _written)
+        return written, left
+
+    async def _dead_letter(self, rows: List[Row], exc: Exception) -> None:
+        self.dead_lettered += len(rows)
+        if self.spool is None:
+            return  # nowhere to keep them
+        try:
+            await asyncio.to_thread(self.spool.dead_letter, rows, repr(exc))
+        except OSError:
+            pass
+
+    async def _send(self, batch: List[Row]) -> None:
+        if self._sink is None:
+            await repo.write_rows(batch)  # single COPY/executemany inside repo
+        else:
+            await self._sink(batch)
+
+    async def _spill(self, batch: List[Row]) -> None:
+        if self.spool is None:
+            self.dropped += len(batch)
+            return
+        try:
+            await asyncio.to_thread(self.spool.append, batch)
+            self.spooled += len(batch)
+        except OSError:
+            self.dropped += len(batch)
 
-    async def _run(self) -> None:
+    async def _tune_loop(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await asyncio.sleep(BATCH_TUNE_SEC)
+                self.tuner.tune(self.enqueued, self._q.qsize())
+            except asyncio.CancelledError:
+                break
+
+    async def _fill(self, batch: List[Row], size: int, linger: float) -> None:
+        """Tops up `batch` to `size`, waiting at most `linger` seconds for more."""
+        batch.extend(self._drain_up_to(size - len(batch)))
+        if linger <= 0:
+            return
+        deadline = time.monotonic() + linger
+        while len(batch) < size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._q.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+            batch.extend(self._drain_up_to(size - len(batch)))
+
+    async def _replay_loop(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await asyncio.sleep(SPOOL_REPLAY_SEC)
+                await self._replay_once()
+            except asyncio.CancelledError:
+                break
+            except Exception:
+                # DB still down (or segment unreadable): back off, retry next tick
+                self.replay_errors += 1
+
+    async def _replay_once(self) -> None:
+        """
+        Drains sealed spool segments back through repo.write_rows.
+        Skipped while live traffic has the queue more than half full.
+        A record Postgres refuses is bisected like a live batch; its bad
+        rows go to the dead-letter file and the segment moves on.
+        """
+        spool = self.spool
+        if not spool.sealed_segments():
+            spool.rotate()
+        for seg in spool.sealed_segments():
+            for offset, rows in spool.read(seg):
+                if self._stopping.is_set() or self._q.qsize() > QUEUE_MAX // 2:
+                    return
+                try:
+                    await self._send(rows)
+                except repo.POISON_ERRORS as exc:
+                    written, left = await self._isolate(rows, exc)
+                    if len(left) == len(rows):
+                        raise  # no progress (DB gone mid-bisect): retry next tick
+                    if left:
+                        # re-spool only what's left so the good part isn't written twice
+                        await asyncio.to_thread(spool.append, left)
+                    self.replayed += written
+                else:
+                    self._notify_flushed(rows)
+                    self.replayed += len(rows)
+                spool.ack(seg, offset)
+            spool.remove(seg)
+
+    async def _run(self, idx: int) -> None:
         """
-        Flush policy:
-          - flush if we have >= BATCH_MAX quickly
-          - otherwise flush every BATCH_FLUSH_SEC
+        Flush policy (per worker, all workers share the queue):
+          - wait up to BATCH_FLUSH_SEC for the first event
+          - collect up to batch_size events, lingering at most linger_sec
+            (static mode: BATCH_MAX, no linger), and write them
+        While one worker is inside insert_batch the others keep draining,
+        so a deep queue is written on up to `workers` connections at once.
         """
+        ws = self.worker_stats[idx]
         while not self._stopping.is_set():
             try:
                 # wait for at least one item or timeout
                 try:
                     first = await asyncio.wait_for(self._q.get(), timeout=BATCH_FLUSH_SEC)
-                    batch = [first]
                 except asyncio.TimeoutError:
-                    batch = []
-
-                # drain remaining up to BATCH_MAX
-                if batch:
-                    batch.extend(self._drain_up_to(BATCH_MAX - len(batch)))
-                else:
                     # timeout with empty queue
                     continue
 
-                # if we got any, write them
-                await self._write_batch(batch)
-
-                # if queue is still huge, keep flushing without sleeping
-                while self._q.qsize() >= BATCH_MAX:
-                    await self.flush_now()
+                batch = [first]
+                ws.busy = True
+                try:
+                    await self._fill(batch, self.batch_size, self.linger_sec)
+                    ws.batches += 1
+                    ws.last_batch_size = len(batch)
+                    await self._write_batch(batch, ws)
+                except asyncio.CancelledError:
+                    # cut off by the drain deadline: keep the rows. A write cancelled
+                    # right after its commit gets replayed; rows with a dedup key
+                    # are skipped on conflict then.
+                    await self._spill(batch)
+                    raise
+                finally:
+                    ws.busy = False
 
             except asyncio.CancelledError:
                 break
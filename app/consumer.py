@@ -0,0 +1,245 @@
+"""
+Broker consumer worker (INGEST_MODE=broker).
+
+Run one or more of these next to the HTTP front-ends:
+
+    python -m app.consumer
+
+It takes messages from LOG_QUEUE (bounded by MQ_PREFETCH), groups them into
+COPY-sized batches of up to MQ_CONSUMER_BATCH rows / MQ_CONSUMER_LINGER_SEC,
+writes each batch in one statement and acks the messages only after the
+commit. Undecodable messages are dead-lettered to LOG_DLQ; when Postgres
+refuses a batch as bad data, the bad rows are narrowed down and only those
+go to LOG_DLQ. Anything else (DB down) is requeued.
+"""
+import asyncio
+import logging
+import signal
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import db, mq, repo, schema
+from .batcher import FlushHook, isolate_poison
+from .mq import Delivery
+from .repo import Row
+from .settings import MQ_CONSUMER_BATCH, MQ_CONSUMER_LINGER_SEC, MQ_PREFETCH, ROLLUP_ENABLED
+
+log = logging.getLogger(__name__)
+
+# backoff after a transient write failure before taking more messages
+_RETRY_SEC = 1.0
+
+
+class BrokerConsumer:
+    def __init__(
+        self,
+        broker,
+        batch_rows: int = MQ_CONSUMER_BATCH,
+        linger_sec: float = MQ_CONSUMER_LINGER_SEC,
+    ):
+        self.broker = broker
+        self.batch_rows = batch_rows
+        self.linger_sec = linger_sec
+        # nothing more is delivered until we ack, so never wait past prefetch
+        self.max_messages = max(1, getattr(broker, "prefetch", MQ_PREFETCH))
+        # prefetch already bounds this; no maxsize needed
+        self._inbox: asyncio.Queue[Delivery] = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_hooks: List[FlushHook] = []
+
+        self.messages = 0
+        self.rows_written = 0
+        self.batches = 0
+        self.dead_lettered = 0  # whole messages
+        self.dead_lettered_rows = 0  # bad rows split out of a message
+        self.requeued = 0
+        self.write_errors = 0
+        self.hook_errors = 0
+
+    def add_flush_hook(self, hook: FlushHook) -> None:
+        self._flush_hooks.append(hook)
+
+    async def start(self) -> None:
+        await self.broker.consume(self._inbox.put)
+        self._task = asyncio.create_task(self._run(), name="log-broker-consumer")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # unprocessed deliveries go back to the broker
+        while not self._inbox.empty():
+            await self._inbox.get_nowait().requeue()
+
+    async def _collect(self) -> List[Tuple[Delivery, List[Row]]]:
+        first = await self._inbox.get()
+        items: List[Tuple[Delivery, List[Row]]] = []
+        n_rows = 0
+        deadline = time.monotonic() + self.linger_sec
+        d: Optional[Delivery] = first
+        while d is not None:
+            self.messages += 1
+            try:
+                rows = mq.decode_message(d.body)
+            except Exception:
+                await d.reject()
+                self.dead_lettered += 1
+            else:
+                items.append((d, rows))
+                n_rows += len(rows)
+
+            if n_rows >= self.batch_rows or len(items) >= self.max_messages:
+                break
+            d = None
+            if not self._inbox.empty():
+                d = self._inbox.get_nowait()
+            else:
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    try:
+                        d = await asyncio.wait_for(self._inbox.get(), timeout=remaining)
+                    except asyncio.TimeoutError:
+                        pass
+        return items
+
+    async def _run(self) -> None:
+        while True:
+            items = await self._collect()
+            if not items:
+                continue
+            write = asyncio.ensure_future(self._write(items))
+            try:
+                await asyncio.shield(write)
+            except asyncio.CancelledError:
+                # stop(): the write may already have committed, so let it
+                # finish and ack/requeue by what really happened
+                await write
+                raise
+
+    async def _write(self, items: List[Tuple[Delivery, List[Row]]]) -> None:
+        rows = [r for _, rs in items for r in rs]
+        try:
+            await repo.write_rows(rows)
+        except repo.POISON_ERRORS as exc:
+            self.write_errors += 1
+            # some message in here is bad: retry one message at a time, then
+            # narrow the bad one down to its rows
+            if len(items) > 1:
+                for item in items:
+                    await self._write([item])
+                return
+            await self._isolate(items[0], exc)
+            return
+        except Exception:
+            self.write_errors += 1
+            await self._requeue(items)
+            return
+
+        # committed: now (and only now) ack
+        for d, _ in items:
+            await d.ack()
+        self.batches += 1
+        self._written(rows)
+
+    async def _isolate(self, item: Tuple[Delivery, List[Row]], exc: Exception) -> None:
+        """
+        One message refused as bad data. Its good rows are written and its
+        bad rows published to LOG_DLQ before the message is acked; a message
+        with nothing good in it is rejected as it came.
+        """
+        d, rows = item
+        bad: List[Row] = []
+        written: List[Row] = []
+
+        async def _bad(part: List[Row], e: Exception) -> None:
+            bad.extend(part)
+
+        left = await isolate_poison(rows, exc, repo.write_rows, _bad, written.extend)
+        if not written and not left:
+            await d.reject()
+            self.dead_lettered += 1
+            return
+        if not written and not bad:
+            await self._requeue([item])  # DB went away before anything was sent
+            return
+        try:
+            if bad:
+                await self.broker.dead_letter(mq.encode_rows(bad))
+            if left:
+                # DB went away half way: the written rows are committed, only
+                # the rest goes back to the queue
+                await self.broker.publish(mq.encode_rows(left))
+        except Exception:
+            # can't set them aside: redeliver the lot (written rows included)
+            log.exception("could not dead-letter / republish part of a message, requeueing it")
+            await self._requeue([item])
+            return
+        await d.ack()
+        self.dead_lettered_rows += len(bad)
+        self._written(written)
+
+    async def _requeue(self, items: List[Tuple[Delivery, List[Row]]]) -> None:
+        for d, _ in items:
+            await d.requeue()
+        self.requeued += len(items)
+        await asyncio.sleep(_RETRY_SEC)
+
+    def _written(self, rows: List[Row]) -> None:
+        self.rows_written += len(rows)
+        for hook in self._flush_hooks:
+            try:
+                hook(rows)
+            except Exception:
+                # the rows are committed and acked either way
+                self.hook_errors += 1
+                log.exception("flush hook failed")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "inbox": self._inbox.qsize(),
+            "messages": self.messages,
+            "batches": self.batches,
+            "rows_written": self.rows_written,
+            "dead_lettered": self.dead_lettered,
+            "dead_lettered_rows": self.dead_lettered_rows,
+            "requeued": self.requeued,
+            "write_errors": self.write_errors,
+            "hook_errors": self.hook_errors,
+        }
+
+
+async def main() -> None:
+    from .rollups import AccessRollup
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    await db.connect()
+    await schema.check()
+    broker = mq.make_broker()
+    await broker.connect()
+    consumer = BrokerConsumer(broker)
+
+    if ROLLUP_ENABLED:
+        await AccessRollup().install()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await consumer.start()
+    log.info("consumer started (prefetch=%d, batch=%d rows)", consumer.max_messages, consumer.batch_rows)
+    try:
+        await stop.wait()
+    finally:
+        await consumer.stop()
+        await broker.close()
+        await db.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,15 +1,143 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from time import perf_counter
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Optional
+
 import asyncpg
+from . import metrics
 from .settings import (
     DATABASE_URL,
     DB_POOL_MIN,
     DB_POOL_MAX,
     DB_COMMAND_TIMEOUT,
     DB_ACQUIRE_TIMEOUT,
+    DB_POOL_IDLE_SEC,
+    DB_STATEMENT_CACHE_SIZE,
+    DB_POOL_TUNE_SEC,
+    DB_POOL_SHRINK_SEC,
+    DB_HEALTH_SEC,
+    DB_HEALTH_MAX_AGE_SEC,
 )
 
 pool: asyncpg.Pool | None = None
 
 
+class _Limit:
+    """
+    Resizable cap on connections handed out by acquire(). The pool is
+    created at DB_POOL_MAX; PoolSizer moves this limit below that, and
+    connections above it are closed once idle for DB_POOL_IDLE_SEC.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_use = 0
+        # FIFO of acquirers; futures come from the running loop, so this
+        # works across event loops (tests, bench)
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> None:
+        if self.in_use < self.limit and not self._waiters:
+            self.in_use += 1
+            return
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        try:
+            await fut  # the slot is counted by whoever woke us
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release()  # woken and cancelled at once: pass the slot on
+            else:
+                try:
+                    self._waiters.remove(fut)
+                except ValueError:
+                    pass
+            raise
+
+    def release(self) -> None:
+        self.in_use -= 1
+        self._wake()
+
+    def resize(self, limit: int) -> None:
+        self.limit = limit
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_use < self.limit:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                self.in_use += 1
+                fut.set_result(None)
+
+
+limit = _Limit(DB_POOL_MAX)
+
+
+class Health:
+    """
+    Recent DB health for /ready, so probes never wait for a connection.
+    Every acquire() that completes counts as a success; the background
+    task only pings when the pool has been idle for DB_HEALTH_SEC.
+    """
+
+    def __init__(self, interval: float = DB_HEALTH_SEC, max_age: float = DB_HEALTH_MAX_AGE_SEC):
+        self.interval = interval
+        self.max_age = max_age
+        self.ok_at = 0.0  # monotonic
+        self.error: Optional[str] = None
+        self.pings = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def mark_ok(self) -> None:
+        self.ok_at = time.monotonic()
+        self.error = None
+
+    def healthy(self) -> bool:
+        return time.monotonic() - self.ok_at <= self.max_age
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name="db-health")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            if time.monotonic() - self.ok_at < self.interval:
+                continue
+            self.pings += 1
+            try:
+                await ping()
+                self.mark_ok()
+            except Exception as exc:
+                self.error = repr(exc)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "healthy": self.healthy(),
+            "age_sec": round(time.monotonic() - self.ok_at, 3) if self.ok_at else None,
+            "error": self.error,
+            "pings": self.pings,
+        }
+
+
+health = Health()
+
+
 async def connect() -> None:
     global pool
     pool = await asyncpg.create_pool(
@@ -17,10 +145,15 @@ async def connect() -> None:
         min_size=DB_POOL_MIN,
         max_size=DB_POOL_MAX,
         # closes idle connections so the pool doesn't keep stale ones forever
-        max_inactive_connection_lifetime=60,
+        # (and shrinks back after the sizer lowers the limit)
+        max_inactive_connection_lifetime=DB_POOL_IDLE_SEC,
         # default statement timeout (seconds) for queries on connections from this pool
         command_timeout=DB_COMMAND_TIMEOUT,
+        # per-connection prepared statements (write SQL is fixed text, so it stays
+        # cached across acquires; sized so ad-hoc read queries don't evict it)
+        statement_cache_size=DB_STATEMENT_CACHE_SIZE,
     )
+    health.mark_ok()
 
 
 async def disconnect() -> None:
@@ -36,10 +169,137 @@ def get_pool() -> asyncpg.Pool:
     return pool
 
 
+@asynccontextmanager
+async def acquire(timeout: Optional[float] = None) -> AsyncIterator[asyncpg.Connection]:
+    """pool.acquire() under the sizer's limit; records how long we waited."""
+    p = get_pool()
+    t0 = perf_counter()
+    if timeout is None:
+        await limit.acquire()
+    else:
+        await asyncio.wait_for(limit.acquire(), timeout)
+        timeout = max(0.0, timeout - (perf_counter() - t0))
+    try:
+        conn = await p.acquire(timeout=timeout)
+    except BaseException:
+        limit.release()
+        raise
+    metrics.pool_acquire_seconds.observe(perf_counter() - t0)
+    try:
+        yield conn
+        health.mark_ok()
+    finally:
+        await p.release(conn)
+        limit.release()
+
+
 async def ping() -> None:
     """
-    Lightweight readiness probe. Acquires a connection and executes SELECT 1.
+    Lightweight health check. Acquires a connection and executes SELECT 1.
     """
     p = get_pool()
     async with p.acquire(timeout=DB_ACQUIRE_TIMEOUT) as conn:
         await conn.execute("SELECT 1")
+
+
+def pool_stats() -> Dict[str, Any]:
+    if pool is None:
+        return {"connected": False}
+    size = pool.get_size()
+    idle = pool.get_idle_size()
+    return {
+        "connected": True,
+        "size": size,
+        "idle": idle,
+        "in_use": size - idle,
+        "limit": limit.limit,
+        "waiting": limit.waiting,
+        "min": pool.get_min_size(),
+        "max": pool.get_max_size(),
+    }
+
+
+metrics.pool_size.set_function(lambda: pool.get_size())
+metrics.pool_in_use.set_function(lambda: pool.get_size() - pool.get_idle_size())
+metrics.pool_idle.set_function(lambda: pool.get_idle_size())
+metrics.pool_waiting.set_function(lambda: limit.waiting)
+metrics.pool_limit.set_function(lambda: limit.limit)
+
+
+class PoolSizer:
+    """
+    Moves the connection limit between DB_POOL_MIN and DB_POOL_MAX:
+    demand = connections in use + acquirers waiting + batches of backlog
+    (queued rows / batch size). Grows to demand at once; shrinks one step
+    at a time after demand has stayed below the limit for shrink_sec.
+    """
+
+    def __init__(
+        self,
+        backlog: Callable[[], int],
+        batch_size: Callable[[], int],
+        lo: int = DB_POOL_MIN,
+        hi: int = DB_POOL_MAX,
+        tick_sec: float = DB_POOL_TUNE_SEC,
+        shrink_sec: float = DB_POOL_SHRINK_SEC,
+    ):
+        self.backlog = backlog
+        self.batch_size = batch_size
+        self.lo = max(1, min(lo, hi))
+        self.hi = hi
+        self.tick_sec = tick_sec
+        self.shrink_sec = shrink_sec
+        self._low_since: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.grown = 0
+        self.shrunk = 0
+        self.last_demand = 0
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name="db-pool-sizer")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.tick_sec)
+            await self.tune()
+
+    def demand(self) -> int:
+        batches = math.ceil(self.backlog() / max(1, self.batch_size()))
+        return limit.in_use + limit.waiting + batches
+
+    async def tune(self) -> None:
+        want = min(self.hi, max(self.lo, self.demand()))
+        self.last_demand = want
+        now = time.monotonic()
+        if want > limit.limit:
+            self._low_since = None
+            self.grown += 1
+            limit.resize(want)
+        elif want < limit.limit:
+            if self._low_since is None:
+                self._low_since = now
+            elif now - self._low_since >= self.shrink_sec:
+                self._low_since = now  # next step after another shrink_sec
+                self.shrunk += 1
+                limit.resize(limit.limit - 1)
+        else:
+            self._low_since = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": limit.limit,
+            "demand": self.last_demand,
+            "bounds": [self.lo, self.hi],
+            "grown": self.grown,
+            "shrunk": self.shrunk,
+        }
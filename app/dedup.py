@@ -0,0 +1,62 @@
+import time
+from hashlib import blake2b
+from typing import Any, Dict, Set, Tuple
+
+from .settings import DEDUP_MAX_KEYS, DEDUP_WINDOW_SEC
+
+
+def _digest(key: Tuple[str, ...]) -> bytes:
+    return blake2b("\x00".join(key).encode("utf-8"), digest_size=16).digest()
+
+
+class DedupWindow:
+    """
+    Recently seen dedup keys, bounded in time and size.
+
+    Two generations of key digests: new keys go into `current`; when it is
+    older than half the window or holds half of max_keys, it becomes
+    `previous` and the old previous is dropped. A key is remembered for at
+    least window/2 (less only under a flood of keys) and at most the full
+    window. O(1) per check. Keys are kept as 128-bit blake2b digests, so a
+    false positive (a new event dropped as a retry) would take a digest
+    collision - practically never, unlike 64-bit hash().
+
+    The unique (tenant_id, dedup_key, occurred_at) index is the backstop for
+    anything this misses (older retries, other processes, restarts) - but
+    only for events that carry occurredAt. An eventId without occurredAt gets
+    server time, which differs on every retry, so those are de-duplicated
+    here or not at all.
+    """
+
+    def __init__(self, window_sec: float = DEDUP_WINDOW_SEC, max_keys: int = DEDUP_MAX_KEYS):
+        self.window_sec = window_sec
+        self._gen_max = max(1, max_keys // 2)
+        self._current: Set[bytes] = set()
+        self._previous: Set[bytes] = set()
+        self._rotated_at = time.monotonic()
+        self.duplicates = 0
+        self.rotations = 0
+
+    def _maybe_rotate(self) -> None:
+        if len(self._current) >= self._gen_max or time.monotonic() - self._rotated_at >= self.window_sec / 2:
+            self._previous, self._current = self._current, set()
+            self._rotated_at = time.monotonic()
+            self.rotations += 1
+
+    def seen(self, key: Tuple[str, ...]) -> bool:
+        h = _digest(key)
+        if h in self._current or h in self._previous:
+            self.duplicates += 1
+            return True
+        return False
+
+    def add(self, key: Tuple[str, ...]) -> None:
+        self._maybe_rotate()
+        self._current.add(_digest(key))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "keys": len(self._current) + len(self._previous),
+            "duplicates": self.duplicates,
+            "rotations": self.rotations,
+        }
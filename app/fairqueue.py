@@ -0,0 +1,106 @@
+import asyncio
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Tuple
+
+from . import metrics
+from .repo import COL, Row
+
+_I_TENANT = COL["tenant_id"]
+
+
+class FairQueue:
+    """
+    Drop-in for the Batcher's asyncio.Queue with one sub-queue per tenant.
+
+    - put: bounded globally (maxsize) and per tenant (limit(tenant)[1]), so a
+      noisy tenant fills its own share and gets QueueFull, not everyone.
+    - get: deficit round robin over tenants with pending rows; each tenant
+      gets `weight` rows per turn, so flush batches interleave tenants in
+      proportion to their weights.
+
+    Same surface the Batcher uses: put_nowait/put/get_nowait/get/qsize/full,
+    raising asyncio.QueueFull/QueueEmpty. Each row is timestamped on the way
+    in and its queue wait is recorded on the way out.
+    """
+
+    def __init__(self, maxsize: int, limit: Callable[[str], Tuple[int, int]]):
+        self._maxsize = maxsize
+        self._limit = limit  # tenant -> (weight, queue_max)
+        self._subs: Dict[str, Tuple[Deque[Row], Deque[float]]] = {}
+        self._ring: Deque[str] = deque()  # tenants with pending rows, in service order
+        self._credit = 0  # rows left for the tenant at the head of the ring
+        self._size = 0
+        self._not_empty = asyncio.Event()
+        self._room = asyncio.Event()
+        self._room.set()
+
+    def qsize(self) -> int:
+        return self._size
+
+    def empty(self) -> bool:
+        return self._size == 0
+
+    def full(self) -> bool:
+        return self._size >= self._maxsize
+
+    def tenant_size(self, tenant: str) -> int:
+        sub = self._subs.get(tenant)
+        return len(sub[0]) if sub else 0
+
+    def has_room(self, tenant: str) -> bool:
+        return self._size < self._maxsize and self.tenant_size(tenant) < self._limit(tenant)[1]
+
+    def put_nowait(self, row: Row) -> None:
+        tenant = row[_I_TENANT]
+        if not self.has_room(tenant):
+            raise asyncio.QueueFull
+        sub = self._subs.get(tenant)
+        if sub is None:
+            sub = self._subs[tenant] = (deque(), deque())
+        if not sub[0]:
+            self._ring.append(tenant)
+        sub[0].append(row)
+        sub[1].append(time.monotonic())
+        self._size += 1
+        self._not_empty.set()
+
+    async def put(self, row: Row) -> None:
+        tenant = row[_I_TENANT]
+        while not self.has_room(tenant):
+            self._room.clear()
+            await self._room.wait()
+        self.put_nowait(row)
+
+    def get_nowait(self) -> Row:
+        if self._size == 0:
+            raise asyncio.QueueEmpty
+        tenant = self._ring[0]
+        if self._credit <= 0:
+            self._credit = self._limit(tenant)[0]
+        rows, stamps = self._subs[tenant]
+        row = rows.popleft()
+        metrics.queue_wait_seconds.observe(time.monotonic() - stamps.popleft())
+        self._size -= 1
+        self._credit -= 1
+
+        if not rows:
+            self._ring.popleft()
+            del self._subs[tenant]
+            self._credit = 0
+        elif self._credit <= 0:
+            self._ring.rotate(-1)
+
+        if self._size == 0:
+            self._not_empty.clear()
+        self._room.set()
+        return row
+
+    async def get(self) -> Row:
+        while self._size == 0:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        return self.get_nowait()
+
+    def tenant_depths(self) -> Dict[str, int]:
+        return {t: len(sub[0]) for t, sub in self._subs.items()}
@@ -0,0 +1,269 @@
+import zlib
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.exceptions import RequestValidationError
+from pydantic import TypeAdapter, ValidationError
+
+from .models import LogEvent, log_event_adapter, log_batch_adapter
+from . import repo
+from .repo import Row
+
+try:  # in requirements.txt; without it zstd bodies get 415
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+try:  # in requirements.txt; without it msgpack bodies get 415
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+MSGPACK_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+
+# ---- Fast-path parsing ----
+# Raw body bytes -> validated dicts (one pydantic-core pass, no LogEvent
+# instances) -> row tuples ready for the Batcher.
+
+def _raise_422(exc: ValidationError) -> None:
+    # same shape FastAPI produces for model-bound bodies
+    raise RequestValidationError(
+        [{**err, "loc": ("body", *err["loc"])} for err in exc.errors(include_url=False)]
+    )
+
+
+def is_msgpack(content_type: Optional[str]) -> bool:
+    return (content_type or "").split(";", 1)[0].strip().lower() in MSGPACK_TYPES
+
+
+def _unpack(body: bytes) -> Any:
+    if msgpack is None:
+        raise HTTPException(status_code=415, detail="msgpack not supported (msgpack not installed)")
+    try:
+        # timestamp=3: msgpack timestamps come back as aware datetimes (occurredAt)
+        return msgpack.unpackb(body, raw=False, timestamp=3)
+    except (ValueError, msgpack.UnpackException):
+        raise HTTPException(status_code=400, detail="invalid msgpack body")
+
+
+def _validate(adapter: TypeAdapter, body: bytes, content_type: Optional[str]) -> Any:
+    try:
+        if is_msgpack(content_type):
+            # decoded objects go straight into the same validator, no JSON text
+            return adapter.validate_python(_unpack(body))
+        return adapter.validate_json(body)
+    except ValidationError as exc:
+        _raise_422(exc)
+
+
+def parse_event(body: bytes, content_type: Optional[str] = None) -> Row:
+    d = _validate(log_event_adapter, body, content_type)
+    return repo.dict_row(d, repo.utc_now())
+
+
+def parse_batch(body: bytes, content_type: Optional[str] = None) -> List[Row]:
+    items = _validate(log_batch_adapter, body, content_type)
+    now = repo.utc_now()
+    return [repo.dict_row(d, now) for d in items]
+
+
+# ---- Streaming (NDJSON) ----
+
+# max decompressed bytes produced per decompress() call, keeps memory flat
+_OUT_CHUNK = 64 * 1024
+
+
+class _Identity:
+    def feed(self, data: bytes) -> Iterator[bytes]:
+        yield data
+
+    def flush(self) -> bytes:
+        return b""
+
+
+class _Gunzip:
+    def __init__(self):
+        self._d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def feed(self, data: bytes) -> Iterator[bytes]:
+        while data:
+            out = self._d.decompress(data, _OUT_CHUNK)
+            if out:
+                yield out
+            data = self._d.unconsumed_tail
+
+    def flush(self) -> bytes:
+        return self._d.flush()
+
+
+class _NeedInput(Exception):
+    pass
+
+
+class _Pending:
+    """Source for zstd's stream_reader: hands over fed chunks, raises when empty."""
+
+    def __init__(self):
+        self.chunks: Deque[bytes] = deque()
+
+    def read(self, size: int = -1) -> bytes:
+        if not self.chunks:
+            raise _NeedInput
+        return self.chunks.popleft()
+
+
+class _Unzstd:
+    # decompressobj() has no output bound (one tiny frame can expand to GBs),
+    # so pull through stream_reader instead. read1() only asks the source for
+    # more input once it has nothing buffered to return, so raising _NeedInput
+    # there never drops output; each call yields at most _OUT_CHUNK bytes.
+    def __init__(self):
+        self._src = _Pending()
+        self._r = zstandard.ZstdDecompressor().stream_reader(self._src, read_across_frames=True)
+
+    def feed(self, data: bytes) -> Iterator[bytes]:
+        self._src.chunks.append(data)
+        while True:
+            try:
+                out = self._r.read1(_OUT_CHUNK)
+            except _NeedInput:
+                return
+            if not out:
+                return
+            yield out
+
+    def flush(self) -> bytes:
+        return b""
+
+
+def decoder_for(content_encoding: Optional[str]):
+    enc = (content_encoding or "identity").strip().lower()
+    if enc in ("", "identity"):
+        return _Identity()
+    if enc in ("gzip", "x-gzip"):
+        return _Gunzip()
+    if enc == "zstd":
+        if zstandard is None:
+            raise HTTPException(status_code=415, detail="zstd not supported (zstandard not installed)")
+        return _Unzstd()
+    raise HTTPException(status_code=415, detail=f"unsupported content-encoding: {enc}")
+
+
+async def read_body(chunks: AsyncIterator[bytes], content_encoding: Optional[str], max_bytes: int) -> bytes:
+    """
+    Whole request body, decoded per Content-Encoding as it streams in.
+    Fails with 413 as soon as the decoded size passes max_bytes, so a small
+    compressed body can't expand into an unbounded buffer.
+    """
+    dec = decoder_for(content_encoding)
+    out = bytearray()
+    too_large = HTTPException(status_code=413, detail=f"body too large (max {max_bytes} bytes decoded)")
+    async for chunk in chunks:
+        for data in dec.feed(chunk):
+            out += data
+            if len(out) > max_bytes:
+                raise too_large
+    out += dec.flush()
+    if len(out) > max_bytes:
+        raise too_large
+    return bytes(out)
+
+
+async def iter_lines(
+    chunks: AsyncIterator[bytes],
+    content_encoding: Optional[str],
+    max_line: int,
+) -> AsyncIterator[Optional[bytes]]:
+    """
+    Decodes a (possibly compressed) byte stream and yields one line at a time.
+    Lines longer than max_line are yielded as None and skipped, so at most
+    about max_line + one decompressed chunk is ever buffered.
+    """
+    dec = decoder_for(content_encoding)
+    buf = bytearray()
+    skipping = False  # inside an over-long line, discard until newline
+
+    def split(data: bytes) -> Iterator[Optional[bytes]]:
+        nonlocal skipping
+        buf.extend(data)
+        while True:
+            nl = buf.find(b"\n")
+            if nl < 0:
+                if len(buf) > max_line:
+                    if not skipping:
+                        skipping = True
+                        yield None
+                    buf.clear()
+                return
+            line = bytes(buf[:nl])
+            del buf[: nl + 1]
+            if skipping:
+                skipping = False
+                continue
+            if len(line) > max_line:
+                yield None
+            else:
+                yield line
+
+    async for chunk in chunks:
+        for data in dec.feed(chunk):
+            for line in split(data):
+                yield line
+    for line in split(dec.flush() + b"\n"):
+        yield line
+
+
+def parse_line(line: bytes) -> Row:
+    """Raises ValidationError for a bad line."""
+    return repo.dict_row(log_event_adapter.validate_json(line), repo.utc_now())
+
+
+def line_error(exc: ValidationError) -> str:
+    err = exc.errors(include_url=False)[0]
+    loc = ".".join(str(p) for p in err["loc"])
+    return f"{loc}: {err['msg']}" if loc else err["msg"]
+
+
+# ---- OpenAPI ----
+# Fast-path handlers read the raw body, so FastAPI can't derive the request
+# schema. Publish the LogEvent schema explicitly so /docs stays the same.
+
+def _inline_defs(schema: Dict[str, Any]) -> Dict[str, Any]:
+    defs = schema.pop("$defs", {})
+
+    def walk(node: Any) -> Any:
+        if isinstance(node, dict):
+            ref = node.get("$ref")
+            if isinstance(ref, str) and ref.startswith("#/$defs/"):
+                return walk(defs[ref.rsplit("/", 1)[-1]])
+            return {k: walk(v) for k, v in node.items()}
+        if isinstance(node, list):
+            return [walk(v) for v in node]
+        return node
+
+    return walk(schema)
+
+
+def openapi_body(many: bool) -> Dict[str, Any]:
+    schema = _inline_defs(TypeAdapter(List[LogEvent] if many else LogEvent).json_schema())
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": schema},
+                # same contract; occurredAt may also be a msgpack timestamp
+                "application/msgpack": {"schema": schema},
+            },
+        },
+        "parameters": [
+            {
+                "name": "Content-Encoding",
+                "in": "header",
+                "required": False,
+                "schema": {"type": "string", "enum": ["gzip", "zstd"]},
+                "description": "Compressed request body.",
+            }
+        ],
+    }
@@ -0,0 +1,167 @@
+"""
+Supervised multi-process launcher.
+
+    python -m app.launcher            # LIS_WORKERS processes on LIS_HOST:LIS_PORT
+
+Each worker is a full uvicorn server with its own Batcher (shared-nothing)
+on one socket bound here and inherited by all workers. The global DB
+connection budget (DB_CONN_BUDGET) is split evenly, so each worker's
+DB_POOL_MAX is budget // workers. Workers publish their batcher counters into
+a shared-memory slot file, and /internal/batcher on any worker reports the
+totals. The same file carries the drain flag, so /internal/drain on any
+worker drains (or resumes) all of them. Crashed workers are restarted with
+backoff.
+"""
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+from .settings import DB_CONN_BUDGET, DB_POOL_MIN, SHUTDOWN_DRAIN_SEC, SHUTDOWN_HTTP_GRACE_SEC, SPOOL_DIR
+
+multiprocessing.allow_connection_pickling()
+_spawn = multiprocessing.get_context("spawn")
+
+_RESTART_BACKOFF_MAX = 30.0
+
+log = logging.getLogger(__name__)
+
+
+def _serve(env: Dict[str, str], sock: socket.socket, app: str) -> None:
+    # settings are read at import time, so the env must be in place first
+    os.environ.update(env)
+    import uvicorn
+
+    config = uvicorn.Config(
+        app,
+        lifespan="on",
+        log_level=os.getenv("LIS_LOG_LEVEL", "info"),
+        # long-lived requests (stream ingest, live tail) must not hold up the drain
+        timeout_graceful_shutdown=SHUTDOWN_HTTP_GRACE_SEC,
+    )
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _stats_path() -> str:
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, f"lis-stats-{os.getpid()}")
+
+
+class Supervisor:
+    def __init__(self, workers: int, host: str, port: int, app: str = "app.main:app"):
+        self.workers = max(1, workers)
+        self.host = host
+        self.port = port
+        self.app = app
+        self.pool_max = max(1, DB_CONN_BUDGET // self.workers)
+        self.stats_path = _stats_path()
+
+        self._sock: Optional[socket.socket] = None
+        self._procs: List[Optional[multiprocessing.process.BaseProcess]] = [None] * self.workers
+        self._backoff = [0.0] * self.workers
+        self._next_start = [0.0] * self.workers
+        self._stopping = False
+
+    def _env(self, idx: int) -> Dict[str, str]:
+        return {
+            "DB_POOL_MAX": str(self.pool_max),
+            "DB_POOL_MIN": str(min(DB_POOL_MIN, self.pool_max)),
+            # a spool directory is single-writer
+            "SPOOL_DIR": os.path.join(SPOOL_DIR, f"w{idx}"),
+            "LIS_WORKER_INDEX": str(idx),
+            "LIS_WORKERS": str(self.workers),
+            "LIS_STATS_FILE": self.stats_path,
+        }
+
+    def _start(self, idx: int) -> None:
+        p = _spawn.Process(
+            target=_serve,
+            args=(self._env(idx), self._sock, self.app),
+            name=f"lis-worker-{idx}",
+        )
+        p.start()
+        self._procs[idx] = p
+
+    def run(self) -> None:
+        from .shared_stats import SharedStats
+
+        SharedStats(self.stats_path, self.workers, create=True).close()
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((self.host, self.port))
+        self._sock.listen(2048)
+        self._sock.set_inheritable(True)
+
+        signal.signal(signal.SIGINT, self._on_signal)
+        signal.signal(signal.SIGTERM, self._on_signal)
+
+        log.info(
+            "%d workers on %s:%d, DB_POOL_MAX=%d each (budget %d)",
+            self.workers, self.host, self.port, self.pool_max, DB_CONN_BUDGET,
+        )
+        for i in range(self.workers):
+            self._start(i)
+        try:
+            while not self._stopping:
+                self._supervise()
+                time.sleep(0.5)
+        finally:
+            self._shutdown()
+
+    def _supervise(self) -> None:
+        now = time.monotonic()
+        for i, p in enumerate(self._procs):
+            if p is not None and p.is_alive():
+                if now - self._next_start[i] > 60:
+                    self._backoff[i] = 0.0  # healthy for a minute: forget old crashes
+                continue
+            if p is not None:
+                p.join(0)
+                log.warning("worker %d (pid %s) exited with %s", i, p.pid, p.exitcode)
+                self._procs[i] = None
+                self._backoff[i] = min(_RESTART_BACKOFF_MAX, (self._backoff[i] * 2) or 0.5)
+                self._next_start[i] = now + self._backoff[i]
+            if now >= self._next_start[i]:
+                self._start(i)
+                self._next_start[i] = now
+
+    def _on_signal(self, signum, frame) -> None:
+        self._stopping = True
+
+    def _shutdown(self) -> None:
+        # SIGTERM lets each uvicorn worker run its lifespan shutdown (batcher drain)
+        for p in self._procs:
+            if p is not None and p.is_alive():
+                p.terminate()
+        for p in self._procs:
+            if p is not None:
+                # HTTP grace + batcher drain, plus slack for spooling the rest
+                p.join(timeout=SHUTDOWN_HTTP_GRACE_SEC + SHUTDOWN_DRAIN_SEC + 30)
+                if p.is_alive():
+                    p.kill()
+        if self._sock is not None:
+            self._sock.close()
+        try:
+            os.unlink(self.stats_path)
+        except FileNotFoundError:
+            pass
+
+
+def main() -> None:
+    logging.basicConfig(
+        level=os.getenv("LIS_LOG_LEVEL", "info").upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    Supervisor(
+        workers=int(os.getenv("LIS_WORKERS", str(os.cpu_count() or 1))),
+        host=os.getenv("LIS_HOST", "0.0.0.0"),
+        port=int(os.getenv("LIS_PORT", "8000")),
+    ).run()
+
+
+if __name__ == "__main__":
+    main()
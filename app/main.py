@@ -1,28 +1,197 @@
+import asyncio
+import logging
+import os
+import time
+from collections import Counter
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Depends, HTTPException
-from typing import List
+from datetime import datetime, timedelta, timezone
+from fastapi import FastAPI, Depends, HTTPException, Path, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import ValidationError
+from typing import List, Optional
 
-from .models import LogEvent, BatchIngestResponse
-from .security import require_token
-from . import db
+from .models import (
+    LogEvent,
+    LogLevel,
+    LogType,
+    BatchIngestResponse,
+    LineError,
+    StreamIngestResponse,
+)
+from .security import check_tenant, check_tenants, require_ingest_token, require_token, scoped_tenant
+from .settings import (
+    INGEST_FAST_PATH,
+    INGEST_MODE,
+    MQ_MAX_INFLIGHT,
+    PARTITION_ENABLED,
+    ROLLUP_ENABLED,
+    STATS_PUBLISH_SEC,
+    TRACE_MAX_EVENTS,
+    TRACE_CACHE_SIZE,
+    TRACE_CACHE_TTL_SEC,
+    STREAM_MAX_LINE_BYTES,
+    STREAM_ENQUEUE_TIMEOUT_SEC,
+    STREAM_MAX_ERRORS,
+    TENANT_LIMITS_RELOAD_SEC,
+    SEARCH_INDEX_BUILD,
+    INGEST_MAX_BODY_BYTES,
+    ARCHIVE_ENABLED,
+    DB_POOL_AUTOSIZE,
+)
+from . import apikeys, archive, db, ingest, metrics, mq, repo, rollups, schema, shared_stats, tail, tenants, traces
 from .batcher import Batcher
+from .consumer import BrokerConsumer
+from .partitions import PartitionManager, ensure_search_indexes
+
+log = logging.getLogger(__name__)
+
+# Broker mode: HTTP handlers still feed a Batcher, but its flush workers
+# publish (confirmed) batches to RabbitMQ instead of writing to Postgres;
+# MQ_MAX_INFLIGHT workers = bounded window of unconfirmed publishes.
+# The DB writer is app.consumer (run in-process only for RABBITMQ_URL=memory://).
+broker = mq.make_broker() if INGEST_MODE == "broker" else None
+consumer = None
+
+
+async def _publish_rows(rows):
+    await broker.publish(mq.encode_rows(rows))
+
+
+if broker is None:
+    # single in-process batcher instance
+    batcher = Batcher()
+else:
+    batcher = Batcher(workers=MQ_MAX_INFLIGHT, sink=_publish_rows)
+    if isinstance(broker, mq.MemoryBroker):
+        consumer = BrokerConsumer(broker)
+
+metrics.queue_depth.set_function(batcher.qsize)
+
+# per-tenant token buckets; same limits object as the batcher's fair queue
+rate_limiter = tenants.RateLimiter(batcher.limits)
+
+# whoever commits rows in this process gets the flush hooks
+db_writer = batcher if broker is None else consumer
+
+# connection limit follows the write backlog (broker mode: in-use/waiting only)
+pool_sizer = (
+    db.PoolSizer(lambda: batcher.qsize() if broker is None else 0, lambda: batcher.batch_size)
+    if DB_POOL_AUTOSIZE else None
+)
+
+# cold storage for rows retention removes (written by the partition manager)
+archiver = archive.Archiver() if ARCHIVE_ENABLED else None
+partitions = PartitionManager(archiver=archiver) if PARTITION_ENABLED else None
+
+# set when started by app.launcher: this worker's slot in the shared stats file
+cluster_stats = shared_stats.from_env()
+cluster_slot = int(os.getenv("LIS_WORKER_INDEX", "0"))
 
-# single in-process batcher instance
-batcher = Batcher()
+
+async def _publish_stats() -> None:
+    while True:
+        # /internal/drain on any worker sets the instance-wide flag; follow it
+        # (a worker restarted mid-drain starts draining here too)
+        draining = cluster_stats.draining()
+        if draining and not batcher.draining:
+            batcher.begin_drain()
+        elif not draining and batcher.draining:
+            batcher.resume()  # refused once shutdown has started
+        cluster_stats.publish(cluster_slot, batcher.stats())
+        await asyncio.sleep(STATS_PUBLISH_SEC)
+
+
+async def _reload_limits() -> None:
+    while True:
+        await asyncio.sleep(TENANT_LIMITS_RELOAD_SEC)
+        batcher.limits.maybe_reload()
+        rate_limiter.prune()
+
+
+async def _build_search_indexes() -> None:
+    # one-off catch-up for partitions from before migration 007
+    try:
+        async with db.acquire() as conn:
+            await ensure_search_indexes(conn)
+    except Exception:
+        pass  # retried on next start; search still works, just slower
+
+
+async def _load_trace(trace_id: str, tenant_id: Optional[str]):
+    # one extra row tells us whether the trace was truncated
+    return await repo.fetch_trace(trace_id, TRACE_MAX_EVENTS + 1, tenant_id)
+
+
+# with an out-of-process consumer, cached traces only expire by TTL
+trace_cache = traces.TraceCache(_load_trace, TRACE_CACHE_SIZE, TRACE_CACHE_TTL_SEC)
+if db_writer is not None:
+    db_writer.add_flush_hook(trace_cache.on_flush)
+
+# live tail sees batches on their way out of the batcher (any ingest mode)
+tail_hub = tail.TailHub()
+batcher.add_tap(tail_hub.publish)
+
+access_rollup = rollups.AccessRollup() if ROLLUP_ENABLED and db_writer is not None else None
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await db.connect()
+    # fail fast: without these columns every flush would fail
+    await schema.check()
+    await db.health.start()
+    if access_rollup is not None:
+        await access_rollup.install()
+    if pool_sizer is not None:
+        await pool_sizer.start()
+    await apikeys.store.start()
+    if partitions is not None:
+        # make sure today's partition exists before the first flush; if that
+        # fails, rows land in the default partition until the next run
+        try:
+            await partitions.run_once()
+        except Exception:
+            partitions.errors += 1
+            log.exception("partition maintenance failed at startup, retrying in the background")
+        await partitions.start()
+    if broker is not None:
+        await broker.connect()
+    if consumer is not None:
+        await consumer.start()
     await batcher.start()
+    stats_task = asyncio.create_task(_publish_stats()) if cluster_stats is not None else None
+    limits_task = asyncio.create_task(_reload_limits())
+    index_task = asyncio.create_task(_build_search_indexes()) if SEARCH_INDEX_BUILD and cluster_slot == 0 else None
     try:
         yield
     finally:
+        limits_task.cancel()
+        if index_task is not None:
+            index_task.cancel()
+        if stats_task is not None:
+            stats_task.cancel()
         await batcher.stop()
+        if cluster_stats is not None:
+            # final counters: they stay in the slot (and fold into the base of a
+            # restarted worker), so cluster totals don't drop when this one exits
+            cluster_stats.publish(cluster_slot, batcher.stats())
+        if consumer is not None:
+            await consumer.stop()
+        if broker is not None:
+            await broker.close()
+        if partitions is not None:
+            await partitions.stop()
+        await apikeys.store.stop()
+        if pool_sizer is not None:
+            # after the batcher: the drain may still need to grow the pool
+            await pool_sizer.stop()
+        await db.health.stop()
         await db.disconnect()
 
 
 app = FastAPI(title="LIS Log Ingestor", lifespan=lifespan)
+# long-lived streams get their own histogram instead of skewing request latency
+app.add_middleware(metrics.MetricsMiddleware, streaming=("/v1/logs/stream", "/v1/logs/tail"))
 
 
 @app.get("/health")
@@ -30,57 +199,537 @@ async def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/ready")
 async def ready():
-    try:
-        await db.ping()
-        return {"status": "ready"}
-    except Exception:
+    if batcher.draining:
+        raise HTTPException(status_code=503, detail="draining")
+    # last successful DB use (or background ping), no connection taken here
+    if not db.health.healthy():
         raise HTTPException(status_code=503, detail="db not ready")
+    return {"status": "ready"}
 
 
-@app.post(
-    "/v1/logs",
+# ingest handlers take require_ingest_token as a parameter: its result is the
+# tenant the API key may write, checked against every event
+_POST_LOG_ROUTE = dict(
+    methods=["POST"],
     status_code=202,
-    dependencies=[Depends(require_token)],
     summary="Ingest a single log event",
-    description="Accepts one log event and enqueues it for batched insert into Postgres."
+    description="Accepts one log event and enqueues it for batched insert into Postgres.",
+)
+
+_POST_LOGS_BATCH_ROUTE = dict(
+    methods=["POST"],
+    status_code=202,
+    response_model=BatchIngestResponse,
+    summary="Ingest multiple log events",
+    description="Accepts an array of log events and enqueues them for batched insert into Postgres.",
 )
-async def post_log(e: LogEvent):
+
+
+_I_TENANT = repo.COL["tenant_id"]
+
+
+def _rejected(reason: str, status_code: int, detail: str, headers=None) -> HTTPException:
+    # counted here, where the reason is known, not from the status code
+    metrics.ingest_rejected.inc(reason)
+    return HTTPException(status_code=status_code, detail=detail, headers=headers)
+
+
+def _check_ingest_tenants(scope: Optional[str], tenant_ids) -> None:
+    try:
+        check_tenants(scope, tenant_ids)
+    except HTTPException:
+        metrics.ingest_rejected.inc("forbidden")
+        raise
+
+
+def _check_accepting() -> None:
+    if batcher.draining:
+        # shutting down: the client should retry against another instance
+        raise _rejected("draining", 503, "shutting down", headers={"Retry-After": "1"})
+
+
+def _check_rate(counts) -> None:
+    limited = rate_limiter.take(counts)
+    if limited is not None:
+        tenant, retry_after = limited
+        if retry_after is None:
+            raise _rejected(
+                "rate_limited",
+                413,
+                f"batch has {counts[tenant]} events for tenant {tenant}, more than its "
+                f"rate limit burst ({rate_limiter.burst(tenant):g}); split it into smaller batches",
+            )
+        raise _rejected(
+            "rate_limited",
+            429,
+            f"rate limit exceeded for tenant {tenant}",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+
+async def post_log(e: LogEvent, scope: Optional[str] = Depends(require_ingest_token)):
+    _check_ingest_tenants(scope, (e.tenantId,))
+    _check_accepting()
+    _check_rate({e.tenantId: 1})
     ok = batcher.enqueue_nowait(e)
     if not ok:
         # backpressure when queue is full
-        raise HTTPException(status_code=503, detail="ingestor overloaded (queue full)")
+        raise _rejected("backpressure", 503, "ingestor overloaded (queue full)")
     return {"accepted": True}
 
 
-@app.post(
-    "/v1/logs/batch",
-    status_code=202,
-    response_model=BatchIngestResponse,
-    dependencies=[Depends(require_token)],
-    summary="Ingest multiple log events",
-    description="Accepts an array of log events and enqueues them for batched insert into Postgres."
-)
-async def post_logs_batch(events: List[LogEvent]):
+async def post_logs_batch(events: List[LogEvent], scope: Optional[str] = Depends(require_ingest_token)):
     if len(events) > 500:
         raise HTTPException(status_code=413, detail="batch too large (max 500)")
+    _check_ingest_tenants(scope, (e.tenantId for e in events))
+    _check_accepting()
+    _check_rate(Counter(e.tenantId for e in events))
 
     for e in events:
         if not batcher.enqueue_nowait(e):
-            raise HTTPException(status_code=503, detail="ingestor overloaded (queue full)")
+            raise _rejected("backpressure", 503, "ingestor overloaded (queue full)")
 
     return BatchIngestResponse(count=len(events))
 
-import os
+
+# Fast path: validate the raw body in one pass straight into row tuples.
+# Bodies may be gzip/zstd compressed and JSON or MessagePack.
+async def _read_body(request: Request) -> bytes:
+    return await ingest.read_body(request.stream(), request.headers.get("content-encoding"), INGEST_MAX_BODY_BYTES)
+
+
+async def post_log_raw(request: Request, scope: Optional[str] = Depends(require_ingest_token)):
+    row = ingest.parse_event(await _read_body(request), request.headers.get("content-type"))
+    _check_ingest_tenants(scope, (row[_I_TENANT],))
+    _check_accepting()
+    _check_rate({row[_I_TENANT]: 1})
+    if not batcher.enqueue_row_nowait(row):
+        raise _rejected("backpressure", 503, "ingestor overloaded (queue full)")
+    return {"accepted": True}
+
+
+async def post_logs_batch_raw(request: Request, scope: Optional[str] = Depends(require_ingest_token)):
+    rows = ingest.parse_batch(await _read_body(request), request.headers.get("content-type"))
+    if len(rows) > 500:
+        raise HTTPException(status_code=413, detail="batch too large (max 500)")
+    _check_ingest_tenants(scope, (r[_I_TENANT] for r in rows))
+    _check_accepting()
+    _check_rate(Counter(row[_I_TENANT] for row in rows))
+
+    for row in rows:
+        if not batcher.enqueue_row_nowait(row):
+            raise _rejected("backpressure", 503, "ingestor overloaded (queue full)")
+
+    return BatchIngestResponse(count=len(rows))
+
+
+if INGEST_FAST_PATH:
+    app.add_api_route("/v1/logs", post_log_raw, openapi_extra=ingest.openapi_body(many=False), **_POST_LOG_ROUTE)
+    app.add_api_route("/v1/logs/batch", post_logs_batch_raw, openapi_extra=ingest.openapi_body(many=True), **_POST_LOGS_BATCH_ROUTE)
+else:
+    app.add_api_route("/v1/logs", post_log, **_POST_LOG_ROUTE)
+    app.add_api_route("/v1/logs/batch", post_logs_batch, **_POST_LOGS_BATCH_ROUTE)
+
+
+@app.post(
+    "/v1/logs/stream",
+    status_code=202,
+    response_model=StreamIngestResponse,
+    summary="Stream log events as NDJSON",
+    description=(
+        "Accepts newline-delimited JSON (one log event per line), optionally "
+        "gzip- or zstd-compressed via Content-Encoding. Lines are validated and "
+        "queued as they arrive; when the queue is full the body is read more "
+        "slowly (up to a deadline) instead of being dropped."
+    ),
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/x-ndjson": {"schema": {"type": "string"}}},
+        }
+    },
+)
+async def post_logs_stream(request: Request, scope: Optional[str] = Depends(require_ingest_token)):
+    resp = StreamIngestResponse(accepted=0, rejected=0, lines=0)
+    lines = ingest.iter_lines(
+        request.stream(),
+        request.headers.get("content-encoding"),
+        STREAM_MAX_LINE_BYTES,
+    )
+
+    async for line in lines:
+        if line is not None and not line.strip():
+            continue
+        resp.lines += 1
+
+        if line is None:
+            err = f"line too long (max {STREAM_MAX_LINE_BYTES} bytes)"
+            row = None
+        else:
+            try:
+                row = ingest.parse_line(line)
+                err = None
+            except ValidationError as exc:
+                err = ingest.line_error(exc)
+                row = None
+            if row is not None and scope is not None and row[_I_TENANT] != scope:
+                err = f"tenantId: API key not valid for tenant {row[_I_TENANT]}"
+                row = None
+
+        if row is None:
+            resp.rejected += 1
+            if len(resp.errors) < STREAM_MAX_ERRORS:
+                resp.errors.append(LineError(line=resp.lines, error=err))
+            continue
+
+        tenant = row[_I_TENANT]
+        limited = rate_limiter.take({tenant: 1})
+        if limited is not None:
+            # over the tenant's rate: slow the reader down instead of failing,
+            # unless it would take longer than the enqueue deadline. Other
+            # requests share the bucket, so retry until the token is ours.
+            deadline = time.monotonic() + STREAM_ENQUEUE_TIMEOUT_SEC
+            while limited is not None:
+                retry_after = limited[1]
+                if retry_after is None or time.monotonic() + retry_after > deadline:
+                    metrics.ingest_rejected.inc("rate_limited")
+                    resp.rejected += 1
+                    resp.detail = f"rate limit exceeded for tenant {tenant}, stopped at line {resp.lines}"
+                    return JSONResponse(
+                        status_code=429,
+                        content=resp.model_dump(),
+                        headers={"Retry-After": str(retry_after or 1)},
+                    )
+                await asyncio.sleep(retry_after)
+                limited = rate_limiter.take({tenant: 1})
+
+        if not batcher.has_room(tenant):
+            # flow control: stop reading the body until the writers catch up
+            try:
+                queued = await asyncio.wait_for(batcher.enqueue_row(row), timeout=STREAM_ENQUEUE_TIMEOUT_SEC)
+            except asyncio.TimeoutError:
+                # lines after resp.lines were not read; the client can resume there
+                metrics.ingest_rejected.inc("backpressure")
+                resp.rejected += 1
+                resp.detail = f"ingestor overloaded (queue full), stopped at line {resp.lines}"
+                return JSONResponse(status_code=503, content=resp.model_dump())
+        else:
+            queued = batcher.enqueue_row_nowait(row)
+        if not queued:
+            # draining for shutdown (or lost the last free slot to another request)
+            resp.rejected += 1
+            metrics.ingest_rejected.inc("draining" if batcher.draining else "backpressure")
+            reason = "shutting down" if batcher.draining else "ingestor overloaded (queue full)"
+            resp.detail = f"{reason}, stopped at line {resp.lines}"
+            return JSONResponse(status_code=503, content=resp.model_dump(), headers={"Retry-After": "1"})
+        resp.accepted += 1
+
+    return resp
+
+
+@app.get(
+    "/v1/logs",
+    summary="Search log events",
+    description=(
+        "Returns matching events newest first as NDJSON. When the page is full "
+        "the last line is {\"nextCursor\": ...}; pass it back as `cursor` for "
+        "the next page (keyset pagination, no OFFSET)."
+    ),
+    response_class=StreamingResponse,
+)
+async def get_logs(
+    tenantId: Optional[str] = None,
+    source: Optional[str] = None,
+    level: Optional[LogLevel] = None,
+    type: Optional[LogType] = None,
+    since: Optional[datetime] = Query(default=None, alias="from"),
+    until: Optional[datetime] = Query(default=None, alias="to"),
+    traceId: Optional[str] = None,
+    statusCode: Optional[int] = Query(default=None, ge=100, le=599),
+    cursor: Optional[str] = None,
+    limit: int = Query(default=1000, ge=1, le=10_000),
+    scope: Optional[str] = Depends(require_token),
+):
+    # tenant-bound keys only ever see their own tenant
+    tenantId = scoped_tenant(scope, tenantId)
+    try:
+        after = repo.decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+
+    lines = repo.stream_logs(
+        tenant_id=tenantId,
+        source=source,
+        level=level.value if level else None,
+        type=type.value if type else None,
+        since=since,
+        until=until,
+        trace_id=traceId,
+        status_code=statusCode,
+        cursor=after,
+        limit=limit,
+    )
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+
+@app.get(
+    "/v1/logs/search",
+    summary="Full-text search over messages",
+    description=(
+        "Matches `q` against event messages (web search syntax: words, "
+        "\"quoted phrases\", `-excluded`, `or`) within one tenant and time "
+        "range (default: last 24 hours). Returns NDJSON, best match first, "
+        "each event with a `rank`; a full page ends with {\"nextCursor\": ...}."
+    ),
+    response_class=StreamingResponse,
+)
+async def search_logs(
+    q: str = Query(min_length=1, max_length=256),
+    tenantId: str = Query(min_length=2, max_length=64),
+    since: Optional[datetime] = Query(default=None, alias="from"),
+    until: Optional[datetime] = Query(default=None, alias="to"),
+    cursor: Optional[str] = None,
+    limit: int = Query(default=100, ge=1, le=1000),
+    scope: Optional[str] = Depends(require_token),
+):
+    check_tenant(scope, tenantId)
+    try:
+        after = repo.decode_search_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+
+    until = until or datetime.now(timezone.utc)
+    since = since or until - timedelta(hours=24)
+    lines = repo.search_logs(
+        query=q,
+        tenant_id=tenantId,
+        since=since,
+        until=until,
+        cursor=after,
+        limit=limit,
+    )
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+
+@app.get(
+    "/v1/logs/tail",
+    summary="Live tail",
+    description=(
+        "Server-sent events with each matching event as it leaves the ingest "
+        "queue (before it is written), one `data:` line per event. A client "
+        "that reads too slowly gets `event: lag` with the number of events "
+        "it missed, and is disconnected (`event: dropped`) if it keeps falling "
+        "behind. Only sees events ingested by this process."
+    ),
+    response_class=StreamingResponse,
+)
+async def tail_logs(
+    tenantId: str = Query(min_length=2, max_length=64),
+    source: Optional[str] = None,
+    level: Optional[LogLevel] = None,
+    traceId: Optional[str] = None,
+    scope: Optional[str] = Depends(require_token),
+):
+    check_tenant(scope, tenantId)
+    sub = tail.Subscriber(tenantId, source=source, level=level.value if level else None, trace_id=traceId)
+    if tail_hub.full():
+        raise HTTPException(status_code=503, detail="too many tail sessions")
+    return StreamingResponse(
+        tail_hub.stream(sub),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _as_utc(ts: datetime) -> datetime:
+    # archived timestamps are aware; a naive one from the query is taken as UTC
+    return ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts.astimezone(timezone.utc)
+
+
+@app.get(
+    "/v1/archive/logs",
+    summary="Read archived log events",
+    description=(
+        "Events of one tenant that retention moved to the archive, oldest "
+        "first, as NDJSON. Only archive files (and row groups) overlapping "
+        "the time range are read. A full page ends with "
+        "{\"nextCursor\": ...}; pass it back as `cursor`."
+    ),
+    response_class=StreamingResponse,
+)
+async def get_archived_logs(
+    tenantId: str = Query(min_length=2, max_length=64),
+    since: datetime = Query(alias="from"),
+    until: datetime = Query(alias="to"),
+    cursor: Optional[str] = None,
+    limit: int = Query(default=1000, ge=1, le=10_000),
+    scope: Optional[str] = Depends(require_token),
+):
+    check_tenant(scope, tenantId)
+    if archiver is None:
+        raise HTTPException(status_code=404, detail="archive is not enabled")
+    try:
+        after = repo.decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    if after is not None:
+        after = (_as_utc(after[0]), after[1])
+
+    lines = archive.read_archive(
+        archiver.store,
+        tenant_id=tenantId,
+        since=_as_utc(since),
+        until=_as_utc(until),
+        cursor=after,
+        limit=limit,
+    )
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+
+@app.get(
+    "/v1/traces/{trace_id}",
+    summary="Reconstruct a trace",
+    description=(
+        "Returns all events of a trace ordered by time, grouped by spanId. "
+        "Recently assembled traces are served from an in-process cache that is "
+        "invalidated when new events for the trace are flushed."
+    ),
+)
+async def get_trace(
+    trace_id: str = Path(min_length=1, max_length=128),
+    tenantId: Optional[str] = None,
+    scope: Optional[str] = Depends(require_token),
+):
+    # filtered in the query (and cached per tenant), so truncation is per tenant too
+    events = await trace_cache.get(trace_id, scoped_tenant(scope, tenantId))
+    truncated = len(events) > TRACE_MAX_EVENTS
+    events = events[:TRACE_MAX_EVENTS]
+    if not events:
+        raise HTTPException(status_code=404, detail="trace not found")
+    return traces.assemble(trace_id, events, truncated)
+
+
+@app.get(
+    "/v1/metrics/access",
+    summary="Access-log metrics",
+    description=(
+        "Request counts and latency (avg/max/p50/p95/p99, estimated from "
+        "histograms) per path, method and status class, read from the "
+        "per-minute rollup table. Defaults to the last hour."
+    ),
+)
+async def get_access_metrics(
+    tenantId: str = Query(min_length=2, max_length=64),
+    since: Optional[datetime] = Query(default=None, alias="from"),
+    until: Optional[datetime] = Query(default=None, alias="to"),
+    source: Optional[str] = None,
+    path: Optional[str] = None,
+    method: Optional[str] = None,
+    statusClass: Optional[int] = Query(default=None, ge=1, le=5, description="1..5 for 1xx..5xx"),
+    interval: str = Query(default="minute", pattern="^(minute|hour|day)$"),
+    scope: Optional[str] = Depends(require_token),
+):
+    check_tenant(scope, tenantId)
+    until = until or datetime.now(timezone.utc)
+    since = since or until - timedelta(hours=1)
+    rows = await repo.fetch_access_rollups(
+        tenant_id=tenantId,
+        since=since,
+        until=until,
+        source=source,
+        path=path,
+        method=method,
+        status_class=statusClass,
+    )
+    return {
+        "tenantId": tenantId,
+        "from": since,
+        "to": until,
+        "interval": interval,
+        "series": rollups.summarize(rows, interval),
+    }
+
+
 # Optional: quick visibility during load testing (remove later if you want)
+def _require_admin(request: Request, scope: Optional[str]) -> None:
+    # an all-tenant key; with auth off (local dev) only from this host
+    if scope is not None:
+        raise HTTPException(status_code=403, detail="needs an all-tenant key")
+    if apikeys.store.open:
+        host = request.client.host if request.client else ""
+        if host not in ("127.0.0.1", "::1"):
+            raise HTTPException(status_code=403, detail="local requests only while auth is off")
+
+
 @app.get("/internal/batcher")
-async def batcher_stats():
+async def batcher_stats(request: Request, scope: Optional[str] = Depends(require_token)):
+    # per-tenant queues and limits, key stats: not for tenants
+    _require_admin(request, scope)
+    return {
+        "pid": os.getpid(),
+        **batcher.stats(),
+        "rate_limiter": rate_limiter.stats(),
+        "api_keys": apikeys.store.stats(),
+        "tenant_limits": batcher.limits.stats(),
+        "storage": repo.compact_stats(),
+        "db_pool": {
+            **db.pool_stats(),
+            "sizer": pool_sizer.stats() if pool_sizer is not None else None,
+            "health": db.health.stats(),
+        },
+        "trace_cache": trace_cache.stats(),
+        "tail": tail_hub.stats(),
+        "access_rollup": access_rollup.stats() if access_rollup is not None else None,
+        "ingest_mode": INGEST_MODE,
+        "consumer": consumer.stats() if consumer is not None else None,
+        # all launcher workers summed (None when running a single process)
+        "cluster": cluster_stats.aggregate() if cluster_stats is not None else None,
+    }
+
+
+@app.post("/internal/drain")
+async def drain(request: Request, scope: Optional[str] = Depends(require_token)):
+    # for a preStop hook: /ready turns 503 and ingest is refused while the
+    # queue keeps flushing; SIGTERM then finishes the drain. Under the
+    # launcher only this worker got the request: the others follow the flag
+    # in the shared stats file within STATS_PUBLISH_SEC.
+    _require_admin(request, scope)
+    batcher.begin_drain()
+    if cluster_stats is not None:
+        cluster_stats.set_draining(True)
     return {
+        "draining": True,
+        "workers": cluster_stats.slots if cluster_stats is not None else 1,
         "pid": os.getpid(),
-        "queued": batcher._q.qsize(),  # ok for internal endpoint; keep private
-        "enqueued": batcher.enqueued,
-        "flushed": batcher.flushed,
-        "dropped": batcher.dropped,
-        "flush_errors": batcher.flush_errors,
+        "queued": batcher.qsize(),  # this worker's
     }
+
+
+@app.delete("/internal/drain")
+async def resume(request: Request, scope: Optional[str] = Depends(require_token)):
+    # takes the worker back into rotation (a preStop that was not followed by SIGTERM)
+    _require_admin(request, scope)
+    if not batcher.resume():
+        raise HTTPException(status_code=409, detail="shutting down")
+    if cluster_stats is not None:
+        cluster_stats.set_draining(False)
+    return {
+        "draining": False,
+        "workers": cluster_stats.slots if cluster_stats is not None else 1,
+        "pid": os.getpid(),
+    }
+
+
+@app.get("/internal/partitions")
+async def partition_stats(request: Request, scope: Optional[str] = Depends(require_token)):
+    _require_admin(request, scope)
+    if partitions is None:
+        return {"enabled": False}
+    return {"enabled": True, **partitions.stats()}
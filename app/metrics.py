@@ -0,0 +1,201 @@
+"""
+Minimal Prometheus text-format metrics for the ingest hot path.
+
+Everything here runs on the event loop thread, so counters are plain
+attribute/dict updates: no locks, and no allocation once a label set has
+been seen. Histograms use fixed bucket bounds (bisect + two increments).
+Exposed by GET /metrics.
+"""
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from time import perf_counter
+from typing import Callable, Dict, List, Sequence, Tuple
+
+Labels = Tuple[str, ...]
+
+# seconds; covers sub-ms handler time up to multi-second DB stalls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# seconds; streams stay open from a moment to hours
+STREAM_BUCKETS = (0.1, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0, 3600.0, 14400.0)
+SIZE_BUCKETS = (1, 10, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_registry: List["_Metric"] = []
+
+
+def _fmt_labels(names: Sequence[str], values: Labels, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        _registry.append(self)
+
+    @abstractmethod
+    def _samples(self) -> List[str]:
+        ...
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", *self._samples()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Labels, float] = {} if labelnames else {(): 0}
+
+    def inc(self, *labels: str, by: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + by
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_num(v)}" for k, v in self._values.items()]
+
+
+class Gauge(_Metric):
+    """Read at scrape time from a callback (queue depth, pool size...)."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, fn: Callable[[], float]):
+        super().__init__(name, help)
+        self._fn = fn
+
+    def set_function(self, fn: Callable[[], float]) -> None:
+        self._fn = fn
+
+    def _samples(self) -> List[str]:
+        try:
+            v = self._fn()
+        except Exception:
+            return []
+        return [f"{self.name} {_fmt_num(v)}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+        # per label set: [count per bucket (+Inf last)..., sum]
+        self._data: Dict[Labels, List[float]] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        d = self._data.get(labels)
+        if d is None:
+            d = self._data[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        d[bisect_left(self.buckets, value)] += 1
+        d[-1] += value
+
+    def _samples(self) -> List[str]:
+        out: List[str] = []
+        for labels, d in self._data.items():
+            cum = 0
+            for bound, n in zip(self.buckets + (float("inf"),), d[:-1]):
+                cum += n
+                le = 'le="' + _fmt_num(bound) + '"'
+                out.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, labels, le)} {cum}")
+            lbl = _fmt_labels(self.labelnames, labels)
+            out.append(f"{self.name}_sum{lbl} {_fmt_num(d[-1])}")
+            out.append(f"{self.name}_count{lbl} {cum}")
+        return out
+
+
+def render() -> str:
+    lines: List[str] = []
+    for m in _registry:
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+
+# ---- Metrics ----
+
+http_request_seconds = Histogram(
+    "lis_http_request_duration_seconds", "HTTP request latency by route.", ("method", "route", "status"),
+)
+http_stream_seconds = Histogram(
+    "lis_http_stream_duration_seconds", "Duration of streaming requests (NDJSON ingest, live tail).",
+    ("method", "route", "status"), buckets=STREAM_BUCKETS,
+)
+ingest_rejected = Counter(
+    "lis_ingest_rejected_total", "Requests (or stream remainders) refused by the ingest handlers.", ("reason",),
+)
+sampled_out = Counter(
+    "lis_ingest_sampled_out_total", "Events dropped by the sampling/shedding policy.", ("level",),
+)
+queue_depth = Gauge("lis_batcher_queue_depth", "Events waiting in the batcher queue.", lambda: 0)
+queue_wait_seconds = Histogram(
+    "lis_batcher_queue_wait_seconds", "Time each event spent queued before a flush worker took it.",
+)
+batch_size = Histogram("lis_batch_size", "Rows per flushed batch.", buckets=SIZE_BUCKETS)
+insert_batch_seconds = Histogram(
+    "lis_insert_batch_duration_seconds", "Batch write latency (COPY/executemany or publish).", ("result",),
+)
+pool_acquire_seconds = Histogram(
+    "lis_db_pool_acquire_seconds", "Time spent waiting for a connection from the asyncpg pool.",
+)
+pool_size = Gauge("lis_db_pool_size", "Open connections in the asyncpg pool.", lambda: 0)
+pool_in_use = Gauge("lis_db_pool_in_use", "Pool connections currently checked out.", lambda: 0)
+pool_idle = Gauge("lis_db_pool_idle", "Open pool connections not checked out.", lambda: 0)
+pool_waiting = Gauge("lis_db_pool_waiting", "Tasks waiting for a connection.", lambda: 0)
+pool_limit = Gauge("lis_db_pool_limit", "Connection limit set by the pool sizer.", lambda: 0)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (no BaseHTTPMiddleware task/stream overhead).
+    Requests on `streaming` routes (held open for minutes) are timed in
+    http_stream_seconds, not http_request_seconds. Ingest rejections are
+    counted by the handlers, which know the reason.
+    """
+
+    def __init__(self, app, streaming: Sequence[str] = ()):
+        self.app = app
+        self.streaming = frozenset(streaming)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def _send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        t0 = perf_counter()
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            route = scope.get("route")
+            if route is not None:
+                path = route.path
+            elif "endpoint" in scope:
+                path = scope["path"]  # plain Starlette route (docs/openapi), fixed path
+            else:
+                path = "unmatched"
+            if path in self.streaming:
+                http_stream_seconds.observe(perf_counter() - t0, scope["method"], path, str(status))
+            else:
+                http_request_seconds.observe(perf_counter() - t0, scope["method"], path, str(status))
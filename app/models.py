@@ -4,7 +4,8 @@ from datetime import datetime
 from enum import Enum
 from typing import Any, Dict, Optional, List
 
-from pydantic import BaseModel, Field, ConfigDict, field_validator
+from pydantic import BaseModel, BeforeValidator, Field, ConfigDict, TypeAdapter, field_validator
+from typing_extensions import Annotated, NotRequired, TypedDict
 
 
 class Environment(str, Enum):
@@ -28,6 +29,32 @@ class LogType(str, Enum):
     ui = "ui"
 
 
+def _clean_ident(v: Any) -> Any:
+    """
+    Swagger defaults to 'string'. People often submit that by accident.
+    Reject obvious placeholder values and empty strings.
+    """
+    if v is None:
+        return v
+    if isinstance(v, str):
+        s = v.strip()
+        if s == "" or s.lower() == "string":
+            raise ValueError("must be a real value, not empty/'string'")
+        return s
+    return v
+
+
+def _clean_message(v: Any) -> Any:
+    if isinstance(v, str):
+        s = v.strip()
+        if s == "":
+            raise ValueError("message cannot be empty")
+        if s.lower() == "string":
+            raise ValueError("message must be a real value, not 'string'")
+        return s
+    return v
+
+
 # ---- Models ----
 class LogEvent(BaseModel):
     """
@@ -51,6 +78,17 @@ class LogEvent(BaseModel):
 
     message: str = Field(..., min_length=1, max_length=2048, description="Human-readable message.")
 
+    # idempotency: retries with the same eventId (per tenant) are stored once
+    eventId: Optional[str] = Field(
+        default=None,
+        max_length=128,
+        description="Client-generated id (e.g. a UUID) used to drop retried duplicates. "
+        "Set occurredAt too: without it only retries that reach the same instance "
+        "within the dedup window are caught. "
+        "Without eventId, events that set occurredAt are de-duplicated by content "
+        "only when the server runs with DEDUP_CONTENT_HASH.",
+    )
+
     # tracing / correlation
     traceId: Optional[str] = Field(default=None, max_length=128)
     spanId: Optional[str] = Field(default=None, max_length=128)
@@ -79,30 +117,44 @@ class LogEvent(BaseModel):
     @field_validator("tenantId", "source", mode="before")
     @classmethod
     def strip_and_reject_default_swagger_strings(cls, v: Any) -> Any:
-        """
-        Swagger defaults to 'string'. People often submit that by accident.
-        Reject obvious placeholder values and empty strings.
-        """
-        if v is None:
-            return v
-        if isinstance(v, str):
-            s = v.strip()
-            if s == "" or s.lower() == "string":
-                raise ValueError("must be a real value, not empty/'string'")
-            return s
-        return v
+        return _clean_ident(v)
 
     @field_validator("message", mode="before")
     @classmethod
     def message_not_placeholder(cls, v: Any) -> Any:
-        if isinstance(v, str):
-            s = v.strip()
-            if s == "":
-                raise ValueError("message cannot be empty")
-            if s.lower() == "string":
-                raise ValueError("message must be a real value, not 'string'")
-            return s
-        return v
+        return _clean_message(v)
+
+
+# ---- Fast-path contract ----
+# Same rules as LogEvent, but validated straight from raw JSON bytes into
+# plain dicts (no model instances). Used by the fast ingest path, which turns
+# the dicts into row tuples for the Batcher.
+class LogEventDict(TypedDict):
+    __pydantic_config__ = ConfigDict(extra="forbid", use_enum_values=True)  # type: ignore[misc]
+
+    occurredAt: NotRequired[Optional[datetime]]
+    tenantId: Annotated[str, BeforeValidator(_clean_ident), Field(min_length=2, max_length=64)]
+    source: Annotated[str, BeforeValidator(_clean_ident), Field(min_length=2, max_length=64)]
+    environment: Environment
+    level: LogLevel
+    type: LogType
+    message: Annotated[str, BeforeValidator(_clean_message), Field(min_length=1, max_length=2048)]
+    eventId: NotRequired[Optional[Annotated[str, Field(max_length=128)]]]
+    traceId: NotRequired[Optional[Annotated[str, Field(max_length=128)]]]
+    spanId: NotRequired[Optional[Annotated[str, Field(max_length=128)]]]
+    correlationId: NotRequired[Optional[Annotated[str, Field(max_length=128)]]]
+    requestId: NotRequired[Optional[Annotated[str, Field(max_length=128)]]]
+    userId: NotRequired[Optional[Annotated[str, Field(max_length=128)]]]
+    path: NotRequired[Optional[Annotated[str, Field(max_length=512)]]]
+    method: NotRequired[Optional[Annotated[str, Field(max_length=16)]]]
+    statusCode: NotRequired[Optional[Annotated[int, Field(ge=100, le=599)]]]
+    durationMs: NotRequired[Optional[Annotated[int, Field(ge=0, le=60_000_000)]]]
+    exception: NotRequired[Optional[Dict[str, Any]]]
+    properties: NotRequired[Optional[Dict[str, Any]]]
+
+
+log_event_adapter: TypeAdapter[LogEventDict] = TypeAdapter(LogEventDict)
+log_batch_adapter: TypeAdapter[List[LogEventDict]] = TypeAdapter(List[LogEventDict])
 
 
 class BatchIngestResponse(BaseModel):
@@ -111,6 +163,20 @@ class BatchIngestResponse(BaseModel):
     count: int = Field(ge=0)
 
 
+class LineError(BaseModel):
+    line: int
+    error: str
+
+
+class StreamIngestResponse(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+    accepted: int = Field(ge=0)
+    rejected: int = Field(ge=0)
+    lines: int = Field(ge=0, description="Non-empty lines read from the body.")
+    errors: List[LineError] = Field(default_factory=list, description="First few rejected lines.")
+    detail: Optional[str] = None
+
+
 # ---- Swagger Examples ----
 # This makes /docs show realistic payloads instead of placeholder "string".
 LogEvent.model_config["json_schema_extra"] = {
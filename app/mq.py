@@ -1,10 +1,14 @@
+import asyncio
 import json
-from typing import Any, Dict, List, Optional
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 
 import aio_pika
 from aio_pika import Message, DeliveryMode
 
-from .settings import RABBITMQ_URL, LOG_QUEUE, LOG_DLQ
+from .models import log_event_adapter
+from .repo import COLUMNS, Row, dict_row, row_from_json, row_to_json, utc_now
+from .settings import RABBITMQ_URL, LOG_QUEUE, LOG_DLQ, MQ_PREFETCH
 
 _connection: aio_pika.RobustConnection | None = None
 _channel: aio_pika.RobustChannel | None = None
@@ -59,3 +63,198 @@ async def publish_batch(events: List[Dict[str, Any]]) -> None:
     body = json.dumps({"kind": "batch", "events": events}, ensure_ascii=False).encode("utf-8")
     msg = Message(body=body, delivery_mode=DeliveryMode.PERSISTENT)
     await ch.default_exchange.publish(msg, routing_key=LOG_QUEUE)
+
+
+# ---- Broker abstraction (broker ingest mode) ----
+# The HTTP side publishes with RabbitBroker.publish (confirmed); the consumer
+# worker (app/consumer.py) takes Deliveries via consume(). MemoryBroker is a
+# drop-in stand-in for local runs and tests (RABBITMQ_URL=memory://).
+
+class Delivery(ABC):
+    """One received message. Exactly one of ack/reject/requeue must be called."""
+
+    def __init__(self, body: bytes):
+        self.body = body
+
+    @abstractmethod
+    async def ack(self) -> None:
+        ...
+
+    @abstractmethod
+    async def reject(self) -> None:
+        """Dead-letters the message (poison)."""
+
+    @abstractmethod
+    async def requeue(self) -> None:
+        """Returns the message to the queue (transient failure)."""
+
+
+OnDelivery = Callable[[Delivery], Awaitable[None]]
+
+
+class _RabbitDelivery(Delivery):
+    def __init__(self, msg: aio_pika.abc.AbstractIncomingMessage):
+        super().__init__(msg.body)
+        self._msg = msg
+
+    async def ack(self) -> None:
+        await self._msg.ack()
+
+    async def reject(self) -> None:
+        # main queue dead-letters to LOG_DLQ
+        await self._msg.reject(requeue=False)
+
+    async def requeue(self) -> None:
+        await self._msg.nack(requeue=True)
+
+
+class RabbitBroker:
+    """Own connection/channel with publisher confirms and a prefetch limit."""
+
+    def __init__(self, url: str = RABBITMQ_URL, prefetch: int = MQ_PREFETCH):
+        self.url = url
+        self.prefetch = prefetch
+        self._connection: Optional[aio_pika.abc.AbstractRobustConnection] = None
+        self._channel: Optional[aio_pika.abc.AbstractChannel] = None
+        self._queue: Optional[aio_pika.abc.AbstractQueue] = None
+
+    async def connect(self) -> None:
+        self._connection = await aio_pika.connect_robust(self.url)
+        # with confirms on, publish() returns only once the broker has the message
+        self._channel = await self._connection.channel(publisher_confirms=True)
+        await self._channel.set_qos(prefetch_count=self.prefetch)
+        await self._channel.declare_queue(LOG_DLQ, durable=True)
+        self._queue = await self._channel.declare_queue(
+            LOG_QUEUE,
+            durable=True,
+            arguments={"x-dead-letter-exchange": "", "x-dead-letter-routing-key": LOG_DLQ},
+        )
+
+    async def close(self) -> None:
+        if self._channel:
+            await self._channel.close()
+        if self._connection:
+            await self._connection.close()
+        self._connection = self._channel = self._queue = None
+
+    async def publish(self, body: bytes) -> None:
+        if self._channel is None:
+            raise RuntimeError("RabbitMQ channel not initialized")
+        msg = Message(body=body, delivery_mode=DeliveryMode.PERSISTENT, content_type="application/json")
+        await self._channel.default_exchange.publish(msg, routing_key=LOG_QUEUE)
+
+    async def dead_letter(self, body: bytes) -> None:
+        """Publishes straight to LOG_DLQ (e.g. the bad rows of a message)."""
+        if self._channel is None:
+            raise RuntimeError("RabbitMQ channel not initialized")
+        msg = Message(body=body, delivery_mode=DeliveryMode.PERSISTENT, content_type="application/json")
+        await self._channel.default_exchange.publish(msg, routing_key=LOG_DLQ)
+
+    async def consume(self, on_delivery: OnDelivery) -> None:
+        if self._queue is None:
+            raise RuntimeError("RabbitMQ queue not initialized")
+
+        async def _cb(msg: aio_pika.abc.AbstractIncomingMessage) -> None:
+            await on_delivery(_RabbitDelivery(msg))
+
+        await self._queue.consume(_cb)
+
+
+class _MemoryDelivery(Delivery):
+    def __init__(self, broker: "MemoryBroker", body: bytes):
+        super().__init__(body)
+        self._broker = broker
+
+    async def ack(self) -> None:
+        self._broker._settle()
+
+    async def reject(self) -> None:
+        self._broker.dlq.append(self.body)
+        self._broker._settle()
+
+    async def requeue(self) -> None:
+        self._broker._q.put_nowait(self.body)
+        self._broker._settle()
+
+
+class MemoryBroker:
+    """In-process stand-in for RabbitBroker (same publish/consume/prefetch semantics)."""
+
+    def __init__(self, prefetch: int = MQ_PREFETCH):
+        self.prefetch = prefetch
+        self._q: asyncio.Queue[bytes] = asyncio.Queue()
+        self._unacked = asyncio.Semaphore(prefetch)
+        self._task: Optional[asyncio.Task] = None
+        self.dlq: List[bytes] = []
+        self.published = 0
+
+    async def connect(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def publish(self, body: bytes) -> None:
+        self._q.put_nowait(body)
+        self.published += 1
+
+    async def dead_letter(self, body: bytes) -> None:
+        self.dlq.append(body)
+
+    async def consume(self, on_delivery: OnDelivery) -> None:
+        async def _pump() -> None:
+            while True:
+                await self._unacked.acquire()
+                body = await self._q.get()
+                await on_delivery(_MemoryDelivery(self, body))
+
+        self._task = asyncio.create_task(_pump(), name="memory-broker")
+
+    def _settle(self) -> None:
+        self._unacked.release()
+
+    def qsize(self) -> int:
+        return self._q.qsize()
+
+
+def make_broker(url: str = RABBITMQ_URL):
+    return MemoryBroker() if url.startswith("memory://") else RabbitBroker(url)
+
+
+# ---- Message bodies ----
+
+def encode_rows(rows: List[Row]) -> bytes:
+    return json.dumps(
+        {"kind": "rows", "rows": [row_to_json(r) for r in rows]},
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def decode_message(body: bytes) -> List[Row]:
+    """
+    Rows from any message kind we publish: "rows" (broker ingest mode) or
+    "single"/"batch" event dicts (publish_event/publish_batch).
+    Raises on anything malformed; callers dead-letter those.
+    """
+    msg = json.loads(body)
+    kind = msg.get("kind")
+    if kind == "rows":
+        rows = [row_from_json(r) for r in msg["rows"]]
+        if any(len(r) != len(COLUMNS) for r in rows):
+            raise ValueError("row has wrong number of columns")
+        return rows
+    if kind == "single":
+        events = [msg["event"]]
+    elif kind == "batch":
+        events = msg["events"]
+    else:
+        raise ValueError(f"unknown message kind: {kind!r}")
+    now = utc_now()
+    return [dict_row(log_event_adapter.validate_python(e), now) for e in events]
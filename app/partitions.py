@@ -0,0 +1,318 @@
+import asyncio
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import app.db as db
+from .archive import Archiver
+from .settings import (
+    PARTITION_INTERVAL,
+    PARTITION_PREMAKE,
+    PARTITION_CHECK_SEC,
+    PARTITION_EXPIRE_ACTION,
+    RETENTION_DAYS,
+    RETENTION_DELETE_CHUNK,
+)
+
+PARENT = "log_events"
+DEFAULT_PARTITION = "log_events_default"
+
+# pg advisory lock held for a maintenance run, so only one worker (of every
+# instance on this database) creates/expires/archives partitions at a time
+_LOCK_ID = 0x6C6F67_70617274  # "log" "part"
+
+_LIST_SQL = """
+SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) AS bound
+FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = 'log_events'::regclass
+"""
+
+# FOR VALUES FROM ('2026-01-01 00:00:00+00') TO ('2026-01-02 00:00:00+00')
+_BOUND_RE = re.compile(r"FROM \((MINVALUE|'[^']*')\) TO \((MAXVALUE|'[^']*')\)")
+
+
+@dataclass
+class Partition:
+    name: str
+    start: Optional[datetime]  # None = MINVALUE
+    end: Optional[datetime]    # None = MAXVALUE
+
+
+def _parse_bound(v: str) -> Optional[datetime]:
+    if v in ("MINVALUE", "MAXVALUE"):
+        return None
+    return datetime.fromisoformat(v.strip("'"))
+
+
+def _step(interval: str) -> timedelta:
+    return timedelta(hours=1) if interval == "hour" else timedelta(days=1)
+
+
+def _floor(ts: datetime, interval: str) -> datetime:
+    ts = ts.astimezone(timezone.utc)
+    if interval == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def partition_name(start: datetime, interval: str) -> str:
+    fmt = "%Y%m%d%H" if interval == "hour" else "%Y%m%d"
+    return f"{PARENT}_p{start.strftime(fmt)}"
+
+
+def _overlaps(p: Partition, start: datetime, end: datetime) -> bool:
+    lo_ok = p.start is None or p.start < end
+    hi_ok = p.end is None or p.end > start
+    return lo_ok and hi_ok
+
+
+async def list_partitions(conn) -> List[Partition]:
+    out: List[Partition] = []
+    for r in await conn.fetch(_LIST_SQL):
+        m = _BOUND_RE.search(r["bound"])
+        if m is None:  # DEFAULT partition
+            continue
+        out.append(Partition(r["relname"], _parse_bound(m.group(1)), _parse_bound(m.group(2))))
+    out.sort(key=lambda p: p.start or datetime.min.replace(tzinfo=timezone.utc))
+    return out
+
+
+async def create_partition(conn, start: datetime, end: datetime, name: str) -> None:
+    """
+    Creates and attaches one range partition. Rows for that range that already
+    sit in the default partition are moved over in the same transaction,
+    otherwise ATTACH would fail on the default partition's constraint.
+    """
+    lo, hi = start.isoformat(), end.isoformat()
+    async with conn.transaction():
+        await conn.execute(
+            f'CREATE TABLE IF NOT EXISTS "{name}" (LIKE {PARENT} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+        )
+        await conn.execute(
+            f"""
+            WITH moved AS (
+              DELETE FROM {DEFAULT_PARTITION}
+              WHERE occurred_at >= $1 AND occurred_at < $2
+              RETURNING *
+            )
+            INSERT INTO "{name}" SELECT * FROM moved
+            """,
+            start, end,
+        )
+        await conn.execute(
+            f"ALTER TABLE {PARENT} ATTACH PARTITION \"{name}\" FOR VALUES FROM ('{lo}') TO ('{hi}')"
+        )
+
+
+SEARCH_INDEX = "idx_log_events_search"
+
+# partitions with no index attached to the parent search index yet
+_MISSING_SEARCH_INDEX_SQL = """
+SELECT c.relname
+FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = 'log_events'::regclass
+  AND to_regclass($1) IS NOT NULL
+  AND NOT EXISTS (
+    SELECT 1
+    FROM pg_index x
+    JOIN pg_inherits xi ON xi.inhrelid = x.indexrelid
+    WHERE x.indrelid = c.oid AND xi.inhparent = to_regclass($1)
+  )
+"""
+
+
+async def ensure_search_indexes(conn) -> List[str]:
+    """
+    Builds the search index on partitions that predate migration 007, one at
+    a time with CONCURRENTLY (no write lock), and attaches each to the
+    parent index. Safe to re-run; returns the partitions it indexed.
+    """
+    done = []
+    for r in await conn.fetch(_MISSING_SEARCH_INDEX_SQL, SEARCH_INDEX):
+        rel = r["relname"]
+        idx = f"{rel}_search_idx"
+        # a failed CONCURRENTLY build leaves an invalid index behind
+        await conn.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{idx}"')
+        await conn.execute(
+            f'CREATE INDEX CONCURRENTLY "{idx}" ON "{rel}" '
+            "USING gin (lis_search_doc(message, message_params)) "
+            "WITH (fastupdate = on, gin_pending_list_limit = 16384)"
+        )
+        await conn.execute(f'ALTER INDEX {SEARCH_INDEX} ATTACH PARTITION "{idx}"')
+        done.append(rel)
+    return done
+
+
+async def retention_policies(conn) -> Dict[str, int]:
+    rows = await conn.fetch("SELECT tenant_id, retention_days FROM log_retention_policies")
+    return {r["tenant_id"]: r["retention_days"] for r in rows}
+
+
+class PartitionManager:
+    """
+    Background job that keeps log_events partitions in shape:
+      - pre-creates the current and next PARTITION_PREMAKE partitions
+      - drops/detaches partitions older than the longest retention window
+      - deletes rows of tenants whose own retention is shorter, in chunks
+        (index-assisted, and pruned to the few partitions past their window);
+        tenants without a policy count as RETENTION_DAYS
+
+    With an Archiver, expired rows are exported (and verified) first; a
+    partition is detached before it is archived, so nothing new lands in it.
+    """
+
+    def __init__(self, interval: str = PARTITION_INTERVAL, archiver: Optional[Archiver] = None):
+        self.interval = interval if interval in ("day", "hour") else "day"
+        self.archiver = archiver
+        self._task: Optional[asyncio.Task] = None
+
+        self.created = 0
+        self.expired = 0
+        self.rows_deleted = 0
+        self.errors = 0
+        self.skipped = 0  # runs left to the worker holding the lock
+        self.last_run: Optional[datetime] = None
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name="log-partition-manager")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        # start() is called right after an initial run_once()
+        while True:
+            try:
+                await asyncio.sleep(PARTITION_CHECK_SEC)
+                await self.run_once()
+            except asyncio.CancelledError:
+                break
+            except Exception:
+                self.errors += 1
+
+    async def run_once(self, now: Optional[datetime] = None) -> bool:
+        """One maintenance pass; False if another worker is already running one."""
+        now = now or datetime.now(timezone.utc)
+        async with db.acquire() as conn:
+            if not await conn.fetchval("SELECT pg_try_advisory_lock($1)", _LOCK_ID):
+                self.skipped += 1
+                return False
+            try:
+                await self.ensure_partitions(conn, now)
+                await self.expire(conn, now)
+            finally:
+                await conn.execute("SELECT pg_advisory_unlock($1)", _LOCK_ID)
+        self.last_run = now
+        return True
+
+    async def ensure_partitions(self, conn, now: datetime) -> None:
+        existing = await list_partitions(conn)
+        step = _step(self.interval)
+        start = _floor(now, self.interval)
+        for _ in range(PARTITION_PREMAKE + 1):
+            end = start + step
+            if not any(_overlaps(p, start, end) for p in existing):
+                await create_partition(conn, start, end, partition_name(start, self.interval))
+                self.created += 1
+            start = end
+
+    async def expire(self, conn, now: datetime) -> None:
+        policies = await retention_policies(conn)
+        longest = max([RETENTION_DAYS, *policies.values()])
+        cutoff = now - timedelta(days=longest)
+
+        if self.archiver is not None:
+            # detached by an earlier run that failed before dropping
+            for rel in await self.archiver.pending(conn):
+                await self._archive_partition(conn, rel)
+
+        for p in await list_partitions(conn):
+            if p.end is not None and p.end <= cutoff:
+                if self.archiver is not None:
+                    await self.archiver.detach(conn, PARENT, p.name)
+                    await self._archive_partition(conn, p.name)
+                elif PARTITION_EXPIRE_ACTION == "detach":
+                    await conn.execute(f'ALTER TABLE {PARENT} DETACH PARTITION "{p.name}"')
+                else:
+                    await conn.execute(f'DROP TABLE "{p.name}"')
+                self.expired += 1
+
+        # stragglers in the default partition
+        if self.archiver is not None:
+            self.rows_deleted += await self.archiver.archive_and_delete(
+                conn, DEFAULT_PARTITION, "occurred_at < $1", _floor(cutoff, "day"), source=DEFAULT_PARTITION
+            )
+        else:
+            self.rows_deleted += await self._delete_chunks(
+                conn, f"SELECT id, occurred_at FROM {DEFAULT_PARTITION} WHERE occurred_at < $1", cutoff
+            )
+
+        # tenants with a shorter window than the partitions are kept for
+        for tenant, days in policies.items():
+            if days < longest:
+                self.rows_deleted += await self._expire_rows(
+                    conn, "tenant_id = $2", now - timedelta(days=days), tenant
+                )
+
+        # tenants without a policy get RETENTION_DAYS, which a longer policy
+        # elsewhere would otherwise stretch to `longest`
+        if RETENTION_DAYS < longest:
+            self.rows_deleted += await self._expire_rows(
+                conn, "tenant_id <> ALL($2::text[])", now - timedelta(days=RETENTION_DAYS), list(policies)
+            )
+
+    async def _expire_rows(self, conn, where: str, cutoff: datetime, *args: Any) -> int:
+        """Archives (if enabled) and deletes rows matching where older than cutoff ($1)."""
+        if self.archiver is not None:
+            # whole days only: runs every PARTITION_CHECK_SEC would otherwise
+            # write a tiny file per tenant each time; this way it's ~one a day
+            cutoff = _floor(cutoff, "day")
+            return await self.archiver.archive_and_delete(
+                conn, PARENT, f"{where} AND occurred_at < $1", cutoff, *args, source="retention"
+            )
+        return await self._delete_chunks(
+            conn, f"SELECT id, occurred_at FROM {PARENT} WHERE {where} AND occurred_at < $1", cutoff, *args
+        )
+
+    async def _archive_partition(self, conn, rel: str) -> None:
+        await self.archiver.archive_table(conn, rel)
+        if PARTITION_EXPIRE_ACTION != "detach":
+            await conn.execute(f'DROP TABLE "{rel}"')
+        await self.archiver.finish(conn, rel)
+
+    async def _delete_chunks(self, conn, select_sql: str, *args: Any) -> int:
+        """Deletes the rows matched by select_sql in RETENTION_DELETE_CHUNK-sized steps."""
+        n_args = len(args)
+        sql = (
+            f"WITH doomed AS ({select_sql} LIMIT ${n_args + 1}) "
+            f"DELETE FROM {PARENT} e USING doomed d "
+            f"WHERE e.id = d.id AND e.occurred_at = d.occurred_at"
+        )
+        total = 0
+        while True:
+            status = await conn.execute(sql, *args, RETENTION_DELETE_CHUNK)
+            n = int(status.rsplit(" ", 1)[-1])
+            total += n
+            if n < RETENTION_DELETE_CHUNK:
+                return total
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval": self.interval,
+            "created": self.created,
+            "expired": self.expired,
+            "rows_deleted": self.rows_deleted,
+            "errors": self.errors,
+            "skipped": self.skipped,
+            "archive": self.archiver.stats() if self.archiver is not None else None,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+        }
@@ -1,74 +1,580 @@
+import base64
 import json
+import uuid
+from collections import Counter
+from contextlib import nullcontext
 from datetime import datetime, timezone
-from typing import List
+from hashlib import blake2b
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import asyncpg
+from pydantic_core import to_json
 
 import app.db as db
 from .models import LogEvent
+from .settings import DEDUP_CONTENT_HASH, INSERT_MODE, STORAGE_COMPACT, TEMPLATE_MIN_CHARS
+from . import templates
+
 
+# Column order shared by the INSERT and COPY paths. id and received_at are
+# left out on purpose: Postgres fills them from their column defaults.
+COLUMNS = (
+    "occurred_at", "tenant_id", "source", "environment", "level", "type", "message",
+    "trace_id", "span_id", "correlation_id", "request_id",
+    "user_id", "path", "method", "status_code", "duration_ms",
+    "exception", "properties", "sample_rate", "dedup_key",
+)
+COL = {name: i for i, name in enumerate(COLUMNS)}
 
 _INSERT_SQL = """
 INSERT INTO log_events (
   occurred_at, tenant_id, source, environment, level, type, message,
   trace_id, span_id, correlation_id, request_id,
   user_id, path, method, status_code, duration_ms,
-  exception, properties
+  exception, properties, sample_rate, dedup_key
 )
 VALUES (
   $1,$2,$3,$4,$5,$6,$7,
   $8,$9,$10,$11,
   $12,$13,$14,$15,$16,
-  $17::jsonb,$18::jsonb
+  $17::jsonb,$18::jsonb,$19,$20
 )
+ON CONFLICT DO NOTHING
+"""
+
+# One log_events row in COLUMNS order; this is what the Batcher queues.
+Row = Tuple
+
+# Compact storage (STORAGE_COMPACT) only changes what is written: rows are
+# rewritten right before the INSERT/COPY, with message '' + template_id /
+# message_params and exception NULL + exception_id. Reads put them back.
+COMPACT_COLUMNS = COLUMNS + ("template_id", "message_params", "exception_id")
+
+_INSERT_COMPACT_SQL = f"""
+INSERT INTO log_events ({", ".join(COMPACT_COLUMNS)})
+VALUES ({", ".join(
+    f"${i}::jsonb" if c in ("exception", "properties") else f"${i}"
+    for i, c in enumerate(COMPACT_COLUMNS, 1)
+)})
+ON CONFLICT DO NOTHING
 """
 
+_MESSAGE_SQL = """CASE WHEN template_id IS NULL THEN message
+     ELSE lis_render_message((SELECT tokens FROM log_templates WHERE log_templates.id = template_id), message_params)
+END"""
+
+_EXCEPTION_SQL = """coalesce(exception, (SELECT body FROM log_exceptions WHERE log_exceptions.id = exception_id))"""
+
+# One stored event as an API-shaped JSON object, built by Postgres so read
+# paths can stream text lines without decoding/re-encoding rows in Python.
+_EVENT_JSON = """
+json_strip_nulls(json_build_object(
+  'id', id, 'occurredAt', occurred_at, 'receivedAt', received_at,
+  'tenantId', tenant_id, 'source', source, 'environment', environment,
+  'level', level, 'type', type, 'message', {message},
+  'traceId', trace_id, 'spanId', span_id, 'correlationId', correlation_id, 'requestId', request_id,
+  'userId', user_id, 'path', path, 'method', method,
+  'statusCode', status_code, 'durationMs', duration_ms,
+  'exception', {exception}, 'properties', properties,
+  'sampleRate', nullif(sample_rate, 1)
+))::text
+""".format(message=_MESSAGE_SQL, exception=_EXCEPTION_SQL)
+
+
+def row_to_json(r: Row) -> list:
+    # occurred_at is the only non-JSON value in a row
+    return [r[0].isoformat(), *r[1:]]
+
+
+# defaults for columns added after the first release, in COLUMNS order
+_ADDED_DEFAULTS = (1.0, None)  # sample_rate, dedup_key
+_BASE_COLUMNS = len(COLUMNS) - len(_ADDED_DEFAULTS)
 
-def _utc_now() -> datetime:
+
+def row_from_json(v: list) -> Row:
+    if _BASE_COLUMNS <= len(v) < len(COLUMNS):
+        # spooled/published by an older version
+        v = [*v, *_ADDED_DEFAULTS[len(v) - _BASE_COLUMNS:]]
+    return (datetime.fromisoformat(v[0]), *v[1:])
+
+
+def utc_now() -> datetime:
     return datetime.now(timezone.utc)
 
 
 def _to_jsonb(value):
     if value is None:
         return None
-    # asyncpg accepts JSONB as a string
-    return json.dumps(value, ensure_ascii=False)
+    # asyncpg accepts JSONB as a string (text for INSERT, binary codec for COPY).
+    # pydantic_core's serializer is compact UTF-8 and much cheaper than json.dumps.
+    return to_json(value).decode("utf-8")
+
+
+def dedup_key(
+    event_id: Optional[str],
+    tenant_id: str,
+    source: str,
+    occurred_at: Optional[datetime],
+    message: str,
+    request_id: Optional[str],
+) -> Optional[str]:
+    """
+    The client's eventId or, with DEDUP_CONTENT_HASH, a hash of the event's
+    identity when occurredAt pins it down. None (no dedup) otherwise: a
+    server-set occurredAt differs on every retry. For the same reason an
+    eventId without occurredAt never hits the unique index; only the
+    in-memory DedupWindow catches those retries.
+
+    Keyed rows can't go through plain COPY (see _copy_rows), which is why
+    content hashing is opt-in.
+    """
+    if event_id is not None:
+        return event_id
+    if occurred_at is None or not DEDUP_CONTENT_HASH:
+        return None
+    h = blake2b(digest_size=16)
+    for part in (tenant_id, source, occurred_at.isoformat(), message, request_id or ""):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return "h:" + h.hexdigest()
+
+
+def event_row(e: LogEvent, now: datetime) -> Row:
+    return (
+        e.occurredAt or now,
+        e.tenantId, e.source, e.environment.value, e.level.value, e.type.value, e.message,
+        e.traceId, e.spanId, e.correlationId, e.requestId,
+        e.userId, e.path, e.method, e.statusCode, e.durationMs,
+        _to_jsonb(e.exception),
+        _to_jsonb(e.properties),
+        1.0,
+        dedup_key(e.eventId, e.tenantId, e.source, e.occurredAt, e.message, e.requestId),
+    )
+
+
+def dict_row(d: Dict[str, Any], now: datetime) -> Row:
+    """Row from a dict validated by models.log_event_adapter (fast ingest path)."""
+    g = d.get
+    return (
+        g("occurredAt") or now,
+        d["tenantId"], d["source"], d["environment"], d["level"], d["type"], d["message"],
+        g("traceId"), g("spanId"), g("correlationId"), g("requestId"),
+        g("userId"), g("path"), g("method"), g("statusCode"), g("durationMs"),
+        _to_jsonb(g("exception")),
+        _to_jsonb(g("properties")),
+        1.0,
+        dedup_key(g("eventId"), d["tenantId"], d["source"], g("occurredAt"), d["message"], g("requestId")),
+    )
 
 
 async def insert_one(e: LogEvent) -> None:
-    pool = db.get_pool()
-
-    occurred_at = e.occurredAt or _utc_now()
-
-    async with pool.acquire() as conn:
-        await conn.execute(
-            _INSERT_SQL,
-            occurred_at,
-            e.tenantId, e.source, e.environment, e.level, e.type, e.message,
-            e.traceId, e.spanId, e.correlationId, e.requestId,
-            e.userId, e.path, e.method, e.statusCode, e.durationMs,
-            _to_jsonb(e.exception),
-            _to_jsonb(e.properties),
+    async with db.acquire() as conn:
+        await conn.execute(_INSERT_SQL, *event_row(e, utc_now()))
+
+
+_I_DEDUP = COL["dedup_key"]
+_I_TENANT = COL["tenant_id"]
+
+# COPY can't skip conflicts, so batches with dedup keys are copied into a
+# per-connection temp table first and moved over with ON CONFLICT DO NOTHING.
+_STAGE_SQL = """
+CREATE TEMP TABLE IF NOT EXISTS log_events_stage
+  (LIKE log_events INCLUDING DEFAULTS) ON COMMIT DELETE ROWS
+"""
+
+_UNSTAGE_SQL = """
+INSERT INTO log_events ({columns})
+SELECT {columns} FROM log_events_stage
+ON CONFLICT DO NOTHING
+"""
+
+# appended when write hooks need to know which keyed rows were inserted
+_RETURNING_SQL = "RETURNING tenant_id, dedup_key"
+
+# Returned by the insert helpers: None when every row was inserted, else
+# the (tenant_id, dedup_key) records Postgres did insert.
+Inserted = Optional[List[Any]]
+
+
+async def _copy_rows(conn, rows: Sequence[Row], columns: Sequence[str] = COLUMNS, returning: bool = False) -> Inserted:
+    if all(r[_I_DEDUP] is None for r in rows):
+        # binary COPY: one round trip for the whole batch, no per-row planning
+        await conn.copy_records_to_table(
+            "log_events",
+            records=rows,
+            columns=columns,
         )
+        return None
+
+    async with conn.transaction():
+        await conn.execute(_STAGE_SQL)
+        await conn.copy_records_to_table("log_events_stage", records=rows, columns=columns)
+        sql = _UNSTAGE_SQL.format(columns=", ".join(columns))
+        if returning:
+            return await conn.fetch(sql + _RETURNING_SQL)
+        await conn.execute(sql)
+        return None
+
+
+async def _executemany_rows(conn, rows: Sequence[Row], compact: bool = False, returning: bool = False) -> Inserted:
+    sql = _INSERT_COMPACT_SQL if compact else _INSERT_SQL
+    if returning and any(r[_I_DEDUP] is not None for r in rows):
+        return await conn.fetchmany(sql + _RETURNING_SQL, rows)
+    await conn.executemany(sql, rows)
+    return None
+
+
+def _inserted(rows: Sequence[Row], returned: Inserted) -> List[Row]:
+    """rows minus the keyed ones ON CONFLICT DO NOTHING skipped (retries)."""
+    if returned is None:
+        return list(rows)
+    left = Counter((r["tenant_id"], r["dedup_key"]) for r in returned if r["dedup_key"] is not None)
+    out = []
+    for r in rows:
+        if r[_I_DEDUP] is not None:
+            k = (r[_I_TENANT], r[_I_DEDUP])
+            if not left[k]:
+                continue
+            left[k] -= 1
+        out.append(r)
+    return out
+
+
+_I_MESSAGE = COL["message"]
+_I_EXCEPTION = COL["exception"]
+
+_miner = templates.TemplateMiner()
+_known_templates = templates.KnownIds()
+_known_exceptions = templates.KnownIds()
+
+
+_TEMPLATE_UPSERT_SQL = "INSERT INTO log_templates (id, tokens) VALUES ($1, $2) ON CONFLICT DO NOTHING"
+_EXCEPTION_UPSERT_SQL = "INSERT INTO log_exceptions (id, body) VALUES ($1, $2::jsonb) ON CONFLICT DO NOTHING"
+
+
+async def _compact_rows(conn, rows: Sequence[Row]) -> List[Row]:
+    """
+    Rows in COMPACT_COLUMNS order. Templates/exceptions this process hasn't
+    written yet are upserted first, so no stored row points at a missing one.
+    """
+    out = []
+    new_templates: Dict[int, Tuple] = {}
+    new_exceptions: Dict[int, str] = {}
+    for r in rows:
+        message, exc = r[_I_MESSAGE], r[_I_EXCEPTION]
+        tid = params = eid = None
+        if len(message) >= TEMPLATE_MIN_CHARS:
+            tid, tokens, params = _miner.encode(message)
+            if tid not in _known_templates:
+                new_templates[tid] = tokens
+            message = ""
+        if exc is not None:
+            eid = templates.exception_id(exc)
+            if eid not in _known_exceptions:
+                new_exceptions[eid] = exc
+            exc = None
+        out.append((*r[:_I_MESSAGE], message, *r[_I_MESSAGE + 1:_I_EXCEPTION], exc, *r[_I_EXCEPTION + 1:], tid, params, eid))
+
+    if new_templates:
+        await conn.executemany(_TEMPLATE_UPSERT_SQL, [(i, list(t)) for i, t in new_templates.items()])
+        _known_templates.update(new_templates)
+    if new_exceptions:
+        await conn.executemany(_EXCEPTION_UPSERT_SQL, list(new_exceptions.items()))
+        _known_exceptions.update(new_exceptions)
+    return out
+
 
+def compact_stats() -> Dict[str, Any]:
+    return {
+        "enabled": STORAGE_COMPACT,
+        "templates": _miner.stats(),
+        "known_templates": len(_known_templates),
+        "known_exceptions": len(_known_exceptions),
+    }
 
-async def insert_batch(events: List[LogEvent]) -> None:
+
+# write_rows errors that will never succeed on retry (bad data, not a DB
+# outage): callers isolate the offending rows instead of retrying them
+POISON_ERRORS = (
+    asyncpg.exceptions.DataError,
+    asyncpg.exceptions.IntegrityConstraintViolationError,
+    ValueError,
+    TypeError,
+)
+
+
+# called inside write_rows' transaction with the rows it actually inserted
+# (retries skipped on a dedup key left out), e.g. rollups.AccessRollup.on_write
+WriteHook = Callable[[Any, List[Row]], Awaitable[None]]
+_write_hooks: List[WriteHook] = []
+
+
+def add_write_hook(hook: WriteHook) -> None:
+    """
+    Registers a hook that writes derived data in the same transaction as the
+    rows, so a batch committed once is counted once, however often it is
+    retried or replayed. It gets the connection; errors abort the write.
+    """
+    _write_hooks.append(hook)
+
+
+async def write_rows(rows: Sequence[Row], mode: str = INSERT_MODE) -> None:
+    """
+    Writes already-built row tuples (in COLUMNS order) in one statement.
+    mode: "copy" (default) or "executemany" (fallback, e.g. for poolers that
+    don't support COPY).
+    """
+    if not rows:
+        return
+
+    hooks = _write_hooks
+    async with db.acquire() as conn:
+        columns = COLUMNS
+        written = rows
+        if STORAGE_COMPACT:
+            # outside the transaction: upserted templates are remembered as known
+            written = await _compact_rows(conn, rows)
+            columns = COMPACT_COLUMNS
+        async with conn.transaction() if hooks else nullcontext():
+            if mode == "executemany":
+                returned = await _executemany_rows(conn, written, compact=STORAGE_COMPACT, returning=bool(hooks))
+            else:
+                # COPY itself can't be prepared; asyncpg caches its column lookup per connection
+                returned = await _copy_rows(conn, written, columns, returning=bool(hooks))
+            if hooks:
+                inserted = _inserted(rows, returned)
+                for hook in hooks:
+                    await hook(conn, inserted)
+
+
+async def insert_batch(events: List[LogEvent], mode: str = INSERT_MODE) -> None:
     if not events:
         return
 
-    pool = db.get_pool()
-    now = _utc_now()
-
-    rows = []
-    for e in events:
-        occurred_at = e.occurredAt or now
-        rows.append((
-            occurred_at,
-            e.tenantId, e.source, e.environment, e.level, e.type, e.message,
-            e.traceId, e.spanId, e.correlationId, e.requestId,
-            e.userId, e.path, e.method, e.statusCode, e.durationMs,
-            _to_jsonb(e.exception),
-            _to_jsonb(e.properties),
-        ))
-
-    async with pool.acquire() as conn:
-        # MVP bulk insert (fast enough for now). We can switch to COPY later.
-        await conn.executemany(_INSERT_SQL, rows)
+    now = utc_now()
+    rows = [event_row(e, now) for e in events]
+    await write_rows(rows, mode)
+
+
+# ---- Read path ----
+
+def encode_cursor(occurred_at: datetime, event_id: uuid.UUID) -> str:
+    raw = f"{occurred_at.isoformat()}|{event_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    """Raises ValueError on a malformed cursor."""
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    ts, _, event_id = raw.partition("|")
+    return datetime.fromisoformat(ts), uuid.UUID(event_id)
+
+
+async def stream_logs(
+    *,
+    tenant_id: Optional[str] = None,
+    source: Optional[str] = None,
+    level: Optional[str] = None,
+    type: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    trace_id: Optional[str] = None,
+    status_code: Optional[int] = None,
+    cursor: Optional[Tuple[datetime, uuid.UUID]] = None,
+    limit: int = 1000,
+) -> AsyncIterator[str]:
+    """
+    Yields matching events as NDJSON lines, newest first, followed by a
+    {"nextCursor": ...} line when the page is full.
+
+    Keyset pagination on (occurred_at, id): the cursor predicate is written as
+    `occurred_at <= ts AND (occurred_at < ts OR id < id)` so the leading
+    occurred_at bound stays an index condition on the *_time indexes.
+    """
+    where: List[str] = []
+    args: List[Any] = []
+
+    def add(cond: str, value: Any) -> None:
+        args.append(value)
+        where.append(cond.replace("?", f"${len(args)}"))
+
+    for col, value in (
+        ("tenant_id", tenant_id),
+        ("source", source),
+        ("level", level),
+        ("type", type),
+        ("trace_id", trace_id),
+        ("status_code", status_code),
+    ):
+        if value is not None:
+            add(f"{col} = ?", value)
+    if since is not None:
+        add("occurred_at >= ?", since)
+    if until is not None:
+        add("occurred_at < ?", until)
+    if cursor is not None:
+        add("occurred_at <= ?", cursor[0])
+        args.append(cursor[1])
+        where.append(f"(occurred_at < ${len(args) - 1} OR id < ${len(args)})")
+    args.append(limit)
+
+    sql = (
+        f"SELECT occurred_at, id, {_EVENT_JSON} AS doc FROM log_events"
+        + (f" WHERE {' AND '.join(where)}" if where else "")
+        + f" ORDER BY occurred_at DESC, id DESC LIMIT ${len(args)}"
+    )
+
+    async with db.acquire() as conn:
+        # server-side cursor: rows arrive in prefetch-sized chunks
+        async with conn.transaction(readonly=True):
+            n = 0
+            last = None
+            async for r in conn.cursor(sql, *args, prefetch=500):
+                n += 1
+                last = r
+                yield r["doc"] + "\n"
+            if n == limit and last is not None:
+                yield json.dumps({"nextCursor": encode_cursor(last["occurred_at"], last["id"])}) + "\n"
+
+
+def encode_search_cursor(rank: float, occurred_at: datetime, event_id: uuid.UUID) -> str:
+    raw = f"{rank!r}|{occurred_at.isoformat()}|{event_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_search_cursor(cursor: str) -> Tuple[float, datetime, uuid.UUID]:
+    """Raises ValueError on a malformed cursor."""
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    rank, ts, event_id = raw.split("|")
+    return float(rank), datetime.fromisoformat(ts), uuid.UUID(event_id)
+
+
+_SEARCH_DOC = "lis_search_doc(message, message_params)"
+
+
+async def search_logs(
+    *,
+    query: str,
+    tenant_id: str,
+    since: datetime,
+    until: datetime,
+    cursor: Optional[Tuple[float, datetime, uuid.UUID]] = None,
+    limit: int = 100,
+) -> AsyncIterator[str]:
+    """
+    Full-text matches (websearch syntax: words, "phrases", -not, or), best
+    ts_rank first, then newest. NDJSON lines like stream_logs, each with a
+    "rank"; a full page ends with {"nextCursor": ...} (keyset on rank, time, id).
+    """
+    args: List[Any] = [query, tenant_id, since, until]
+    match = f"{_SEARCH_DOC} @@ q"
+    if STORAGE_COMPACT:
+        # compact rows: their template words are only in log_templates
+        match = (
+            f"({match} OR template_id IN ("
+            "SELECT id FROM log_templates "
+            "WHERE to_tsvector('simple'::regconfig, array_to_string(tokens, ' ')) @@ q))"
+        )
+    rank = f"ts_rank({_SEARCH_DOC}, q)"
+    where = ["tenant_id = $2", "occurred_at >= $3", "occurred_at < $4", match]
+    if cursor is not None:
+        args.extend(cursor)
+        where.append(f"({rank}, occurred_at, id) < ($5::real, $6, $7)")
+    args.append(limit)
+
+    # the JSON doc is only built for rows that survive ORDER BY + LIMIT
+    sql = (
+        f"SELECT {rank} AS rank, occurred_at, id, {_EVENT_JSON} AS doc "
+        "FROM log_events, websearch_to_tsquery('simple'::regconfig, $1) AS q "
+        f"WHERE {' AND '.join(where)} "
+        f"ORDER BY rank DESC, occurred_at DESC, id DESC LIMIT ${len(args)}"
+    )
+
+    async with db.acquire() as conn:
+        async with conn.transaction(readonly=True):
+            n = 0
+            last = None
+            async for r in conn.cursor(sql, *args, prefetch=min(limit, 500)):
+                n += 1
+                last = r
+                # doc is a JSON object: splice the rank in without re-encoding
+                yield r["doc"][:-1] + f',"rank":{r["rank"]!r}}}\n'
+            if n == limit and last is not None:
+                nxt = encode_search_cursor(last["rank"], last["occurred_at"], last["id"])
+                yield json.dumps({"nextCursor": nxt}) + "\n"
+
+
+async def fetch_trace(trace_id: str, limit: int, tenant_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    All events of one trace (up to limit), oldest first, as API-shaped dicts.
+    tenant_id None = across all tenants.
+    """
+    sql = f"SELECT {_EVENT_JSON} AS doc FROM log_events WHERE trace_id = $1"
+    args: List[Any] = [trace_id]
+    if tenant_id is not None:
+        args.append(tenant_id)
+        sql += " AND tenant_id = $2"
+    args.append(limit)
+    sql += f" ORDER BY occurred_at, id LIMIT ${len(args)}"
+    async with db.acquire() as conn:
+        rows = await conn.fetch(sql, *args)
+    return [json.loads(r["doc"]) for r in rows]
+
+
+# ---- Access rollups ----
+
+_ROLLUP_UPSERT_SQL = """
+INSERT INTO access_rollups_1m (
+  bucket, tenant_id, source, path, method, status_class,
+  count, duration_sum, duration_n, duration_max, latency_hist
+)
+VALUES ($1,$2,$3,$4,$5,$6,$7,$8,$9,$10,$11)
+ON CONFLICT (tenant_id, bucket, source, path, method, status_class) DO UPDATE SET
+  count        = access_rollups_1m.count + EXCLUDED.count,
+  duration_sum = access_rollups_1m.duration_sum + EXCLUDED.duration_sum,
+  duration_n   = access_rollups_1m.duration_n + EXCLUDED.duration_n,
+  duration_max = greatest(access_rollups_1m.duration_max, EXCLUDED.duration_max),
+  latency_hist = ARRAY(
+    SELECT a + b
+    FROM unnest(access_rollups_1m.latency_hist, EXCLUDED.latency_hist) WITH ORDINALITY AS t(a, b, i)
+    ORDER BY i
+  )
+"""
+
+
+async def table_exists(name: str) -> bool:
+    async with db.acquire() as conn:
+        return await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", name)
+
+
+async def upsert_access_rollups(conn, rows: Sequence[Tuple]) -> None:
+    """Adds to access_rollups_1m on conn (the caller's insert transaction)."""
+    if rows:
+        await conn.executemany(_ROLLUP_UPSERT_SQL, rows)
+
+
+async def fetch_access_rollups(
+    *,
+    tenant_id: str,
+    since: datetime,
+    until: datetime,
+    source: Optional[str] = None,
+    path: Optional[str] = None,
+    method: Optional[str] = None,
+    status_class: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    where = ["tenant_id = $1", "bucket >= $2", "bucket < $3"]
+    args: List[Any] = [tenant_id, since, until]
+    for col, value in (("source", source), ("path", path), ("method", method), ("status_class", status_class)):
+        if value is not None:
+            args.append(value)
+            where.append(f"{col} = ${len(args)}")
+
+    async with db.acquire() as conn:
+        rows = await conn.fetch(
+            "SELECT bucket, source, path, method, status_class, count, duration_sum, "
+            "duration_n, duration_max, latency_hist FROM access_rollups_1m "
+            f"WHERE {' AND '.join(where)} ORDER BY bucket",
+            *args,
+        )
+    return [dict(r) for r in rows]
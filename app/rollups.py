@@ -0,0 +1,213 @@
+import logging
+import time
+from bisect import bisect_left
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from . import repo
+from .repo import COL, Row
+from .settings import ROLLUP_KEY_WINDOW_SEC, ROLLUP_MAX_KEYS
+
+# Upper bounds (ms) of the latency histogram buckets; one extra +inf bucket.
+LATENCY_BOUNDS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+N_BUCKETS = len(LATENCY_BOUNDS_MS) + 1
+OTHER_PATH = "__other__"
+
+# (bucket, tenant, source, path, method, status_class)
+Key = Tuple[datetime, str, str, str, str, int]
+
+log = logging.getLogger(__name__)
+
+_I_OCCURRED = COL["occurred_at"]
+_I_TENANT = COL["tenant_id"]
+_I_SOURCE = COL["source"]
+_I_TYPE = COL["type"]
+_I_PATH = COL["path"]
+_I_METHOD = COL["method"]
+_I_STATUS = COL["status_code"]
+_I_DURATION = COL["duration_ms"]
+_I_RATE = COL["sample_rate"]
+
+
+def _minute(ts: datetime) -> datetime:
+    ts = ts.replace(tzinfo=timezone.utc) if ts.tzinfo is None else ts.astimezone(timezone.utc)
+    return ts.replace(second=0, microsecond=0)
+
+
+class Agg:
+    __slots__ = ("count", "duration_sum", "duration_n", "duration_max", "hist")
+
+    def __init__(self):
+        self.count = 0
+        self.duration_sum = 0
+        self.duration_n = 0
+        self.duration_max = 0
+        self.hist = [0] * N_BUCKETS
+
+    def add(self, duration: Optional[int], weight: float = 1) -> None:
+        # weight = 1 / sample_rate, so sampled rows count for what they stand for
+        self.count += weight
+        if duration is not None:
+            self.duration_sum += duration * weight
+            self.duration_n += weight
+            if duration > self.duration_max:
+                self.duration_max = duration
+            self.hist[bisect_left(LATENCY_BOUNDS_MS, duration)] += weight
+
+    def merge(self, other: "Agg") -> None:
+        self.count += other.count
+        self.duration_sum += other.duration_sum
+        self.duration_n += other.duration_n
+        self.duration_max = max(self.duration_max, other.duration_max)
+        self.hist = [a + b for a, b in zip(self.hist, other.hist)]
+
+
+def percentile(hist: List[int], duration_max: int, q: float) -> Optional[int]:
+    """Estimate from the histogram: upper bound of the bucket holding the q-th event."""
+    total = sum(hist)
+    if total == 0:
+        return None
+    rank = q * total
+    seen = 0
+    for i, n in enumerate(hist):
+        seen += n
+        if seen >= rank:
+            bound = LATENCY_BOUNDS_MS[i] if i < len(LATENCY_BOUNDS_MS) else duration_max
+            return min(bound, duration_max)
+    return duration_max
+
+
+class AccessRollup:
+    """
+    Rollup of access logs, registered as a repo write hook by install().
+
+    Inserted rows with type=access are folded into per-minute aggregates
+    keyed by (tenant, source, path, method, status class) and upserted into
+    access_rollups_1m inside the batch's own insert transaction. Upserts add
+    to existing counters, so late events and multiple processes are fine,
+    and a batch that is retried or replayed from the spool is only counted
+    if (and when) its rows are committed.
+    """
+
+    def __init__(self, max_keys: int = ROLLUP_MAX_KEYS, window_sec: float = ROLLUP_KEY_WINDOW_SEC):
+        self._max_keys = max_keys
+        self._window_sec = window_sec
+        # distinct keys written this window, for the cardinality guard
+        self._keys: Set[Key] = set()
+        self._window_start = time.monotonic()
+
+        self.enabled = False
+        self.events = 0
+        self.upserts = 0
+        self.other_keys = 0
+
+    async def install(self) -> bool:
+        """
+        Registers on_write as a repo write hook. It runs inside every insert,
+        so without access_rollups_1m it would fail all of them: then rollups
+        stay off (with a warning) and ingest goes on as usual.
+        """
+        if self.enabled:
+            return True
+        if not await repo.table_exists("access_rollups_1m"):
+            log.warning("ROLLUP_ENABLED is set but access_rollups_1m does not exist "
+                        "(migrations/003_access_rollups.sql); access rollups are disabled")
+            return False
+        repo.add_write_hook(self.on_write)
+        self.enabled = True
+        return True
+
+    def aggregate(self, rows: List[Row]) -> Dict[Key, Agg]:
+        now = time.monotonic()
+        if now - self._window_start >= self._window_sec:
+            self._keys.clear()
+            self._window_start = now
+        out: Dict[Key, Agg] = {}
+        for r in rows:
+            if r[_I_TYPE] != "access" or r[_I_PATH] is None:
+                continue
+            status = r[_I_STATUS]
+            bucket = _minute(r[_I_OCCURRED])
+            key = (bucket, r[_I_TENANT], r[_I_SOURCE], r[_I_PATH], r[_I_METHOD] or "", status // 100 if status else 0)
+            agg = out.get(key)
+            if agg is None:
+                if key not in self._keys:
+                    if len(self._keys) >= self._max_keys:
+                        # cardinality guard (e.g. ids in paths)
+                        key = key[:3] + (OTHER_PATH,) + key[4:]
+                        self.other_keys += 1
+                    self._keys.add(key)
+                agg = out.get(key)
+                if agg is None:
+                    agg = out[key] = Agg()
+            rate = r[_I_RATE]
+            agg.add(r[_I_DURATION], 1 if rate >= 1 else 1 / rate)
+            self.events += 1
+        return out
+
+    async def on_write(self, conn, rows: List[Row]) -> None:
+        """repo write hook: runs in the insert transaction (see repo.add_write_hook)."""
+        aggs = self.aggregate(rows)
+        if not aggs:
+            return
+        # same key order in every transaction, so concurrent batches can't deadlock
+        await repo.upsert_access_rollups(conn, [
+            (*k, round(a.count), round(a.duration_sum), round(a.duration_n), a.duration_max,
+             [round(n) for n in a.hist])
+            for k, a in sorted(aggs.items(), key=lambda kv: kv[0][1:] + (kv[0][0],))
+        ])
+        self.upserts += len(aggs)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "events": self.events,
+            "upserts": self.upserts,
+            "window_keys": len(self._keys),
+            "other_keys": self.other_keys,
+        }
+
+
+def summarize(rows: List[Dict[str, Any]], interval: str) -> List[Dict[str, Any]]:
+    """
+    Re-buckets access_rollups_1m rows to `interval` (minute/hour/day) and
+    derives avg / p50 / p95 / p99 latency from the merged histograms.
+    """
+    out: Dict[Tuple, Tuple[Agg, Dict[str, Any]]] = {}
+    for r in rows:
+        bucket = r["bucket"]
+        if interval == "hour":
+            bucket = bucket.replace(minute=0)
+        elif interval == "day":
+            bucket = bucket.replace(hour=0, minute=0)
+        key = (bucket, r["source"], r["path"], r["method"], r["status_class"])
+        hit = out.get(key)
+        if hit is None:
+            hit = out[key] = (Agg(), {
+                "bucket": bucket,
+                "source": r["source"],
+                "path": r["path"],
+                "method": r["method"],
+                "statusClass": f"{r['status_class']}xx" if r["status_class"] else None,
+            })
+        part = Agg()
+        part.count = r["count"]
+        part.duration_sum = r["duration_sum"]
+        part.duration_n = r["duration_n"]
+        part.duration_max = r["duration_max"]
+        part.hist = list(r["latency_hist"])
+        hit[0].merge(part)
+
+    result = []
+    for agg, head in out.values():
+        result.append({
+            **head,
+            "count": agg.count,
+            "avgMs": round(agg.duration_sum / agg.duration_n, 2) if agg.duration_n else None,
+            "maxMs": agg.duration_max if agg.duration_n else None,
+            "p50Ms": percentile(agg.hist, agg.duration_max, 0.50),
+            "p95Ms": percentile(agg.hist, agg.duration_max, 0.95),
+            "p99Ms": percentile(agg.hist, agg.duration_max, 0.99),
+        })
+    result.sort(key=lambda x: (x["bucket"], x["source"], x["path"], x["method"], x["statusClass"] or ""))
+    return result
@@ -0,0 +1,138 @@
+import random
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+from zlib import crc32
+
+from . import metrics
+from .repo import COL, Row
+from .settings import (
+    SAMPLE_KEEP_LEVELS,
+    SAMPLE_KEEP_TYPES,
+    SHED_START_DEBUG,
+    SHED_START_INFO,
+    SHED_START_WARN,
+)
+
+_I_TENANT = COL["tenant_id"]
+_I_SOURCE = COL["source"]
+_I_LEVEL = COL["level"]
+_I_TYPE = COL["type"]
+_I_TRACE = COL["trace_id"]
+_I_RATE = COL["sample_rate"]
+
+# queue fill at which each level starts being shed; linear down to 0 at full
+SHED_START = {"debug": SHED_START_DEBUG, "info": SHED_START_INFO, "warn": SHED_START_WARN}
+
+# (tenant, source, level, type) -> base rate; bounded, cleared when full or on reload
+_CACHE_MAX = 10_000
+
+
+class SampleRule:
+    """Base keep-rate for events matching every field that is set (None = any)."""
+
+    __slots__ = ("tenant", "source", "level", "type", "rate")
+
+    def __init__(self, rate: float, tenant=None, source=None, level=None, type=None):
+        self.rate = min(1.0, max(0.0, rate))
+        self.tenant = tenant
+        self.source = source
+        self.level = level
+        self.type = type
+
+    def matches(self, key: Tuple[str, str, str, str]) -> bool:
+        return (
+            (self.tenant is None or self.tenant == key[0])
+            and (self.source is None or self.source == key[1])
+            and (self.level is None or self.level == key[2])
+            and (self.type is None or self.type == key[3])
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {k: getattr(self, k) for k in self.__slots__ if getattr(self, k) is not None}
+
+
+def parse_rules(raw: Sequence[Mapping[str, Any]]) -> List[SampleRule]:
+    """
+    The "sampling" list of the tenant limits file, first match wins:
+
+        [{"tenant": "tenant-a", "type": "access", "level": "info", "rate": 0.1},
+         {"level": "debug", "rate": 0.01}]
+    """
+    return [
+        SampleRule(
+            float(r["rate"]),
+            tenant=r.get("tenant"),
+            source=r.get("source"),
+            level=r.get("level"),
+            type=r.get("type"),
+        )
+        for r in raw
+    ]
+
+
+def trace_fraction(trace_id: Optional[str]) -> float:
+    """Stable [0, 1) per traceId, so a whole trace is kept or dropped together."""
+    if trace_id is None:
+        return random.random()
+    return crc32(trace_id.encode("utf-8")) / 4294967296.0
+
+
+class Sampler:
+    """
+    Admission policy in front of the batcher queue.
+
+    keep rate = base rate (first matching rule, default 1) x shed factor,
+    where the shed factor falls from 1 to 0 as queue fill goes from the
+    level's SHED_START to full. error/fatal and audit events
+    (SAMPLE_KEEP_LEVELS/TYPES) are never sampled. Kept rows carry the keep
+    rate in sample_rate, so 1 / sample_rate is the number of events each
+    stored row stands for.
+    """
+
+    def __init__(self, rules=lambda: (), keep_levels=SAMPLE_KEEP_LEVELS, keep_types=SAMPLE_KEEP_TYPES):
+        self._rules = rules  # callable, so reloaded rules are picked up
+        self._seen_rules: Any = None
+        self._cache: Dict[Tuple[str, str, str, str], float] = {}
+        self.keep_levels = frozenset(keep_levels)
+        self.keep_types = frozenset(keep_types)
+        self.kept_sampled = 0
+        self.dropped = 0
+
+    def base_rate(self, key: Tuple[str, str, str, str]) -> float:
+        rules = self._rules()
+        if rules is not self._seen_rules:
+            self._seen_rules = rules
+            self._cache.clear()
+        rate = self._cache.get(key)
+        if rate is None:
+            rate = next((r.rate for r in rules if r.matches(key)), 1.0)
+            if len(self._cache) >= _CACHE_MAX:
+                self._cache.clear()
+            self._cache[key] = rate
+        return rate
+
+    def admit(self, row: Row, fill: float) -> Optional[Row]:
+        """The row to queue (sample_rate set when < 1), or None to drop it."""
+        level = row[_I_LEVEL]
+        if level in self.keep_levels or row[_I_TYPE] in self.keep_types:
+            return row
+
+        rate = self.base_rate((row[_I_TENANT], row[_I_SOURCE], level, row[_I_TYPE]))
+        start = SHED_START.get(level)
+        if start is not None and fill > start:
+            rate *= max(0.0, (1.0 - fill) / (1.0 - start))
+        if rate >= 1.0:
+            return row
+
+        if rate <= 0.0 or trace_fraction(row[_I_TRACE]) >= rate:
+            self.dropped += 1
+            metrics.sampled_out.inc(level)
+            return None
+        self.kept_sampled += 1
+        return row[:_I_RATE] + (rate,) + row[_I_RATE + 1:]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "dropped": self.dropped,
+            "kept_sampled": self.kept_sampled,
+            "rules": [r.as_dict() for r in self._rules()],
+        }
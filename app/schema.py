@@ -0,0 +1,52 @@
+"""
+Startup check for the migrations that every insert and read depends on.
+
+Rows always carry the columns added by later migrations (sample_rate,
+dedup_key), so a database that is behind would fail each batch, one
+flush at a time, while the API keeps answering 202. Reads always rebuild
+compact messages and exceptions (repo._EVENT_JSON), whether or not
+STORAGE_COMPACT is on. Instead the service refuses to start and names
+the migrations to apply.
+"""
+from typing import List, Tuple
+
+import app.db as db
+
+_COLUMN_SQL = """
+SELECT EXISTS (
+  SELECT 1 FROM pg_attribute
+  WHERE attrelid = to_regclass('log_events') AND attname = $1 AND NOT attisdropped
+)
+"""
+
+_FUNCTION_SQL = "SELECT to_regproc($1) IS NOT NULL"
+
+# (migration, SQL that is true once it is applied, argument)
+REQUIRED: List[Tuple[str, str, str]] = [
+    ("004_sample_rate.sql", _COLUMN_SQL, "sample_rate"),
+    ("005_dedup_key.sql", _COLUMN_SQL, "dedup_key"),
+    ("006_compact_storage.sql", _COLUMN_SQL, "template_id"),
+    ("006_compact_storage.sql", _COLUMN_SQL, "message_params"),
+    ("006_compact_storage.sql", _COLUMN_SQL, "exception_id"),
+    ("006_compact_storage.sql", _FUNCTION_SQL, "lis_render_message"),
+]
+
+
+async def missing(conn) -> List[str]:
+    """Migrations from REQUIRED that are not applied, in order."""
+    out: List[str] = []
+    for migration, sql, arg in REQUIRED:
+        if migration not in out and not await conn.fetchval(sql, arg):
+            out.append(migration)
+    return out
+
+
+async def check() -> None:
+    async with db.acquire() as conn:
+        todo = await missing(conn)
+    if todo:
+        raise RuntimeError(
+            "database schema is out of date, apply "
+            + ", ".join(f"migrations/{m}" for m in todo)
+            + " and restart"
+        )
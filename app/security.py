@@ -1,14 +1,61 @@
+from typing import Iterable, Optional
+
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from .settings import INGEST_TOKEN
+
+from . import metrics
+from .apikeys import ANY_TENANT, store
 
 bearer = HTTPBearer(auto_error=False)
 
+
 def require_token(
     creds: HTTPAuthorizationCredentials | None = Depends(bearer),
-) -> None:
-    if not INGEST_TOKEN:
-        return
+) -> Optional[str]:
+    """
+    Returns the tenant the key is bound to, or None if it may write any
+    tenant (INGEST_TOKEN, '*' keys, auth disabled).
+    """
+    if store.open:
+        return None
 
-    if creds is None or creds.scheme.lower() != "bearer" or creds.credentials != INGEST_TOKEN:
+    if creds is None or creds.scheme.lower() != "bearer":
+        raise HTTPException(status_code=401, detail="unauthorized")
+    scope = store.resolve(creds.credentials)
+    if scope is None:
         raise HTTPException(status_code=401, detail="unauthorized")
+    return None if scope == ANY_TENANT else scope
+
+
+def require_ingest_token(
+    creds: HTTPAuthorizationCredentials | None = Depends(bearer),
+) -> Optional[str]:
+    """require_token for the ingest routes: refusals count as ingest rejections."""
+    try:
+        return require_token(creds)
+    except HTTPException:
+        metrics.ingest_rejected.inc("unauthorized")
+        raise
+
+
+def check_tenant(scope: Optional[str], tenant_id: str) -> None:
+    if scope is not None and tenant_id != scope:
+        raise HTTPException(status_code=403, detail=f"API key not valid for tenant {tenant_id}")
+
+
+def check_tenants(scope: Optional[str], tenant_ids: Iterable[str]) -> None:
+    if scope is not None:
+        for t in tenant_ids:
+            if t != scope:
+                raise HTTPException(status_code=403, detail=f"API key not valid for tenant {t}")
+
+
+def scoped_tenant(scope: Optional[str], tenant_id: Optional[str]) -> Optional[str]:
+    """
+    The tenant a read may see: tenant_id, or the key's own tenant when it is
+    omitted. None (all tenants) only for unscoped keys.
+    """
+    if scope is None:
+        return tenant_id
+    check_tenant(scope, tenant_id or scope)
+    return scope
@@ -0,0 +1,127 @@
+import mmap
+import os
+import struct
+import time
+from typing import Any, Dict, List, Optional
+
+# Cross-process batcher counters for the multi-worker launcher (app/launcher.py).
+#
+# One fixed-size slot per worker in a small mmap'd file. Each worker only
+# ever writes its own slot, so no locks are needed; a sequence number (odd
+# while a write is in progress) lets readers skip torn slots.
+#
+# Counters are per process, so each slot also carries a base: the counters
+# of earlier processes on that slot, folded in when a restarted worker first
+# publishes. Totals are base + current over all slots, so they never go
+# backwards when a worker exits or restarts (a crashed worker's counters are
+# as of its last publish).
+#
+# A header in front of the slots holds instance-wide control flags: for now
+# "draining", set by /internal/drain on whichever worker got the request and
+# picked up by every worker on its next publish.
+
+FIELDS = ("queued", "enqueued", "flushed", "dropped", "flush_errors", "spooled")
+# cumulative counters; "queued" is a gauge and only counts for live workers
+CUMULATIVE = FIELDS[1:]
+_SLOT = struct.Struct("<qqd" + "q" * (len(FIELDS) + len(CUMULATIVE)))  # seq, pid, updated_at, *FIELDS, *base
+_HEADER = struct.Struct("<q")  # draining
+
+# slots not refreshed for this long are reported as stale; their queue
+# depth is left out of the totals
+STALE_SEC = 10.0
+
+
+class SharedStats:
+    def __init__(self, path: str, slots: int, create: bool = False):
+        self.path = path
+        self.slots = slots
+        size = _HEADER.size + _SLOT.size * slots
+        flags = os.O_RDWR | (os.O_CREAT if create else 0)
+        fd = os.open(path, flags, 0o600)
+        try:
+            if create:
+                os.ftruncate(fd, size)
+            self._mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        self._seq = [0] * slots
+        self._base: List[Optional[List[int]]] = [None] * slots
+
+    def close(self) -> None:
+        self._mm.close()
+
+    def set_draining(self, on: bool) -> None:
+        _HEADER.pack_into(self._mm, 0, int(on))
+
+    def draining(self) -> bool:
+        return bool(_HEADER.unpack_from(self._mm, 0)[0])
+
+    def publish(self, slot: int, values: Dict[str, int]) -> None:
+        off = _HEADER.size + slot * _SLOT.size
+        if self._base[slot] is None:
+            self._base[slot] = self._inherit(slot)
+        seq = self._seq[slot] + 1  # odd: write in progress
+        struct.pack_into("<q", self._mm, off, seq)
+        _SLOT.pack_into(
+            self._mm, off, seq, os.getpid(), time.time(),
+            *(int(values.get(f, 0)) for f in FIELDS),
+            *self._base[slot],
+        )
+        struct.pack_into("<q", self._mm, off, seq + 1)
+        self._seq[slot] = seq + 1
+
+    def _inherit(self, slot: int) -> List[int]:
+        """Base for this process: everything earlier processes on the slot counted."""
+        off = _HEADER.size + slot * _SLOT.size
+        seq, pid, _, *vals = _SLOT.unpack_from(self._mm, off)
+        self._seq[slot] = seq + (seq % 2)  # continue the sequence (even)
+        if seq == 0:
+            return [0] * len(CUMULATIVE)
+        base = vals[len(FIELDS):]
+        if pid == os.getpid():
+            return base  # our own counters, already in `values`
+        current = dict(zip(FIELDS, vals))
+        return [b + current[f] for b, f in zip(base, CUMULATIVE)]
+
+    def read(self, slot: int) -> Optional[Dict[str, Any]]:
+        off = _HEADER.size + slot * _SLOT.size
+        for _ in range(3):
+            seq, pid, updated, *vals = _SLOT.unpack_from(self._mm, off)
+            if seq == 0:
+                return None  # never written
+            if seq % 2 == 0 and struct.unpack_from("<q", self._mm, off)[0] == seq:
+                return {
+                    "slot": slot, "pid": pid, "updated_at": updated,
+                    **dict(zip(FIELDS, vals)),
+                    "base": dict(zip(CUMULATIVE, vals[len(FIELDS):])),
+                }
+        return None
+
+    def aggregate(self) -> Dict[str, Any]:
+        """
+        total: cumulative counters of every process that ever held a slot,
+        plus the queue depth of live workers. workers: per-slot values of
+        the current (or last) process, with its inherited base.
+        """
+        now = time.time()
+        workers: List[Dict[str, Any]] = []
+        total = {f: 0 for f in FIELDS}
+        for slot in range(self.slots):
+            s = self.read(slot)
+            if s is None:
+                continue
+            s["stale"] = now - s["updated_at"] > STALE_SEC
+            workers.append(s)
+            if not s["stale"]:
+                total["queued"] += s["queued"]
+            for f in CUMULATIVE:
+                total[f] += s["base"][f] + s[f]
+        return {"total": total, "workers": workers}
+
+
+def from_env() -> Optional[SharedStats]:
+    """The slot file set up by the launcher, if this process was started by it."""
+    path = os.getenv("LIS_STATS_FILE")
+    if not path:
+        return None
+    return SharedStats(path, int(os.getenv("LIS_WORKERS", "1")))
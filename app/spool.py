@@ -0,0 +1,177 @@
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .repo import Row, row_from_json, row_to_json
+
+
+class Spool:
+    """
+    Append-only on-disk spool for batches we could not write to Postgres.
+
+    Layout: <dir>/<seq>.seg files, one JSON record per line
+    ({"rows": [[...], ...]}, rows in repo.COLUMNS order). Only the newest segment is written to; it is sealed
+    (rotated) once it reaches segment_bytes or when the replayer asks for it.
+    Replay progress per segment is kept in a <seq>.off sidecar so a restart
+    resumes where it left off (delivery is at-least-once).
+
+    Rows Postgres refuses as bad data are set aside in <dir>/dead-letter.jsonl
+    ({"error": ..., "at": ..., "rows": [...]}) so they don't block the rest.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int, fsync: bool = False):
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+
+        self._lock = threading.Lock()
+        existing = self._segments()
+        self._seq = int(existing[-1].stem) + 1 if existing else 1
+        self._fh = None
+        self._active_path: Optional[Path] = None
+        self._active_bytes = 0
+
+        self.records_written = 0
+        self.events_written = 0
+        self.corrupt_records = 0
+        self.dead_letter_path = self.dir / "dead-letter.jsonl"
+        self.dead_lettered = 0
+
+    # ---- write side ----
+
+    def append(self, rows: List[Row]) -> None:
+        """Appends one record. Safe to call from a worker thread."""
+        line = json.dumps(
+            {"rows": [row_to_json(r) for r in rows]},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode("utf-8") + b"\n"
+
+        with self._lock:
+            if self._fh is None:
+                self._open_segment()
+            self._fh.write(line)
+            self._active_bytes += len(line)
+            self.records_written += 1
+            self.events_written += len(rows)
+            if self.fsync:
+                self._fh.flush()
+                os.fsync(self._fh.fileno())
+            if self._active_bytes >= self.segment_bytes:
+                self._seal()
+
+    def dead_letter(self, rows: List[Row], error: str) -> None:
+        """Appends rows that can never be written. Safe to call from a worker thread."""
+        line = json.dumps(
+            {
+                "error": error,
+                "at": datetime.now(timezone.utc).isoformat(),
+                "rows": [row_to_json(r) for r in rows],
+            },
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode("utf-8") + b"\n"
+        with self._lock:
+            with open(self.dead_letter_path, "ab") as fh:
+                fh.write(line)
+                fh.flush()
+                os.fsync(fh.fileno())
+            self.dead_lettered += len(rows)
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._fh is not None:
+                self._fh.flush()
+
+    def rotate(self) -> None:
+        """Seals the active segment (if it has data) so it can be replayed."""
+        with self._lock:
+            if self._fh is not None and self._active_bytes > 0:
+                self._seal()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fh is not None:
+                self._fh.flush()
+                os.fsync(self._fh.fileno())
+                self._fh.close()
+                self._fh = None
+                self._active_path = None
+
+    def _open_segment(self) -> None:
+        self._active_path = self.dir / f"{self._seq:012d}.seg"
+        self._seq += 1
+        self._fh = open(self._active_path, "ab")
+        self._active_bytes = 0
+
+    def _seal(self) -> None:
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self._fh.close()
+        self._fh = None
+        self._active_path = None
+        self._active_bytes = 0
+
+    # ---- read side ----
+
+    def _segments(self) -> List[Path]:
+        return sorted(self.dir.glob("*.seg"))
+
+    def sealed_segments(self) -> List[Path]:
+        with self._lock:
+            active = self._active_path
+        return [p for p in self._segments() if p != active]
+
+    def has_pending(self) -> bool:
+        with self._lock:
+            if self._active_bytes > 0:
+                return True
+        return bool(self.sealed_segments())
+
+    def read(self, seg: Path) -> Iterator[Tuple[int, List[Row]]]:
+        """Yields (end_offset, rows) for each record after the acked offset."""
+        start = self._acked_offset(seg)
+        with open(seg, "rb") as fh:
+            fh.seek(start)
+            for line in fh:
+                start += len(line)
+                if not line.endswith(b"\n"):
+                    # torn write at crash time: nothing after it is valid
+                    self.corrupt_records += 1
+                    break
+                try:
+                    raw = json.loads(line)
+                    rows = [row_from_json(r) for r in raw["rows"]]
+                except Exception:
+                    self.corrupt_records += 1
+                    continue
+                yield start, rows
+
+    def ack(self, seg: Path, offset: int) -> None:
+        seg.with_suffix(".off").write_text(str(offset))
+
+    def remove(self, seg: Path) -> None:
+        seg.with_suffix(".off").unlink(missing_ok=True)
+        seg.unlink(missing_ok=True)
+
+    def _acked_offset(self, seg: Path) -> int:
+        try:
+            return int(seg.with_suffix(".off").read_text())
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def stats(self) -> Dict[str, Any]:
+        segs = self._segments()
+        return {
+            "segments": len(segs),
+            "bytes": sum(p.stat().st_size for p in segs),
+            "records_written": self.records_written,
+            "events_written": self.events_written,
+            "corrupt_records": self.corrupt_records,
+            "dead_lettered": self.dead_lettered,
+            "dead_letter_bytes": self.dead_letter_path.stat().st_size if self.dead_letter_path.exists() else 0,
+        }
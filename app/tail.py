@@ -0,0 +1,162 @@
+import asyncio
+import json
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Set
+
+from pydantic_core import to_json
+
+from .repo import COL, Row
+from .settings import TAIL_BUFFER, TAIL_DROP_AFTER, TAIL_KEEPALIVE_SEC, TAIL_MAX_SUBSCRIBERS
+
+_I_TENANT = COL["tenant_id"]
+_I_SOURCE = COL["source"]
+_I_LEVEL = COL["level"]
+_I_TRACE = COL["trace_id"]
+
+# row column -> API field, for the columns a tail event shows
+_FIELDS = (
+    ("occurred_at", "occurredAt"), ("tenant_id", "tenantId"), ("source", "source"),
+    ("environment", "environment"), ("level", "level"), ("type", "type"), ("message", "message"),
+    ("trace_id", "traceId"), ("span_id", "spanId"), ("correlation_id", "correlationId"),
+    ("request_id", "requestId"), ("user_id", "userId"), ("path", "path"), ("method", "method"),
+    ("status_code", "statusCode"), ("duration_ms", "durationMs"),
+)
+_JSON_FIELDS = (("exception", "exception"), ("properties", "properties"))
+_IDX = [(COL[c], name) for c, name in _FIELDS]
+_JSON_IDX = [(COL[c], name) for c, name in _JSON_FIELDS]
+
+
+def event_json(r: Row) -> bytes:
+    """API-shaped JSON for one queued row (nulls left out, like the read paths)."""
+    d: Dict[str, Any] = {name: r[i] for i, name in _IDX if r[i] is not None}
+    for i, name in _JSON_IDX:
+        if r[i] is not None:
+            d[name] = json.loads(r[i])
+    return to_json(d)
+
+
+class Subscriber:
+    """One tail session: filters plus a ring buffer of encoded events."""
+
+    def __init__(self, tenant: str, source=None, level=None, trace_id=None, buffer: int = TAIL_BUFFER):
+        self.tenant = tenant
+        self.source = source
+        self.level = level
+        self.trace_id = trace_id
+        self.buf: Deque[bytes] = deque(maxlen=buffer)
+        self.wakeup = asyncio.Event()
+        self.missed = 0        # overwritten since the client last caught up
+        self.missed_total = 0
+        self.dropped = False
+
+    def matches(self, r: Row) -> bool:
+        return (
+            (self.source is None or r[_I_SOURCE] == self.source)
+            and (self.level is None or r[_I_LEVEL] == self.level)
+            and (self.trace_id is None or r[_I_TRACE] == self.trace_id)
+        )
+
+    def push(self, data: bytes) -> None:
+        if len(self.buf) == self.buf.maxlen:
+            self.missed += 1
+            self.missed_total += 1
+        self.buf.append(data)
+        self.wakeup.set()
+
+
+class TailHub:
+    """
+    In-process fan-out of batches to live tail sessions.
+
+    publish() runs on the flush worker right before a batch is written and
+    never waits: each subscriber has a bounded ring buffer, a slow one just
+    loses its oldest events (reported as a "lag" event), and one that falls
+    TAIL_DROP_AFTER events behind is disconnected. Subscribers are indexed by
+    tenant, so a batch costs one dict lookup per row plus the matches.
+    """
+
+    def __init__(self, max_subscribers: int = TAIL_MAX_SUBSCRIBERS):
+        self.max_subscribers = max_subscribers
+        self._by_tenant: Dict[str, Set[Subscriber]] = {}
+        self._count = 0
+        self.published = 0
+        self.dropped_subscribers = 0
+
+    def full(self) -> bool:
+        return self._count >= self.max_subscribers
+
+    def subscribe(self, sub: Subscriber) -> None:
+        self._by_tenant.setdefault(sub.tenant, set()).add(sub)
+        self._count += 1
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        subs = self._by_tenant.get(sub.tenant)
+        if subs is not None and sub in subs:
+            subs.discard(sub)
+            self._count -= 1
+            if not subs:
+                del self._by_tenant[sub.tenant]
+
+    def publish(self, rows: List[Row]) -> None:
+        by_tenant = self._by_tenant
+        if not by_tenant:
+            return
+        slow: List[Subscriber] = []
+        for r in rows:
+            subs = by_tenant.get(r[_I_TENANT])
+            if not subs:
+                continue
+            data = None
+            for sub in subs:
+                if not sub.matches(r):
+                    continue
+                if data is None:
+                    data = event_json(r)  # encoded once, shared by all matches
+                    self.published += 1
+                sub.push(data)
+                if sub.missed >= TAIL_DROP_AFTER:
+                    slow.append(sub)
+        for sub in slow:
+            if not sub.dropped:
+                sub.dropped = True
+                sub.wakeup.set()
+                self.unsubscribe(sub)
+                self.dropped_subscribers += 1
+
+    async def stream(self, sub: Subscriber) -> AsyncIterator[bytes]:
+        """Server-sent events for one subscriber, registered while the response runs."""
+        self.subscribe(sub)
+        try:
+            yield b": tailing\n\n"
+            while True:
+                try:
+                    await asyncio.wait_for(sub.wakeup.wait(), timeout=TAIL_KEEPALIVE_SEC)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                sub.wakeup.clear()
+                # read before yielding: the flag may flip while we're suspended
+                dropped = sub.dropped
+
+                if sub.missed:
+                    yield b'event: lag\ndata: {"missed":%d}\n\n' % sub.missed
+                    sub.missed = 0
+                buf = sub.buf
+                out = []
+                while buf:
+                    out.append(b"data: " + buf.popleft() + b"\n\n")
+                if out:
+                    yield b"".join(out)
+                if dropped:
+                    yield b'event: dropped\ndata: {"reason":"consumer too slow"}\n\n'
+                    return
+        finally:
+            self.unsubscribe(sub)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "subscribers": self._count,
+            "tenants": len(self._by_tenant),
+            "published": self.published,
+            "dropped_subscribers": self.dropped_subscribers,
+        }
@@ -0,0 +1,116 @@
+"""
+Drain-style message templates and exception interning for compact storage.
+
+A message is split on single spaces (so it joins back byte-for-byte) and
+matched against known templates with the same token count and first token.
+Template tokens are literal strings or None (a parameter). Tokens that
+contain a digit start out as parameters. A close enough existing template
+(share of equal literal tokens >= sim) absorbs the message, and positions
+that differ become parameters.
+
+Templates never change once issued. Generalizing one yields a new template
+(new id), so rows written earlier still render. Ids are a hash of the
+tokens, which lets processes agree on them without a round trip.
+"""
+import re
+from collections import OrderedDict
+from hashlib import blake2b
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .settings import TEMPLATE_SIM, TEMPLATE_CACHE_MAX
+
+Tokens = Tuple[Optional[str], ...]
+
+_VARIABLE = re.compile(r"\d")
+# templates kept per (token count, first token) group
+_GROUP_MAX = 32
+
+
+def _id64(data: bytes) -> int:
+    # signed, so it fits a Postgres BIGINT
+    return int.from_bytes(blake2b(data, digest_size=8).digest(), "big", signed=True)
+
+
+def template_id(tokens: Tokens) -> int:
+    # \x00 can't appear in a token (Postgres text), \x01 marks a parameter
+    return _id64("\x00".join("\x01" if t is None else t for t in tokens).encode("utf-8"))
+
+
+def exception_id(exception_json: str) -> int:
+    return _id64(exception_json.encode("utf-8"))
+
+
+def render(tokens: Sequence[Optional[str]], params: Sequence[str]) -> str:
+    """Inverse of TemplateMiner.encode (the SQL side is lis_render_message)."""
+    it = iter(params)
+    return " ".join(next(it) if t is None else t for t in tokens)
+
+
+class TemplateMiner:
+    def __init__(self, sim: float = TEMPLATE_SIM, max_groups: int = TEMPLATE_CACHE_MAX):
+        self.sim = sim
+        self.max_groups = max_groups
+        # LRU of groups; each holds (id, tokens) of its current templates
+        self._groups: "OrderedDict[Tuple[int, str], List[Tuple[int, Tokens]]]" = OrderedDict()
+        self.created = 0
+
+    def encode(self, message: str) -> Tuple[int, Tokens, List[str]]:
+        """(template id, template tokens, parameters) for one message."""
+        tokens = message.split(" ")
+        first = tokens[0]
+        key = (len(tokens), "" if _VARIABLE.search(first) else first)
+
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = []
+            if len(self._groups) > self.max_groups:
+                self._groups.popitem(last=False)
+        else:
+            self._groups.move_to_end(key)
+
+        best, best_sim = -1, -1.0
+        for i, (_, tpl) in enumerate(group):
+            same = sum(1 for t, tok in zip(tpl, tokens) if t is not None and t == tok)
+            score = same / len(tokens)
+            if score > best_sim:
+                best, best_sim = i, score
+
+        if best >= 0 and best_sim >= self.sim:
+            tid, tpl = group[best]
+            merged = tuple(t if t == tok else None for t, tok in zip(tpl, tokens))
+            if merged != tpl:
+                tpl = merged
+                tid = template_id(tpl)
+                group[best] = (tid, tpl)
+                self.created += 1
+        else:
+            tpl = tuple(None if _VARIABLE.search(tok) else tok for tok in tokens)
+            tid = template_id(tpl)
+            group.append((tid, tpl))
+            if len(group) > _GROUP_MAX:
+                group.pop(0)
+            self.created += 1
+
+        return tid, tpl, [tok for t, tok in zip(tpl, tokens) if t is None]
+
+    def stats(self) -> Dict[str, int]:
+        return {"groups": len(self._groups), "created": self.created}
+
+
+class KnownIds:
+    """Ids already written to the DB; bounded by clearing (re-writes are no-ops)."""
+
+    def __init__(self, max_size: int = TEMPLATE_CACHE_MAX):
+        self.max_size = max_size
+        self._ids: set = set()
+
+    def __contains__(self, i: int) -> bool:
+        return i in self._ids
+
+    def update(self, ids) -> None:
+        if len(self._ids) > self.max_size:
+            self._ids.clear()
+        self._ids.update(ids)
+
+    def __len__(self) -> int:
+        return len(self._ids)
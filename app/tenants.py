@@ -0,0 +1,167 @@
+import json
+import math
+import os
+import time
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from .sampling import SampleRule, parse_rules
+
+from .settings import (
+    QUEUE_MAX,
+    TENANT_RATE,
+    TENANT_BURST,
+    TENANT_WEIGHT,
+    TENANT_QUEUE_MAX,
+    TENANT_LIMITS_FILE,
+)
+
+
+class TenantLimit:
+    """rate/burst in events/sec (0 = unlimited), scheduling weight, queue cap."""
+
+    __slots__ = ("rate", "burst", "weight", "queue_max")
+
+    def __init__(self, rate: float, burst: float, weight: int, queue_max: int):
+        self.rate = rate
+        self.burst = burst if burst > 0 else rate
+        self.weight = max(1, weight)
+        self.queue_max = max(1, min(queue_max, QUEUE_MAX))
+
+    @classmethod
+    def from_dict(cls, d: Mapping[str, Any], base: "TenantLimit") -> "TenantLimit":
+        return cls(
+            rate=float(d.get("rate", base.rate)),
+            burst=float(d.get("burst", base.burst if "rate" not in d else 0)),
+            weight=int(d.get("weight", base.weight)),
+            queue_max=int(d.get("queue_max", base.queue_max)),
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+
+class TenantLimits:
+    """
+    Per-tenant limits, loaded from TENANT_LIMITS_FILE (JSON) and re-read when
+    the file changes (maybe_reload), so limits change without a restart:
+
+        {"default": {"rate": 5000, "burst": 10000, "weight": 1, "queue_max": 5000},
+         "tenants": {"tenant-a": {"rate": 20000, "weight": 4}},
+         "sampling": [{"level": "debug", "rate": 0.1}]}
+
+    Anything not in the file falls back to the TENANT_* env settings.
+    """
+
+    def __init__(self, path: Optional[str] = TENANT_LIMITS_FILE):
+        self.path = path or None
+        self._env_default = TenantLimit(TENANT_RATE, TENANT_BURST, TENANT_WEIGHT, TENANT_QUEUE_MAX)
+        self.default = self._env_default
+        self._tenants: Dict[str, TenantLimit] = {}
+        self.sampling: List[SampleRule] = []
+        self._mtime: Optional[float] = None
+        self.reloads = 0
+        self.reload_errors = 0
+        self.maybe_reload()
+
+    def get(self, tenant: str) -> TenantLimit:
+        return self._tenants.get(tenant, self.default)
+
+    def maybe_reload(self) -> bool:
+        """Re-reads the file if its mtime changed. Keeps the old limits on a bad file."""
+        if not self.path:
+            return False
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return False
+        if mtime == self._mtime:
+            return False
+        try:
+            with open(self.path) as fh:
+                raw = json.load(fh)
+            default = TenantLimit.from_dict(raw.get("default", {}), self._env_default)
+            tenants = {t: TenantLimit.from_dict(d, default) for t, d in raw.get("tenants", {}).items()}
+            sampling = parse_rules(raw.get("sampling", []))
+        except (OSError, ValueError, TypeError, AttributeError, KeyError):
+            self.reload_errors += 1
+            return False
+        self.default, self._tenants, self.sampling, self._mtime = default, tenants, sampling, mtime
+        self.reloads += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "file": self.path,
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+            "default": self.default.as_dict(),
+            "tenants": {t: l.as_dict() for t, l in self._tenants.items()},
+        }
+
+
+class _Bucket:
+    __slots__ = ("tokens", "stamp")
+
+    def __init__(self, tokens: float, stamp: float):
+        self.tokens = tokens
+        self.stamp = stamp
+
+
+# buckets untouched this long are forgotten (they'd be full again anyway)
+_IDLE_SEC = 600.0
+
+
+class RateLimiter:
+    """Token bucket per tenant, refilled lazily on each check."""
+
+    def __init__(self, limits: TenantLimits):
+        self.limits = limits
+        self._buckets: Dict[str, _Bucket] = {}
+        self.limited = 0
+
+    def _refill(self, tenant: str, now: float) -> Tuple[Optional[_Bucket], TenantLimit]:
+        lim = self.limits.get(tenant)
+        if lim.rate <= 0:
+            return None, lim
+        b = self._buckets.get(tenant)
+        if b is None:
+            b = self._buckets[tenant] = _Bucket(lim.burst, now)
+        else:
+            b.tokens = min(lim.burst, b.tokens + (now - b.stamp) * lim.rate)
+            b.stamp = now
+        return b, lim
+
+    def take(self, counts: Mapping[str, int]) -> Optional[Tuple[str, Optional[int]]]:
+        """
+        Takes counts[tenant] tokens from every tenant, all or nothing.
+        Returns None if allowed, else (tenant, retry_after_seconds), with
+        retry_after None when counts[tenant] is more than the tenant's burst
+        (the request can never fit, however long the client waits).
+        """
+        now = time.monotonic()
+        checked = []
+        for tenant, n in counts.items():
+            b, lim = self._refill(tenant, now)
+            if b is None:
+                continue
+            if n > lim.burst:
+                self.limited += 1
+                return tenant, None
+            if b.tokens < n:
+                self.limited += 1
+                return tenant, max(1, math.ceil((n - b.tokens) / lim.rate))
+            checked.append((b, n))
+        for b, n in checked:
+            b.tokens -= n
+        return None
+
+    def prune(self) -> None:
+        cutoff = time.monotonic() - _IDLE_SEC
+        for t in [t for t, b in self._buckets.items() if b.stamp < cutoff]:
+            del self._buckets[t]
+
+    def burst(self, tenant: str) -> float:
+        return self.limits.get(tenant).burst
+
+    def stats(self) -> Dict[str, Any]:
+        return {"tracked_tenants": len(self._buckets), "limited": self.limited}
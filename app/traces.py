@@ -0,0 +1,129 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from .repo import COL, Row
+
+# (trace_id, tenant_id or None for all tenants) -> events
+Loader = Callable[[str, Optional[str]], Awaitable[List[Dict[str, Any]]]]
+Key = Tuple[Optional[str], str]  # (tenant_id, trace_id)
+
+
+def _retrieve(task: asyncio.Task) -> None:
+    # a failed load whose waiters all went away must not log "never retrieved"
+    if not task.cancelled():
+        task.exception()
+
+
+class TraceCache:
+    """
+    Bounded LRU + TTL cache of assembled traces ((tenant, trace_id) -> events;
+    tenant None = a trace across all tenants, for unscoped keys).
+
+    - Concurrent misses for the same trace share one DB query, which runs
+      to completion even if the request that started it is cancelled.
+    - Batcher flushes invalidate the traces they touched (see on_flush), and
+      a load that was in flight during an invalidation is not cached.
+    """
+
+    def __init__(self, loader: Loader, max_entries: int, ttl_sec: float):
+        self._loader = loader
+        self._max = max_entries
+        self._ttl = ttl_sec
+        self._data: "OrderedDict[Key, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._inflight: Dict[Key, asyncio.Future] = {}
+        self._stale: Set[Key] = set()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def get(self, trace_id: str, tenant_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        key = (tenant_id, trace_id)
+        hit = self._data.get(key)
+        if hit is not None:
+            expires, events = hit
+            if expires > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return events
+            del self._data[key]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.hits += 1
+            return await asyncio.shield(task)
+
+        self.misses += 1
+        # the load is its own task, so a client that gives up (cancelling this
+        # request) doesn't cancel it for everyone else waiting on the same trace
+        task = asyncio.create_task(self._load(key, trace_id, tenant_id), name="trace-load")
+        task.add_done_callback(_retrieve)
+        self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _load(self, key: Key, trace_id: str, tenant_id: Optional[str]) -> List[Dict[str, Any]]:
+        try:
+            events = await self._loader(trace_id, tenant_id)
+        finally:
+            self._inflight.pop(key, None)
+            stale = key in self._stale
+            self._stale.discard(key)
+        if not stale:
+            self._put(key, events)
+        return events
+
+    def _put(self, key: Key, events: List[Dict[str, Any]]) -> None:
+        self._data[key] = (time.monotonic() + self._ttl, events)
+        self._data.move_to_end(key)
+        while len(self._data) > self._max:
+            self._data.popitem(last=False)
+
+    def invalidate(self, trace_id: str, tenant_id: Optional[str] = None) -> None:
+        """Drops the trace as seen by tenant_id and by unscoped readers."""
+        for key in {(tenant_id, trace_id), (None, trace_id)}:
+            if self._data.pop(key, None) is not None:
+                self.invalidations += 1
+            if key in self._inflight:
+                self._stale.add(key)
+
+    def on_flush(self, rows: List[Row]) -> None:
+        """Batcher flush hook: drop cached traces that just got new events."""
+        if not self._data and not self._inflight:
+            return
+        idx, t_idx = COL["trace_id"], COL["tenant_id"]
+        for trace_id, tenant_id in {(r[idx], r[t_idx]) for r in rows if r[idx] is not None}:
+            self.invalidate(trace_id, tenant_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+def assemble(trace_id: str, events: List[Dict[str, Any]], truncated: bool) -> Dict[str, Any]:
+    """Groups time-ordered events by spanId (spans ordered by first event)."""
+    spans: "OrderedDict[Optional[str], List[Dict[str, Any]]]" = OrderedDict()
+    for e in events:
+        spans.setdefault(e.get("spanId"), []).append(e)
+
+    return {
+        "traceId": trace_id,
+        "eventCount": len(events),
+        "truncated": truncated,
+        "start": events[0]["occurredAt"] if events else None,
+        "end": events[-1]["occurredAt"] if events else None,
+        "spans": [
+            {
+                "spanId": span_id,
+                "start": evs[0]["occurredAt"],
+                "end": evs[-1]["occurredAt"],
+                "events": evs,
+            }
+            for span_id, evs in spans.items()
+        ],
+    }
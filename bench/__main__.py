@@ -0,0 +1,109 @@
+"""
+Ingest benchmark suite.
+
+  python -m bench                                  # validation + batcher (no DB)
+  python -m bench --suites all --out run.json      # + insert and http (needs DATABASE_URL)
+  python -m bench --baseline run.json              # exit 1 on a >10% regression
+
+Suites:
+  validation  LogEvent model vs fast-path parsing, single events and batches
+  batcher     enqueue cost and drain rate through the flush workers (no-op sink)
+  insert      repo.insert_batch rows/sec, executemany vs COPY (Postgres)
+  http        POST /v1/logs and /v1/logs/batch through the in-process ASGI app (Postgres)
+
+Each case reports p50/p99/max latency per operation (ms) and events/sec.
+The search index insert comparison is separate: python -m bench.search_index_insert
+"""
+import os
+
+# before any app import: settings are read at import time. No disk spool
+# (measure the queue, not the disk), no per-tenant cap below the queue size.
+os.environ.setdefault("SPOOL_ENABLED", "false")
+os.environ.setdefault("TENANT_QUEUE_MAX", os.getenv("QUEUE_MAX", "20000"))
+
+import argparse  # noqa: E402
+import json  # noqa: E402
+import platform  # noqa: E402
+import subprocess  # noqa: E402
+import sys  # noqa: E402
+from datetime import datetime, timezone  # noqa: E402
+
+from .common import compare, dump  # noqa: E402
+
+SUITES = ("validation", "batcher", "insert", "http")
+NEEDS_DB = ("insert", "http")
+
+
+def _git_rev() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(prog="python -m bench", description=__doc__.split("\n\n")[0])
+    ap.add_argument("--suites", default="validation,batcher", help=f"comma list of {', '.join(SUITES)} or 'all'")
+    ap.add_argument("--events", type=int, default=None, help="events per case (suite default if unset)")
+    ap.add_argument("--concurrency", type=int, default=32, help="http suite: concurrent clients")
+    ap.add_argument("--out", help="also write the JSON result here")
+    ap.add_argument("--baseline", help="earlier result to compare against")
+    ap.add_argument("--tolerance", type=float, default=0.10, help="allowed regression (0.10 = 10%%)")
+    args = ap.parse_args()
+
+    suites = SUITES if args.suites == "all" else tuple(s for s in args.suites.split(",") if s)
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        ap.error(f"unknown suite(s): {', '.join(sorted(unknown))}")
+
+    from app import settings
+
+    result = {
+        "meta": {
+            "started": datetime.now(timezone.utc).isoformat(),
+            "git": _git_rev(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "settings": {
+                k: getattr(settings, k)
+                for k in ("INSERT_MODE", "FLUSH_WORKERS", "BATCH_MAX", "BATCH_ADAPTIVE", "QUEUE_MAX",
+                          "DB_POOL_MAX", "INGEST_FAST_PATH", "STORAGE_COMPACT", "DEDUP_ENABLED")
+            },
+        },
+        "results": {},
+    }
+
+    for name in suites:
+        print(f"running {name}...", file=sys.stderr)
+        kwargs = {} if args.events is None else {"n": args.events}
+        if name == "validation":
+            from . import validation as mod
+        elif name == "batcher":
+            from . import batcher as mod
+        elif name == "insert":
+            from . import insert as mod
+        else:
+            from . import http as mod
+            kwargs["concurrency"] = args.concurrency
+        try:
+            result["results"][name] = mod.run(**kwargs)
+        except OSError as exc:
+            if name not in NEEDS_DB:
+                raise
+            # no local Postgres: keep the other suites' numbers
+            result["results"][name] = {"skipped": f"database unavailable: {exc}"}
+
+    dump(result, args.out)
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            regressions = compare(result, json.load(fh), args.tolerance)
+        for r in regressions:
+            print(f"REGRESSION {r}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
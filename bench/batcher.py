@@ -0,0 +1,57 @@
+"""
+Batcher overhead without a database: enqueue cost per event and the time to
+drain everything through the flush workers into a no-op sink.
+"""
+import asyncio
+import json
+import time
+from typing import Any, Dict, List
+
+from app import ingest
+from app.batcher import Batcher
+
+from .common import Timer, make_events, summarize
+
+
+async def _case(rows: List, workers: int, adaptive: bool) -> Dict[str, Any]:
+    written = 0
+
+    async def sink(batch):
+        nonlocal written
+        written += len(batch)
+
+    b = Batcher(workers=workers, adaptive=adaptive, sink=sink)
+    await b.start()
+    try:
+        with Timer() as t:
+            for i, row in enumerate(rows):
+                s = time.perf_counter_ns()
+                if not b.enqueue_row_nowait(row):
+                    raise RuntimeError("queue full: lower --events or raise QUEUE_MAX")
+                t.samples.append(time.perf_counter_ns() - s)
+                if i % 500 == 499:
+                    await asyncio.sleep(0)  # let workers run, like a real server would
+            # sampling may shed some rows, so wait for what was actually queued
+            deadline = time.monotonic() + 60
+            while written < b.enqueued and time.monotonic() < deadline:
+                await asyncio.sleep(0.001)
+    finally:
+        await b.stop()
+    return summarize(
+        t.samples, len(rows), t.elapsed,
+        written=written,
+        batches=sum(w.batches for w in b.worker_stats),
+    )
+
+
+async def _run(n: int) -> Dict[str, Any]:
+    rows = [ingest.parse_event(json.dumps(e).encode()) for e in make_events(n)]
+    return {
+        "static_4_workers": await _case(rows, workers=4, adaptive=False),
+        "adaptive_4_workers": await _case(rows, workers=4, adaptive=True),
+        "static_1_worker": await _case(rows, workers=1, adaptive=False),
+    }
+
+
+def run(n: int = 10_000) -> Dict[str, Any]:
+    return asyncio.run(_run(n))
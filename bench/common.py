@@ -0,0 +1,101 @@
+import json
+import random
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+LEVELS = ["info"] * 8 + ["debug", "warn", "error"]
+ROUTES = ["/order", "/users", "/search", "/users/{id}"]
+
+
+def make_event(i: int, tenant: str = "bench") -> Dict[str, Any]:
+    """Access-style event, roughly what locustfile.py sends."""
+    path = random.choice(ROUTES).replace("{id}", str(random.randrange(10**6)))
+    return {
+        "occurredAt": datetime.now(timezone.utc).isoformat(),
+        "tenantId": tenant,
+        "source": "order-service",
+        "environment": "dev",
+        "level": random.choice(LEVELS),
+        "type": "access",
+        "message": f"GET {path} completed",
+        "traceId": uuid.uuid4().hex,
+        "requestId": f"req-{i}",
+        "path": path,
+        "method": "GET",
+        "statusCode": random.choice((200, 200, 200, 201, 404, 500)),
+        "durationMs": random.randrange(1, 800),
+        "properties": {"region": "me-central-1", "attempt": 1},
+    }
+
+
+def make_events(n: int, tenant: str = "bench") -> List[Dict[str, Any]]:
+    return [make_event(i, tenant) for i in range(n)]
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    i = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[i]
+
+
+def summarize(latencies_ns: List[int], events: int, seconds: float, **extra: Any) -> Dict[str, Any]:
+    """
+    One benchmark case: latency percentiles (per operation, ms) and
+    throughput (events/sec over the whole wall-clock run).
+    """
+    lat = sorted(latencies_ns)
+    ms = lambda v: None if v is None else round(v / 1e6, 4)  # noqa: E731
+    return {
+        "ops": len(lat),
+        "events": events,
+        "seconds": round(seconds, 4),
+        "events_per_sec": round(events / seconds, 1) if seconds > 0 else None,
+        "p50_ms": ms(percentile(lat, 0.50)),
+        "p99_ms": ms(percentile(lat, 0.99)),
+        "max_ms": ms(lat[-1] if lat else None),
+        **extra,
+    }
+
+
+class Timer:
+    """Wall clock for a whole case, plus per-operation samples."""
+
+    def __init__(self):
+        self.samples: List[int] = []
+        self.t0 = 0.0
+        self.elapsed = 0.0
+
+    def __enter__(self) -> "Timer":
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.elapsed = time.perf_counter() - self.t0
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Cases where throughput dropped or p99 grew by more than tolerance (0.1 = 10%)."""
+    out = []
+    for suite, cases in current.get("results", {}).items():
+        for case, cur in cases.items():
+            base = baseline.get("results", {}).get(suite, {}).get(case)
+            if not isinstance(base, dict) or not isinstance(cur, dict):
+                continue
+            b, c = base.get("events_per_sec"), cur.get("events_per_sec")
+            if b and c is not None and c < b * (1 - tolerance):
+                out.append(f"{suite}/{case}: events_per_sec {b} -> {c}")
+            b, c = base.get("p99_ms"), cur.get("p99_ms")
+            if b and c is not None and c > b * (1 + tolerance):
+                out.append(f"{suite}/{case}: p99_ms {b} -> {c}")
+    return out
+
+
+def dump(result: Dict[str, Any], path: Optional[str]) -> None:
+    text = json.dumps(result, indent=2, default=str)
+    if path:
+        with open(path, "w") as fh:
+            fh.write(text + "\n")
+    print(text)
@@ -0,0 +1,108 @@
+"""
+End-to-end HTTP throughput with the ASGI app in process: requests are fed
+straight into app(scope, receive, send), so the numbers cover routing,
+auth, validation, queueing and the real flush to Postgres, but no sockets.
+"""
+import asyncio
+import json
+import time
+import uuid
+from typing import Any, Dict, List, Tuple
+
+from app import db
+from app.main import app, batcher
+from app.settings import INGEST_TOKEN
+
+from .common import Timer, make_events, summarize
+
+
+async def call(path: str, body: bytes) -> int:
+    """One POST through the ASGI app; returns the status code."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": b"",
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"authorization", f"Bearer {INGEST_TOKEN}".encode()),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": ("127.0.0.1", 50000), "server": ("bench", 80),
+    }
+    sent = False
+    status = 0
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.sleep(3600)
+        return {"type": "http.disconnect"}
+
+    async def send(msg):
+        nonlocal status
+        if msg["type"] == "http.response.start":
+            status = msg["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def _case(path: str, bodies: List[Tuple[bytes, int]], concurrency: int) -> Dict[str, Any]:
+    flushed0 = batcher.flushed
+    statuses: Dict[int, int] = {}
+    queue = list(reversed(bodies))
+    accepted = 0
+
+    async def worker(t: Timer):
+        nonlocal accepted
+        while queue:
+            body, n = queue.pop()
+            s = time.perf_counter_ns()
+            st = await call(path, body)
+            t.samples.append(time.perf_counter_ns() - s)
+            statuses[st] = statuses.get(st, 0) + 1
+            if st == 202:
+                accepted += n
+
+    with Timer() as t:
+        await asyncio.gather(*(worker(t) for _ in range(concurrency)))
+    http_seconds = t.elapsed
+
+    # then until the batcher has written everything it accepted
+    deadline = time.monotonic() + 120
+    while (batcher.qsize() or any(w.busy for w in batcher.worker_stats)) and time.monotonic() < deadline:
+        await asyncio.sleep(0.005)
+    committed_seconds = time.perf_counter() - t.t0
+
+    return summarize(
+        t.samples, accepted, http_seconds,
+        concurrency=concurrency,
+        statuses={str(k): v for k, v in statuses.items()},
+        committed_events_per_sec=round((batcher.flushed - flushed0) / committed_seconds, 1),
+    )
+
+
+async def _run(n: int, concurrency: int) -> Dict[str, Any]:
+    tenant = f"bench-{uuid.uuid4().hex[:8]}"
+    events = make_events(n, tenant)
+    singles = [(json.dumps(e).encode(), 1) for e in events]
+    # second pass with fresh ids, or dedup would drop it all
+    for e in events:
+        e["requestId"] = uuid.uuid4().hex
+    batches = [(json.dumps(events[i:i + 100]).encode(), len(events[i:i + 100])) for i in range(0, n, 100)]
+
+    out = {}
+    async with app.router.lifespan_context(app):
+        try:
+            out["post_single"] = await _case("/v1/logs", singles, concurrency)
+            out["post_batch_100"] = await _case("/v1/logs/batch", batches, concurrency)
+        finally:
+            async with db.acquire() as conn:
+                await conn.execute("DELETE FROM log_events WHERE tenant_id = $1", tenant)
+    return out
+
+
+def run(n: int = 10_000, concurrency: int = 32) -> Dict[str, Any]:
+    return asyncio.run(_run(n, concurrency))
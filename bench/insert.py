@@ -0,0 +1,47 @@
+"""
+repo.insert_batch rows/sec against a real Postgres, executemany vs COPY, at
+a few batch sizes. Rows go into log_events under a throwaway tenant and are
+deleted afterwards.
+"""
+import asyncio
+import time
+import uuid
+from typing import Any, Dict, Sequence
+
+from app import db, repo
+from app.models import LogEvent
+
+from .common import Timer, make_events, summarize
+
+
+async def _case(events, mode: str, batch: int) -> Dict[str, Any]:
+    with Timer() as t:
+        for i in range(0, len(events), batch):
+            s = time.perf_counter_ns()
+            await repo.insert_batch(events[i:i + batch], mode)
+            t.samples.append(time.perf_counter_ns() - s)
+    return summarize(t.samples, len(events), t.elapsed, batch=batch)
+
+
+async def _run(n: int, batch_sizes: Sequence[int]) -> Dict[str, Any]:
+    tenant = f"bench-{uuid.uuid4().hex[:8]}"
+    events = [LogEvent.model_validate(e) for e in make_events(n, tenant)]
+    for e in events:
+        e.occurredAt = None  # no dedup keys: same rows for every case
+    out = {}
+    await db.connect()
+    try:
+        for mode in ("executemany", "copy"):
+            for batch in batch_sizes:
+                out[f"{mode}_{batch}"] = await _case(events, mode, batch)
+    finally:
+        try:
+            async with db.acquire() as conn:
+                await conn.execute("DELETE FROM log_events WHERE tenant_id = $1", tenant)
+        finally:
+            await db.disconnect()
+    return out
+
+
+def run(n: int = 20_000, batch_sizes: Sequence[int] = (100, 1000)) -> Dict[str, Any]:
+    return asyncio.run(_run(n, batch_sizes))
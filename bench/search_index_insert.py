@@ -0,0 +1,92 @@
+"""
+Insert throughput with and without the message search index (migration 007).
+
+Copies the same generated rows into scratch tables shaped like log_events:
+  plain       no search index
+  gin         GIN on lis_search_doc(...) with fastupdate (what 007 creates)
+  gin_direct  same index, fastupdate = off (every insert updates the tree)
+
+Needs a database with migrations 001-007 applied:
+
+  DATABASE_URL=postgresql://... python -m bench.search_index_insert --rows 200000 --batch 1000
+
+Prints one JSON object; the scratch tables are dropped afterwards.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import asyncpg
+
+from app.repo import COLUMNS, dict_row, utc_now
+from app.settings import DATABASE_URL
+
+_WORDS = "user order payment cache timeout retry session token invoice shipment".split()
+_INDEX = "USING gin (lis_search_doc(message, message_params)) WITH (fastupdate = {fast})"
+
+VARIANTS = {
+    "plain": None,
+    "gin": _INDEX.format(fast="on"),
+    "gin_direct": _INDEX.format(fast="off"),
+}
+
+
+def make_rows(n: int):
+    now = utc_now()
+    rows = []
+    for i in range(n):
+        msg = " ".join(random.choices(_WORDS, k=6)) + f" id={random.randrange(10**6)}"
+        rows.append(dict_row({
+            "tenantId": "bench", "source": "bench", "environment": "dev",
+            "level": "info", "type": "app", "message": msg, "requestId": str(i),
+        }, now))
+    return rows
+
+
+async def run_variant(conn, name: str, index: str, rows, batch: int) -> dict:
+    table = f"bench_search_{name}"
+    await conn.execute(f"DROP TABLE IF EXISTS {table}")
+    await conn.execute(f"CREATE TABLE {table} (LIKE log_events INCLUDING DEFAULTS)")
+    if index:
+        await conn.execute(f"CREATE INDEX ON {table} {index}")
+    try:
+        wal0 = await conn.fetchval("SELECT pg_current_wal_lsn()")
+        t0 = time.perf_counter()
+        for i in range(0, len(rows), batch):
+            await conn.copy_records_to_table(table, records=rows[i:i + batch], columns=COLUMNS)
+        elapsed = time.perf_counter() - t0
+        wal = await conn.fetchval("SELECT pg_current_wal_lsn() - $1::pg_lsn", wal0)
+        size = await conn.fetchval(f"SELECT pg_total_relation_size('{table}')")
+        return {
+            "rows": len(rows),
+            "seconds": round(elapsed, 3),
+            "rows_per_sec": round(len(rows) / elapsed),
+            "wal_bytes": int(wal),
+            "total_bytes": size,
+        }
+    finally:
+        await conn.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+async def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--batch", type=int, default=1000)
+    ap.add_argument("--variants", default=",".join(VARIANTS))
+    args = ap.parse_args()
+
+    rows = make_rows(args.rows)
+    conn = await asyncpg.connect(DATABASE_URL)
+    try:
+        results = {}
+        for name in args.variants.split(","):
+            results[name] = await run_variant(conn, name, VARIANTS[name], rows, args.batch)
+    finally:
+        await conn.close()
+    print(json.dumps({"batch": args.batch, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
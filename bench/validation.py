@@ -0,0 +1,39 @@
+"""LogEvent validation: model path vs fast path, single events and 500-event batches."""
+import json
+import time
+from typing import Any, Dict
+
+from app import ingest
+from app.models import LogEvent
+from app.repo import event_row, utc_now
+
+from .common import Timer, make_events, summarize
+
+
+def run(n: int = 20_000) -> Dict[str, Any]:
+    events = make_events(n)
+    bodies = [json.dumps(e).encode() for e in events]
+    batch_bodies = [json.dumps(events[i:i + 500]).encode() for i in range(0, n, 500)]
+    out = {}
+
+    with Timer() as t:
+        for b in bodies:
+            s = time.perf_counter_ns()
+            event_row(LogEvent.model_validate_json(b), utc_now())
+            t.samples.append(time.perf_counter_ns() - s)
+    out["model_single"] = summarize(t.samples, n, t.elapsed)
+
+    with Timer() as t:
+        for b in bodies:
+            s = time.perf_counter_ns()
+            ingest.parse_event(b)
+            t.samples.append(time.perf_counter_ns() - s)
+    out["fast_single"] = summarize(t.samples, n, t.elapsed)
+
+    with Timer() as t:
+        for b in batch_bodies:
+            s = time.perf_counter_ns()
+            ingest.parse_batch(b)
+            t.samples.append(time.perf_counter_ns() - s)
+    out["fast_batch_500"] = summarize(t.samples, n, t.elapsed)
+    return out
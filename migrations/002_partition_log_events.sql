@@ -0,0 +1,94 @@
+-- Range-partition log_events by occurred_at.
+--
+-- No rows are copied: the existing table is renamed to log_events_legacy and
+-- attached as one partition covering everything up to the cutover (start of
+-- the day after the newest event / today). New data lands in daily or hourly
+-- partitions created by the service's partition manager (app/partitions.py);
+-- events with no matching partition go to log_events_default.
+--
+-- Note: the primary key becomes (id, occurred_at) because Postgres requires
+-- the partition key in every unique constraint. Attaching the legacy table
+-- builds that index on it once.
+
+BEGIN;
+
+ALTER TABLE log_events RENAME TO log_events_legacy;
+ALTER TABLE log_events_legacy RENAME CONSTRAINT log_events_pkey TO log_events_legacy_pkey;
+ALTER INDEX idx_log_events_tenant_time RENAME TO idx_log_events_legacy_tenant_time;
+ALTER INDEX idx_log_events_source_time RENAME TO idx_log_events_legacy_source_time;
+ALTER INDEX idx_log_events_level_time  RENAME TO idx_log_events_legacy_level_time;
+ALTER INDEX idx_log_events_trace_id    RENAME TO idx_log_events_legacy_trace_id;
+
+CREATE TABLE log_events (
+  id            UUID NOT NULL DEFAULT gen_random_uuid(),
+
+  occurred_at   TIMESTAMPTZ NOT NULL,
+  received_at   TIMESTAMPTZ NOT NULL DEFAULT now(),
+
+  tenant_id     TEXT NOT NULL,
+  source        TEXT NOT NULL,
+  environment   TEXT NOT NULL,
+
+  level         TEXT NOT NULL,
+  type          TEXT NOT NULL,
+  message       TEXT NOT NULL,
+
+  trace_id       TEXT NULL,
+  span_id        TEXT NULL,
+  correlation_id TEXT NULL,
+  request_id     TEXT NULL,
+
+  user_id       TEXT NULL,
+
+  path          TEXT NULL,
+  method        TEXT NULL,
+  status_code   INT NULL,
+  duration_ms   INT NULL,
+
+  exception     JSONB NULL,
+  properties    JSONB NULL,
+
+  PRIMARY KEY (id, occurred_at)
+) PARTITION BY RANGE (occurred_at);
+
+-- Same indexes as before; created on every partition automatically
+CREATE INDEX IF NOT EXISTS idx_log_events_tenant_time
+  ON log_events (tenant_id, occurred_at DESC);
+
+CREATE INDEX IF NOT EXISTS idx_log_events_source_time
+  ON log_events (source, occurred_at DESC);
+
+CREATE INDEX IF NOT EXISTS idx_log_events_level_time
+  ON log_events (level, occurred_at DESC);
+
+CREATE INDEX IF NOT EXISTS idx_log_events_trace_id
+  ON log_events (trace_id);
+
+-- Late / early events with no matching range partition
+CREATE TABLE log_events_default PARTITION OF log_events DEFAULT;
+
+DO $$
+DECLARE
+  cutover TIMESTAMPTZ;
+BEGIN
+  SELECT date_trunc('day', greatest(now(), coalesce(max(occurred_at), now())) AT TIME ZONE 'UTC')
+           AT TIME ZONE 'UTC' + interval '1 day'
+    INTO cutover
+    FROM log_events_legacy;
+
+  -- the CHECK lets ATTACH skip its own validation scan
+  EXECUTE format(
+    'ALTER TABLE log_events_legacy ADD CONSTRAINT log_events_legacy_range CHECK (occurred_at < %L)',
+    cutover);
+  EXECUTE format(
+    'ALTER TABLE log_events ATTACH PARTITION log_events_legacy FOR VALUES FROM (MINVALUE) TO (%L)',
+    cutover);
+END $$;
+
+-- Per-tenant retention (days). Tenants without a row use RETENTION_DAYS.
+CREATE TABLE IF NOT EXISTS log_retention_policies (
+  tenant_id       TEXT PRIMARY KEY,
+  retention_days  INT NOT NULL CHECK (retention_days > 0)
+);
+
+COMMIT;
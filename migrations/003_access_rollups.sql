@@ -0,0 +1,19 @@
+-- Per-minute access-log rollups, written by the service (app/rollups.py)
+-- and read by GET /v1/metrics/access instead of aggregating raw log_events.
+
+CREATE TABLE IF NOT EXISTS access_rollups_1m (
+  bucket        TIMESTAMPTZ NOT NULL,          -- start of the minute (UTC)
+  tenant_id     TEXT NOT NULL,
+  source        TEXT NOT NULL,
+  path          TEXT NOT NULL,                 -- '__other__' once a window hits ROLLUP_MAX_KEYS
+  method        TEXT NOT NULL,                 -- '' when missing
+  status_class  SMALLINT NOT NULL,             -- 2 = 2xx, 5 = 5xx, 0 = no status
+
+  count         BIGINT NOT NULL,
+  duration_sum  BIGINT NOT NULL,               -- ms, over events that had durationMs
+  duration_n    BIGINT NOT NULL,
+  duration_max  INT NOT NULL,
+  latency_hist  BIGINT[] NOT NULL,             -- counts per rollups.LATENCY_BOUNDS_MS bucket
+
+  PRIMARY KEY (tenant_id, bucket, source, path, method, status_class)
+);
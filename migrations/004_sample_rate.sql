@@ -0,0 +1,5 @@
+-- Keep-rate each stored event was sampled at (app/sampling.py).
+-- 1 = not sampled; a row with 0.25 stands for 4 events, so weighted counts
+-- are sum(1 / sample_rate). Constant default: no table rewrite.
+
+ALTER TABLE log_events ADD COLUMN IF NOT EXISTS sample_rate REAL NOT NULL DEFAULT 1;
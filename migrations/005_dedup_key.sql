@@ -0,0 +1,39 @@
+-- Idempotent ingest: retried events carry the same dedup_key (client eventId,
+-- or a content hash with DEDUP_CONTENT_HASH, see repo.dedup_key) and the
+-- insert path uses ON CONFLICT DO NOTHING. The partition key has to be part
+-- of the unique index, so this catches retries that repeat occurredAt; NULL
+-- keys never conflict.
+--
+-- The unique index is built CONCURRENTLY so a live log_events keeps taking
+-- writes. That can't run in a transaction block: apply this file with psql
+-- (it uses \gexec), not with --single-transaction. On a partitioned
+-- log_events (002) the parent index is created ON ONLY (no scan), then each
+-- partition's index is built CONCURRENTLY and attached; partitions created
+-- later get theirs on ATTACH. If a build fails, drop the invalid
+-- <partition>_dedup_key index it left behind and re-run; every step is
+-- idempotent.
+
+ALTER TABLE log_events ADD COLUMN IF NOT EXISTS dedup_key TEXT NULL;
+
+-- plain (unpartitioned) table
+SELECT 'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS uq_log_events_dedup
+          ON log_events (tenant_id, dedup_key, occurred_at)'
+WHERE (SELECT relkind FROM pg_class WHERE oid = 'log_events'::regclass) = 'r'
+\gexec
+
+-- partitioned table: the parent index stays invalid until every partition
+-- has one attached
+SELECT 'CREATE UNIQUE INDEX IF NOT EXISTS uq_log_events_dedup
+          ON ONLY log_events (tenant_id, dedup_key, occurred_at)'
+WHERE (SELECT relkind FROM pg_class WHERE oid = 'log_events'::regclass) = 'p'
+\gexec
+
+SELECT
+  format('CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS %I ON %I (tenant_id, dedup_key, occurred_at)',
+         c.relname || '_dedup_key', c.relname),
+  format('ALTER INDEX uq_log_events_dedup ATTACH PARTITION %I', c.relname || '_dedup_key')
+FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = 'log_events'::regclass
+ORDER BY c.relname
+\gexec
@@ -0,0 +1,37 @@
+-- Compact storage (STORAGE_COMPACT=true, app/templates.py).
+--
+-- Repetitive messages are stored as a template id plus parameters and
+-- identical exceptions once by hash. Such rows have message = '' and
+-- exception = NULL; the read paths rebuild both (repo._MESSAGE_SQL /
+-- _EXCEPTION_SQL), so rows written either way can coexist.
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS log_templates (
+  id          BIGINT PRIMARY KEY,              -- hash of tokens (templates.template_id)
+  tokens      TEXT[] NOT NULL,                 -- NULL element = parameter
+  created_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS log_exceptions (
+  id          BIGINT PRIMARY KEY,              -- hash of the JSON text (templates.exception_id)
+  body        JSONB NOT NULL,
+  created_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+ALTER TABLE log_events ADD COLUMN IF NOT EXISTS template_id    BIGINT NULL;
+ALTER TABLE log_events ADD COLUMN IF NOT EXISTS message_params TEXT[] NULL;
+ALTER TABLE log_events ADD COLUMN IF NOT EXISTS exception_id   BIGINT NULL;
+
+-- Joins the template's tokens with single spaces, filling NULL tokens with
+-- params in order (same as templates.render).
+CREATE OR REPLACE FUNCTION lis_render_message(tpl TEXT[], params TEXT[]) RETURNS TEXT
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+  SELECT string_agg(CASE WHEN t.tok IS NULL THEN params[t.n] ELSE t.tok END, ' ' ORDER BY t.i)
+  FROM (
+    SELECT tok, i, count(*) FILTER (WHERE tok IS NULL) OVER (ORDER BY i) AS n
+    FROM unnest(tpl) WITH ORDINALITY AS u(tok, i)
+  ) t
+$$;
+
+COMMIT;
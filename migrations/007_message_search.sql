@@ -0,0 +1,32 @@
+-- Full-text search over messages (GET /v1/logs/search).
+--
+-- The index is on an expression rather than a stored tsvector column, so
+-- COPY/INSERT don't carry an extra column: the tsvector is only built for
+-- the GIN index. fastupdate + a larger pending list turn each insert into an
+-- append to the index's pending list, merged in bulk by (auto)vacuum, which
+-- keeps the GIN cost off the insert path.
+--
+-- Created ON ONLY the parent, so this migration doesn't lock or scan
+-- existing partitions. The service builds the missing per-partition indexes
+-- with CREATE INDEX CONCURRENTLY in the background
+-- (partitions.ensure_search_indexes); partitions created later get theirs on
+-- ATTACH.
+
+BEGIN;
+
+-- Search text of one row: the message, plus template parameters for rows
+-- written with STORAGE_COMPACT (their template words are matched through
+-- log_templates instead, see repo.search_logs).
+CREATE OR REPLACE FUNCTION lis_search_doc(message TEXT, params TEXT[]) RETURNS tsvector
+LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+  SELECT to_tsvector('simple'::regconfig, message || ' ' || coalesce(array_to_string(params, ' '), ''))
+$$;
+
+CREATE INDEX IF NOT EXISTS idx_log_events_search
+  ON ONLY log_events USING gin (lis_search_doc(message, message_params))
+  WITH (fastupdate = on, gin_pending_list_limit = 16384);
+
+CREATE INDEX IF NOT EXISTS idx_log_templates_search
+  ON log_templates USING gin (to_tsvector('simple'::regconfig, array_to_string(tokens, ' ')));
+
+COMMIT;
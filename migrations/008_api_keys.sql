@@ -0,0 +1,16 @@
+-- Per-tenant API keys (app/apikeys.py, API_KEYS_ENABLED=true). Only a SHA-256 of each key is
+-- stored; the key itself is shown once when it is created:
+--
+--   python -m app.apikeys create --tenant jeddah --label "auth service"
+--
+-- tenant_id '*' = may write any tenant. The service loads active keys into
+-- memory and refreshes every API_KEYS_REFRESH_SEC.
+
+CREATE TABLE IF NOT EXISTS api_keys (
+  key_id      TEXT PRIMARY KEY,                -- public part, "lis_<key_id>_<secret>"
+  key_hash    BYTEA NOT NULL UNIQUE,           -- sha256 of the whole key
+  tenant_id   TEXT NOT NULL,
+  label       TEXT NULL,
+  created_at  TIMESTAMPTZ NOT NULL DEFAULT now(),
+  revoked_at  TIMESTAMPTZ NULL
+);
@@ -0,0 +1,26 @@
+-- Archived (exported) log events, see app/archive.py. Before retention
+-- drops a partition or deletes a tenant's expired rows, they are written to
+-- Parquet files in the archive store (ARCHIVE_URL). Each verified file gets
+-- a row here; GET /v1/archive/logs finds files through this catalog.
+
+CREATE TABLE IF NOT EXISTS log_archives (
+  key         TEXT PRIMARY KEY,                -- path in the archive store
+  tenant_id   TEXT NOT NULL,
+  min_ts      TIMESTAMPTZ NOT NULL,            -- occurred_at range of the rows in the file
+  max_ts      TIMESTAMPTZ NOT NULL,
+  row_count   BIGINT NOT NULL,
+  bytes       BIGINT NOT NULL,
+  sha256      TEXT NOT NULL,
+  source_rel  TEXT NOT NULL,                   -- partition / table the rows came from
+  created_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_log_archives_tenant_time
+  ON log_archives (tenant_id, max_ts);
+
+-- Partitions detached for archiving and not dropped yet. A row left behind
+-- by a crashed run is picked up (re-archived) by the next one.
+CREATE TABLE IF NOT EXISTS log_archive_jobs (
+  rel          TEXT PRIMARY KEY,
+  detached_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
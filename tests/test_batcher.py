@@ -0,0 +1,185 @@
+"""
+Batcher with a fake sink and a temp-dir spool: parallel flush workers,
+poison rows bisected out to the dead-letter file, spill to the spool
+while the DB is down and replay once it is back, and the shutdown drain.
+"""
+import asyncio
+
+from app import repo
+from app.batcher import Batcher
+from app.spool import Spool
+from app.tenants import TenantLimits
+
+
+def _rows(*messages, event_id=None):
+    now = repo.utc_now()
+    return [
+        repo.dict_row(
+            {
+                "tenantId": "t1", "source": "svc", "environment": "test", "level": "info", "type": "app",
+                "message": m, "eventId": event_id,
+            },
+            now,
+        )
+        for m in messages
+    ]
+
+
+def _message(row):
+    return row[repo.COL["message"]]
+
+
+class FakeSink:
+    """Refuses batches with a 'bad' row (data error) and, while down, everything."""
+
+    def __init__(self, delay=0.0):
+        self.written = []
+        self.delay = delay
+        self.down = False
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, rows):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            if self.down:
+                raise ConnectionError("db down")
+            if any(_message(r).startswith("bad") for r in rows):
+                raise ValueError("bad row")
+            self.written.extend(rows)
+        finally:
+            self.in_flight -= 1
+
+
+def _batcher(tmp_path, sink, workers=1):
+    return Batcher(
+        workers=workers,
+        spool=Spool(str(tmp_path), 1 << 20),
+        adaptive=False,
+        sink=sink,
+        limits=TenantLimits(None),
+    )
+
+
+async def _until(cond, timeout=2.0):
+    loop = asyncio.get_running_loop()
+    end = loop.time() + timeout
+    while not cond():
+        assert loop.time() < end, "timed out"
+        await asyncio.sleep(0.005)
+
+
+def test_workers_flush_in_parallel(tmp_path, monkeypatch):
+    monkeypatch.setattr("app.batcher.BATCH_MAX", 10)
+
+    async def main():
+        sink = FakeSink(delay=0.02)
+        b = _batcher(tmp_path, sink, workers=4)
+        for row in _rows(*(f"m{i}" for i in range(100))):
+            assert b.enqueue_row_nowait(row)
+        await b.start()
+        await _until(lambda: b.flushed == 100)
+        await b.stop()
+        assert sorted(_message(r) for r in sink.written) == sorted(f"m{i}" for i in range(100))
+        assert sink.max_in_flight > 1
+        # batches are capped at BATCH_MAX, not necessarily full (no linger)
+        assert sum(w.batches for w in b.worker_stats) >= 10
+        assert all(w.last_batch_size <= 10 for w in b.worker_stats)
+
+    asyncio.run(main())
+
+
+def test_poison_rows_go_to_dead_letter(tmp_path):
+    async def main():
+        sink = FakeSink()
+        b = _batcher(tmp_path, sink)
+        hooked = []
+        b.add_flush_hook(hooked.extend)
+        for row in _rows("a", "bad1", "b", "c", "bad2", "d"):
+            b.enqueue_row_nowait(row)
+        await b.flush_now()
+        return b, sink, hooked
+
+    b, sink, hooked = asyncio.run(main())
+    assert sorted(_message(r) for r in sink.written) == ["a", "b", "c", "d"]
+    assert sorted(_message(r) for r in hooked) == ["a", "b", "c", "d"]
+    assert (b.flushed, b.dead_lettered, b.spooled) == (4, 2, 0)
+    assert b.spool.stats()["dead_lettered"] == 2
+    assert len(b.spool.dead_letter_path.read_text().splitlines()) == 2
+
+
+def test_spill_while_down_then_replay(tmp_path):
+    async def main():
+        sink = FakeSink()
+        sink.down = True
+        b = _batcher(tmp_path, sink)
+        for row in _rows("a", "b"):
+            b.enqueue_row_nowait(row)
+        await b.flush_now()
+        assert (b.flushed, b.spooled, b.flush_errors) == (0, 2, 1)
+
+        # still down: replay fails and leaves the segment alone
+        try:
+            await b._replay_once()
+        except ConnectionError:
+            pass
+        assert b.spool.has_pending()
+
+        sink.down = False
+        await b._replay_once()
+        return b, sink
+
+    b, sink = asyncio.run(main())
+    assert [_message(r) for r in sink.written] == ["a", "b"]
+    assert b.replayed == 2
+    assert not b.spool.has_pending()
+
+
+def test_replay_writes_around_poison(tmp_path):
+    async def main():
+        sink = FakeSink()
+        b = _batcher(tmp_path, sink)
+        b.spool.append(_rows("a", "bad", "b"))
+        b.spool.append(_rows("c"))
+        await b._replay_once()
+        return b, sink
+
+    b, sink = asyncio.run(main())
+    assert [_message(r) for r in sink.written] == ["a", "b", "c"]
+    assert (b.replayed, b.dead_lettered) == (3, 1)
+    assert not b.spool.has_pending()
+
+
+def test_stop_spools_what_the_deadline_cuts_off(tmp_path):
+    async def main():
+        sink = FakeSink(delay=10.0)  # a write that never finishes in time
+        b = _batcher(tmp_path, sink)
+        await b.start()
+        for row in _rows("a", "b", "c"):
+            b.enqueue_row_nowait(row)
+        await _until(lambda: b.worker_stats[0].busy)
+        await b.stop(deadline=0.05)
+        assert not b.enqueue_row_nowait(_rows("late")[0])
+        return b
+
+    b = asyncio.run(main())
+    assert b.flushed == 0
+    spooled = [_message(r) for seg in b.spool.sealed_segments() for _, rows in b.spool.read(seg) for r in rows]
+    assert sorted(spooled) == ["a", "b", "c"]
+    assert b.drain_sec is not None
+
+
+def test_retried_event_id_is_dropped(tmp_path):
+    async def main():
+        b = _batcher(tmp_path, FakeSink())
+        assert b.enqueue_row_nowait(_rows("a", event_id="e1")[0])
+        assert b.enqueue_row_nowait(_rows("a again", event_id="e1")[0])
+        assert b.enqueue_row_nowait(_rows("b", event_id="e2")[0])
+        return b
+
+    b = asyncio.run(main())
+    assert b.qsize() == 2
+    assert b.dedup.stats()["duplicates"] == 1
@@ -0,0 +1,193 @@
+"""
+BrokerConsumer against the in-process MemoryBroker, with repo.write_rows
+replaced by a fake: acks after the write, bisects a batch down to its
+poison rows, and requeues (then redelivers) on a transient DB error.
+"""
+import asyncio
+
+import pytest
+
+from app import consumer as consumer_mod
+from app import mq, repo
+from app.consumer import BrokerConsumer
+
+
+def _rows(*messages):
+    now = repo.utc_now()
+    return [
+        repo.dict_row(
+            {"tenantId": "t1", "source": "svc", "environment": "test", "level": "info", "type": "app", "message": m},
+            now,
+        )
+        for m in messages
+    ]
+
+
+def _message(row):
+    return row[repo.COL["message"]]
+
+
+class FakeDB:
+    """Stands in for repo.write_rows: refuses rows whose message is 'bad'."""
+
+    def __init__(self, fail_times=0):
+        self.written = []
+        self.calls = 0
+        self.fail_times = fail_times  # transient failures before writes succeed
+        self.gate = None  # asyncio.Event the write waits for ("slow commit")
+
+    async def write_rows(self, rows, mode=None):
+        self.calls += 1
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.fail_times:
+            self.fail_times -= 1
+            raise ConnectionError("db down")
+        if any(_message(r) == "bad" for r in rows):
+            raise ValueError("bad row")
+        self.written.extend(rows)
+
+
+@pytest.fixture
+def db(monkeypatch):
+    fake = FakeDB()
+    monkeypatch.setattr(repo, "write_rows", fake.write_rows)
+    monkeypatch.setattr(consumer_mod, "_RETRY_SEC", 0.0)
+    return fake
+
+
+async def _until(cond, timeout=2.0):
+    loop = asyncio.get_running_loop()
+    end = loop.time() + timeout
+    while not cond():
+        assert loop.time() < end, "timed out"
+        await asyncio.sleep(0.005)
+
+
+async def _window_is_free(broker, c):
+    # every delivery was settled: a full prefetch window more still flows
+    before = c.rows_written
+    for i in range(broker.prefetch):
+        await broker.publish(mq.encode_rows(_rows(f"more{i}")))
+    await _until(lambda: c.rows_written == before + broker.prefetch)
+
+
+def _run(broker_messages, check, prefetch=8):
+    async def main():
+        broker = mq.MemoryBroker(prefetch=prefetch)
+        c = BrokerConsumer(broker, batch_rows=100, linger_sec=0.05)
+        for body in broker_messages:
+            await broker.publish(body)
+        await c.start()
+        try:
+            await check(broker, c)
+        finally:
+            await c.stop()
+            await broker.close()
+
+    asyncio.run(main())
+
+
+def test_acks_after_write(db):
+    bodies = [mq.encode_rows(_rows(f"m{i}", f"n{i}")) for i in range(3)]
+
+    async def check(broker, c):
+        await _until(lambda: c.rows_written == 6)
+        assert sorted(_message(r) for r in db.written) == sorted(f"{p}{i}" for i in range(3) for p in "mn")
+        assert broker.qsize() == 0
+        assert broker.dlq == []
+        assert c.dead_lettered == 0 and c.requeued == 0
+        await _window_is_free(broker, c)
+
+    _run(bodies, check)
+
+
+def test_poison_message_is_bisected_out(db):
+    poison = mq.encode_rows(_rows("ok", "bad", "ok2"))
+    bodies = [mq.encode_rows(_rows("a")), poison, mq.encode_rows(_rows("b", "c"))]
+
+    async def check(broker, c):
+        await _until(lambda: c.dead_lettered_rows == 1 and c.rows_written == 5)
+        # only the offending row is dead-lettered; its neighbours are written
+        assert [_message(r) for body in broker.dlq for r in mq.decode_message(body)] == ["bad"]
+        assert sorted(_message(r) for r in db.written) == ["a", "b", "c", "ok", "ok2"]
+        assert c.dead_lettered == 0
+        await _window_is_free(broker, c)
+
+    _run(bodies, check)
+
+
+def test_all_bad_message_is_rejected_whole(db):
+    poison = mq.encode_rows(_rows("bad", "bad"))
+    bodies = [poison, mq.encode_rows(_rows("a"))]
+
+    async def check(broker, c):
+        await _until(lambda: c.dead_lettered == 1 and c.rows_written == 1)
+        assert broker.dlq == [poison]
+        assert c.dead_lettered_rows == 0
+        await _window_is_free(broker, c)
+
+    _run(bodies, check)
+
+
+def test_flush_hook_errors_are_counted(db):
+    def hook(rows):
+        raise RuntimeError("broken hook")
+
+    async def check(broker, c):
+        c.add_flush_hook(hook)
+        await broker.publish(mq.encode_rows(_rows("a")))
+        await _until(lambda: c.rows_written == 1)
+        # committed and acked all the same
+        assert c.hook_errors == 1
+        assert c.stats()["hook_errors"] == 1
+        await _window_is_free(broker, c)
+
+    _run([], check)
+
+
+def test_undecodable_message_is_dead_lettered(db):
+    bodies = [b"not json", mq.encode_rows(_rows("a"))]
+
+    async def check(broker, c):
+        await _until(lambda: c.dead_lettered == 1 and c.rows_written == 1)
+        assert broker.dlq == [b"not json"]
+
+    _run(bodies, check)
+
+
+def test_transient_error_requeues_and_redelivers(db):
+    db.fail_times = 1
+    bodies = [mq.encode_rows(_rows("a")), mq.encode_rows(_rows("b"))]
+
+    async def check(broker, c):
+        await _until(lambda: c.rows_written == 2)
+        assert c.write_errors == 1
+        assert c.requeued == 2
+        assert broker.dlq == []
+        # written once each after redelivery, nothing lost or duplicated
+        assert sorted(_message(r) for r in db.written) == ["a", "b"]
+
+    _run(bodies, check)
+
+
+def test_stop_during_write_settles_by_outcome(db):
+    async def main():
+        broker = mq.MemoryBroker(prefetch=8)
+        c = BrokerConsumer(broker, batch_rows=100, linger_sec=0.0)
+        db.gate = asyncio.Event()
+        await broker.publish(mq.encode_rows(_rows("a")))
+        await c.start()
+        await _until(lambda: db.calls == 1)
+        stopping = asyncio.create_task(c.stop())
+        await asyncio.sleep(0.02)
+        assert not stopping.done()  # waits for the write in flight
+        db.gate.set()
+        await stopping
+        await broker.close()
+        # committed, so acked: not requeued for a duplicate insert
+        assert [_message(r) for r in db.written] == ["a"]
+        assert c.requeued == 0
+        assert broker.qsize() == 0
+
+    asyncio.run(main())
@@ -0,0 +1,73 @@
+"""
+DedupWindow: two generations of key digests, rotated by age and by size;
+plus repo.dedup_key, which decides which events get a key at all.
+"""
+from datetime import datetime, timezone
+
+from app import dedup, repo
+from app.dedup import DedupWindow
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _window(monkeypatch, window_sec=10.0, max_keys=100):
+    clock = Clock()
+    monkeypatch.setattr(dedup.time, "monotonic", clock)
+    return DedupWindow(window_sec, max_keys), clock
+
+
+def test_seen_after_add(monkeypatch):
+    w, _ = _window(monkeypatch)
+    assert not w.seen(("t1", "e1"))
+    w.add(("t1", "e1"))
+    assert w.seen(("t1", "e1"))
+    # keys are per tenant
+    assert not w.seen(("t2", "e1"))
+    assert w.stats()["duplicates"] == 1
+
+
+def test_key_survives_one_rotation_not_two(monkeypatch):
+    w, clock = _window(monkeypatch, window_sec=10.0)
+    w.add(("t1", "old"))
+    clock.now += 6  # past window/2: next add rotates, "old" moves to previous
+    w.add(("t1", "new"))
+    assert w.seen(("t1", "old"))
+    clock.now += 6
+    w.add(("t1", "newer"))  # second rotation drops the old generation
+    assert not w.seen(("t1", "old"))
+    assert w.seen(("t1", "new"))
+    assert w.rotations == 2
+
+
+def test_size_bound_rotates_early(monkeypatch):
+    w, _ = _window(monkeypatch, window_sec=3600.0, max_keys=10)  # 5 keys per generation
+    for i in range(15):
+        w.add(("t1", str(i)))
+    assert w.stats()["keys"] <= 10
+    assert w.seen(("t1", "14"))
+    assert not w.seen(("t1", "0"))
+
+
+def test_dedup_key_uses_event_id():
+    now = datetime.now(timezone.utc)
+    assert repo.dedup_key("e1", "t1", "svc", now, "m", None) == "e1"
+    assert repo.dedup_key("e1", "t1", "svc", None, "m", None) == "e1"
+
+
+def test_content_hash_is_opt_in(monkeypatch):
+    ts = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    assert repo.dedup_key(None, "t1", "svc", ts, "m", None) is None
+
+    monkeypatch.setattr(repo, "DEDUP_CONTENT_HASH", True)
+    key = repo.dedup_key(None, "t1", "svc", ts, "m", "r1")
+    assert key.startswith("h:")
+    assert key == repo.dedup_key(None, "t1", "svc", ts, "m", "r1")
+    assert key != repo.dedup_key(None, "t1", "svc", ts, "m", "r2")
+    # a server-set timestamp differs per retry: no key
+    assert repo.dedup_key(None, "t1", "svc", None, "m", "r1") is None
@@ -0,0 +1,99 @@
+"""
+FairQueue: deficit round robin by tenant weight, and the global and
+per-tenant caps.
+"""
+import asyncio
+
+import pytest
+
+from app import repo
+from app.fairqueue import FairQueue
+
+
+def _row(tenant, message="m"):
+    return repo.dict_row(
+        {"tenantId": tenant, "source": "svc", "environment": "test", "level": "info", "type": "app", "message": message},
+        repo.utc_now(),
+    )
+
+
+def _tenant(row):
+    return row[repo.COL["tenant_id"]]
+
+
+def _limits(weights=None, queue_max=100):
+    weights = weights or {}
+    return lambda tenant: (weights.get(tenant, 1), queue_max)
+
+
+def _drain(q):
+    out = []
+    while not q.empty():
+        out.append(_tenant(q.get_nowait()))
+    return out
+
+
+def test_round_robin_between_tenants():
+    q = FairQueue(100, _limits())
+    for _ in range(3):
+        q.put_nowait(_row("a"))
+    for _ in range(3):
+        q.put_nowait(_row("b"))
+    # a noisy tenant that queued first doesn't go first in full
+    assert _drain(q) == ["a", "b", "a", "b", "a", "b"]
+
+
+def test_weights_share_turns():
+    q = FairQueue(100, _limits({"a": 3}))
+    for _ in range(6):
+        q.put_nowait(_row("a"))
+    for _ in range(2):
+        q.put_nowait(_row("b"))
+    assert _drain(q) == ["a", "a", "a", "b", "a", "a", "a", "b"]
+
+
+def test_fifo_within_a_tenant():
+    q = FairQueue(100, _limits())
+    for m in ("1", "2", "3"):
+        q.put_nowait(_row("a", m))
+    assert [q.get_nowait()[repo.COL["message"]] for _ in range(3)] == ["1", "2", "3"]
+
+
+def test_per_tenant_cap_leaves_room_for_others():
+    q = FairQueue(10, _limits(queue_max=2))
+    q.put_nowait(_row("a"))
+    q.put_nowait(_row("a"))
+    with pytest.raises(asyncio.QueueFull):
+        q.put_nowait(_row("a"))
+    assert not q.has_room("a")
+    # another tenant still gets in
+    q.put_nowait(_row("b"))
+    assert q.tenant_depths() == {"a": 2, "b": 1}
+
+    q.get_nowait()  # frees one of a's slots
+    q.put_nowait(_row("a"))
+
+
+def test_global_cap():
+    q = FairQueue(3, _limits())
+    for t in ("a", "b", "c"):
+        q.put_nowait(_row(t))
+    assert q.full()
+    with pytest.raises(asyncio.QueueFull):
+        q.put_nowait(_row("d"))
+    with pytest.raises(asyncio.QueueEmpty):
+        FairQueue(3, _limits()).get_nowait()
+
+
+def test_put_waits_for_room():
+    async def main():
+        q = FairQueue(10, _limits(queue_max=1))
+        q.put_nowait(_row("a"))
+        waiter = asyncio.create_task(q.put(_row("a", "second")))
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        assert _tenant(await q.get()) == "a"
+        await asyncio.wait_for(waiter, 1)
+        assert q.get_nowait()[repo.COL["message"]] == "second"
+
+    asyncio.run(main())
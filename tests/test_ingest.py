@@ -0,0 +1,124 @@
+"""
+Body decoding: gzip and zstd streams, the decoded-size cap (a small
+compressed body can't expand past INGEST_MAX_BODY_BYTES), NDJSON line
+splitting and the msgpack fast path.
+"""
+import asyncio
+import gzip
+import json
+from datetime import datetime, timezone
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app import ingest, repo
+
+
+def _chunks(data, size=7):
+    async def gen():
+        for i in range(0, len(data), size):
+            yield data[i:i + size]
+
+    return gen()
+
+
+def _read(data, encoding, max_bytes=1 << 20):
+    return asyncio.run(ingest.read_body(_chunks(data), encoding, max_bytes))
+
+
+def _lines(data, encoding=None, max_line=100):
+    async def collect():
+        return [line async for line in ingest.iter_lines(_chunks(data), encoding, max_line)]
+
+    return asyncio.run(collect())
+
+
+def _zstd(data):
+    zstandard = pytest.importorskip("zstandard")
+    return zstandard.ZstdCompressor().compress(data)
+
+
+BODY = b'{"message": "hello"}\n' * 50
+
+
+def test_identity_and_gzip():
+    assert _read(BODY, None) == BODY
+    assert _read(gzip.compress(BODY), "gzip") == BODY
+    assert _read(gzip.compress(BODY), "x-gzip") == BODY
+
+
+def test_zstd():
+    if ingest.zstandard is None:
+        pytest.skip("zstandard not installed")
+    assert _read(_zstd(BODY), "zstd") == BODY
+    # several frames back to back
+    assert _read(_zstd(BODY) + _zstd(b"tail"), "zstd") == BODY + b"tail"
+
+
+def test_unknown_encoding_is_415():
+    with pytest.raises(HTTPException) as exc:
+        _read(BODY, "br")
+    assert exc.value.status_code == 415
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+def test_decompression_bomb_is_413(encoding):
+    if encoding == "zstd" and ingest.zstandard is None:
+        pytest.skip("zstandard not installed")
+    bomb = b"\0" * (16 * 1024 * 1024)
+    body = gzip.compress(bomb) if encoding == "gzip" else _zstd(bomb)
+    assert len(body) < 64 * 1024
+    with pytest.raises(HTTPException) as exc:
+        _read(body, encoding, max_bytes=1024 * 1024)
+    assert exc.value.status_code == 413
+
+
+def test_lines_across_chunks():
+    data = b'{"a": 1}\n\n{"b": 2}\n{"c": 3}'  # no trailing newline
+    assert _lines(data) == [b'{"a": 1}', b"", b'{"b": 2}', b'{"c": 3}']
+    assert _lines(gzip.compress(data), "gzip") == _lines(data)
+
+
+def test_long_line_is_skipped_once():
+    data = b"ok\n" + b"x" * 250 + b"\nafter\n"
+    assert _lines(data, max_line=20) == [b"ok", None, b"after", b""]
+
+
+def _event(i=0, **kw):
+    return {"tenantId": "t1", "source": "svc", "environment": "dev", "level": "info", "type": "app", "message": f"m{i}", **kw}
+
+
+def test_msgpack_matches_json():
+    msgpack = pytest.importorskip("msgpack")
+    ts = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+    events = [_event(0, occurredAt=ts.isoformat()), _event(1, occurredAt=ts.isoformat(), traceId="tr")]
+    rows = ingest.parse_batch(json.dumps(events).encode())
+    assert [r[repo.COL["message"]] for r in rows] == ["m0", "m1"]
+    # occurredAt as a native msgpack timestamp
+    packed = msgpack.packb([{**e, "occurredAt": ts} for e in events], datetime=True)
+    assert ingest.parse_batch(packed, "application/msgpack; charset=utf-8") == rows
+
+
+def test_bad_msgpack_is_400():
+    pytest.importorskip("msgpack")
+    with pytest.raises(HTTPException) as exc:
+        ingest.parse_batch(b"\xc1", "application/msgpack")
+    assert exc.value.status_code == 400
+
+
+H = {"Authorization": "Bearer dev-token"}
+
+
+def test_http_bomb_is_413(monkeypatch):
+    from app import main
+
+    monkeypatch.setattr(main, "INGEST_MAX_BODY_BYTES", 64 * 1024)
+    body = gzip.compress(json.dumps([_event(i) for i in range(2000)]).encode())
+    r = TestClient(main.app).post(
+        "/v1/logs/batch",
+        content=body,
+        headers={**H, "Content-Type": "application/json", "Content-Encoding": "gzip"},
+    )
+    assert r.status_code == 413
+    assert "decoded" in r.json()["detail"]
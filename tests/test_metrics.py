@@ -0,0 +1,62 @@
+"""
+Prometheus text output: counters per label set, cumulative histogram
+buckets with _sum/_count, gauges read at scrape time, label escaping.
+"""
+import pytest
+
+from app import metrics
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    # keep test metrics out of the process-wide /metrics output
+    monkeypatch.setattr(metrics, "_registry", [])
+
+
+def test_counter_by_label():
+    c = metrics.Counter("t_total", "Things.", ("reason",))
+    c.inc("a")
+    c.inc("a")
+    c.inc("b", by=5)
+    assert metrics.render().splitlines() == [
+        "# HELP t_total Things.",
+        "# TYPE t_total counter",
+        't_total{reason="a"} 2',
+        't_total{reason="b"} 5',
+    ]
+
+
+def test_unlabelled_counter_starts_at_zero():
+    metrics.Counter("t_total", "Things.")
+    assert "t_total 0" in metrics.render().splitlines()
+
+
+def test_histogram_buckets_are_cumulative():
+    h = metrics.Histogram("t_seconds", "Time.", ("route",), buckets=(0.1, 1.0))
+    for v in (0.05, 0.1, 0.5, 3.0):
+        h.observe(v, "/x")
+    lines = metrics.render().splitlines()
+    assert lines[2:] == [
+        't_seconds_bucket{route="/x",le="0.1"} 2',  # upper bound is inclusive
+        't_seconds_bucket{route="/x",le="1.0"} 3',
+        't_seconds_bucket{route="/x",le="+Inf"} 4',
+        't_seconds_sum{route="/x"} 3.65',
+        't_seconds_count{route="/x"} 4',
+    ]
+
+
+def test_gauge_reads_callback_and_hides_errors():
+    depth = [3]
+    g = metrics.Gauge("t_depth", "Depth.", lambda: depth[0])
+    depth[0] = 7
+    assert "t_depth 7" in metrics.render()
+
+    g.set_function(lambda: 1 / 0)
+    # no sample, just the HELP/TYPE lines
+    assert metrics.render().splitlines() == ["# HELP t_depth Depth.", "# TYPE t_depth gauge"]
+
+
+def test_label_values_are_escaped():
+    c = metrics.Counter("t_total", "Things.", ("path",))
+    c.inc('a"b\\c\nd')
+    assert 't_total{path="a\\"b\\\\c\\nd"} 1' in metrics.render()
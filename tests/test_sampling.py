@@ -0,0 +1,87 @@
+"""
+Sampler: rules, trace-consistent keep/drop decisions, the sample_rate
+stored on kept rows, and shedding as the queue fills.
+"""
+from app import repo
+from app.sampling import SHED_START, Sampler, parse_rules, trace_fraction
+
+_I_RATE = repo.COL["sample_rate"]
+
+
+def _row(level="info", type="app", trace=None, tenant="t1", source="svc"):
+    return repo.dict_row(
+        {
+            "tenantId": tenant, "source": source, "environment": "dev", "level": level,
+            "type": type, "message": "m", "traceId": trace,
+        },
+        repo.utc_now(),
+    )
+
+
+def _sampler(*rules):
+    parsed = parse_rules(rules)
+    return Sampler(lambda: parsed, keep_levels=("error", "fatal"), keep_types=("audit",))
+
+
+def test_no_rules_no_load_keeps_everything():
+    s = _sampler()
+    row = _row()
+    assert s.admit(row, 0.0) is row
+
+
+def test_first_matching_rule_wins():
+    s = _sampler({"tenant": "t1", "level": "debug", "rate": 0.5}, {"level": "debug", "rate": 0.1})
+    assert s.base_rate(("t1", "svc", "debug", "app")) == 0.5
+    assert s.base_rate(("t2", "svc", "debug", "app")) == 0.1
+    assert s.base_rate(("t2", "svc", "info", "app")) == 1.0
+
+
+def test_trace_decides_for_all_its_events():
+    s = _sampler({"rate": 0.5})
+    traces = [f"trace-{i}" for i in range(200)]
+    first = {t: s.admit(_row(trace=t), 0.0) is not None for t in traces}
+    # same verdict for every other event of the trace, at any level
+    for t in traces:
+        assert (s.admit(_row(level="debug", trace=t), 0.0) is not None) == first[t]
+        assert (s.admit(_row(level="warn", trace=t), 0.0) is not None) == first[t]
+    assert 50 < sum(first.values()) < 150
+    assert all(0.0 <= trace_fraction(t) < 1.0 for t in traces)
+
+
+def test_kept_rows_carry_their_rate():
+    s = _sampler({"rate": 0.5})
+    kept = [r for r in (s.admit(_row(trace=f"t{i}"), 0.0) for i in range(100)) if r is not None]
+    assert kept and all(r[_I_RATE] == 0.5 for r in kept)
+    assert s.kept_sampled == len(kept)
+    assert s.dropped == 100 - len(kept)
+
+
+def test_errors_and_audit_are_never_sampled():
+    s = _sampler({"rate": 0.0})
+    for row in (_row(level="error"), _row(level="fatal"), _row(type="audit")):
+        assert s.admit(row, 1.0) is row
+
+
+def test_shedding_tightens_with_fill():
+    s = _sampler()
+    traces = [f"trace-{i}" for i in range(400)]
+
+    def kept(level, fill):
+        return sum(s.admit(_row(level=level, trace=t), fill) is not None for t in traces)
+
+    start = SHED_START["info"]
+    assert kept("info", start) == len(traces)  # not shedding yet
+    halfway = kept("info", (start + 1.0) / 2)
+    assert 100 < halfway < 300
+    assert kept("info", 0.99) < halfway
+    assert kept("info", 1.0) == 0
+    # debug goes first: at the same fill it is shed harder than info
+    assert kept("debug", (start + 1.0) / 2) < halfway
+
+
+def test_shed_rows_store_the_combined_rate():
+    s = _sampler({"rate": 0.5})
+    start = SHED_START["info"]
+    fill = (start + 1.0) / 2  # shed factor 0.5
+    kept = [r for r in (s.admit(_row(trace=f"t{i}"), fill) for i in range(200)) if r is not None]
+    assert kept and all(abs(r[_I_RATE] - 0.25) < 1e-9 for r in kept)
@@ -0,0 +1,102 @@
+"""
+TailHub fan-out: per-tenant filters, one encoding shared by every match,
+ring-buffer overflow reported as lag, slow subscribers dropped, and the
+server-sent event stream.
+"""
+import asyncio
+import json
+
+from app import repo, tail
+from app.tail import Subscriber, TailHub
+
+
+def _row(message="m", tenant="t1", source="svc", level="info", trace=None):
+    return repo.dict_row(
+        {
+            "tenantId": tenant, "source": source, "environment": "test", "level": level, "type": "app",
+            "message": message, "traceId": trace, "properties": {"k": 1},
+        },
+        repo.utc_now(),
+    )
+
+
+def _messages(sub):
+    return [json.loads(d)["message"] for d in sub.buf]
+
+
+def test_filters_and_tenants():
+    hub = TailHub()
+    everything = Subscriber("t1")
+    errors = Subscriber("t1", level="error")
+    trace = Subscriber("t1", trace_id="tr")
+    other = Subscriber("t2")
+    for sub in (everything, errors, trace, other):
+        hub.subscribe(sub)
+
+    hub.publish([_row("a"), _row("b", level="error"), _row("c", trace="tr"), _row("d", tenant="t3")])
+    assert _messages(everything) == ["a", "b", "c"]
+    assert _messages(errors) == ["b"]
+    assert _messages(trace) == ["c"]
+    assert _messages(other) == []
+    assert hub.stats()["published"] == 3
+
+
+def test_event_json_is_api_shaped():
+    d = json.loads(tail.event_json(_row("a")))
+    assert d["tenantId"] == "t1" and d["message"] == "a"
+    assert d["properties"] == {"k": 1}
+    assert "traceId" not in d  # nulls left out
+
+
+def test_shared_encoding():
+    hub = TailHub()
+    a, b = Subscriber("t1"), Subscriber("t1")
+    hub.subscribe(a)
+    hub.subscribe(b)
+    hub.publish([_row()])
+    assert a.buf[0] is b.buf[0]
+
+
+def test_overflow_counts_missed_then_drops(monkeypatch):
+    monkeypatch.setattr(tail, "TAIL_DROP_AFTER", 5)
+    hub = TailHub()
+    sub = Subscriber("t1", buffer=3)
+    hub.subscribe(sub)
+
+    hub.publish([_row(str(i)) for i in range(5)])
+    assert _messages(sub) == ["2", "3", "4"]  # oldest overwritten
+    assert sub.missed == 2 and not sub.dropped
+
+    hub.publish([_row(str(i)) for i in range(5, 8)])
+    assert sub.dropped
+    assert hub.stats()["subscribers"] == 0
+    assert hub.stats()["dropped_subscribers"] == 1
+
+
+def test_max_subscribers():
+    hub = TailHub(max_subscribers=1)
+    sub = Subscriber("t1")
+    hub.subscribe(sub)
+    assert hub.full()
+    hub.unsubscribe(sub)
+    hub.unsubscribe(sub)  # twice is harmless
+    assert not hub.full()
+
+
+def test_stream_sends_lag_then_events():
+    async def main():
+        hub = TailHub()
+        sub = Subscriber("t1", buffer=2)
+        stream = hub.stream(sub)
+        assert await stream.__anext__() == b": tailing\n\n"
+        assert hub.stats()["subscribers"] == 1
+
+        hub.publish([_row("a"), _row("b"), _row("c")])
+        assert await stream.__anext__() == b'event: lag\ndata: {"missed":1}\n\n'
+        data = await stream.__anext__()
+        assert [json.loads(line[6:])["message"] for line in data.split(b"\n\n") if line] == ["b", "c"]
+
+        await stream.aclose()
+        assert hub.stats()["subscribers"] == 0
+
+    asyncio.run(main())
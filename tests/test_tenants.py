@@ -0,0 +1,114 @@
+"""
+Per-tenant limits: TenantLimits from a JSON file, the token-bucket
+RateLimiter, and the 429 (Retry-After) / 413 answers of the ingest routes.
+"""
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import tenants
+from app.tenants import RateLimiter, TenantLimits
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(tenants.time, "monotonic", c)
+    return c
+
+
+def _limits(tmp_path, cfg):
+    path = tmp_path / "limits.json"
+    path.write_text(json.dumps(cfg))
+    return TenantLimits(str(path))
+
+
+def test_limits_file(tmp_path):
+    limits = _limits(tmp_path, {
+        "default": {"rate": 10},
+        "tenants": {"big": {"rate": 100, "burst": 500, "weight": 4, "queue_max": 7}},
+    })
+    assert (limits.get("other").rate, limits.get("other").burst) == (10, 10)  # burst defaults to rate
+    big = limits.get("big")
+    assert (big.rate, big.burst, big.weight, big.queue_max) == (100, 500, 4, 7)
+
+
+def test_bad_limits_file_keeps_old_limits(tmp_path):
+    limits = _limits(tmp_path, {"default": {"rate": 10}})
+    (tmp_path / "limits.json").write_text("{not json")
+    limits._mtime = None  # force a re-read
+    assert not limits.maybe_reload()
+    assert limits.reload_errors == 1
+    assert limits.get("t").rate == 10
+
+
+def test_bucket_allows_burst_then_asks_to_wait(tmp_path, clock):
+    rl = RateLimiter(_limits(tmp_path, {"default": {"rate": 2, "burst": 4}}))
+    assert rl.take({"t": 3}) is None
+    assert rl.take({"t": 1}) is None
+    # empty: 2 tokens short at 2/s
+    assert rl.take({"t": 2}) == ("t", 1)
+    clock.now += 1.0
+    assert rl.take({"t": 2}) is None
+    assert rl.stats()["limited"] == 1
+
+
+def test_more_than_burst_can_never_fit(tmp_path, clock):
+    rl = RateLimiter(_limits(tmp_path, {"default": {"rate": 2, "burst": 4}}))
+    assert rl.take({"t": 5}) == ("t", None)
+    # and it did not use up the bucket
+    assert rl.take({"t": 4}) is None
+
+
+def test_take_is_all_or_nothing(tmp_path, clock):
+    rl = RateLimiter(_limits(tmp_path, {
+        "default": {"rate": 10},
+        "tenants": {"slow": {"rate": 1, "burst": 1}},
+    }))
+    assert rl.take({"fast": 5, "slow": 2}) == ("slow", None)
+    assert rl.take({"fast": 10}) is None  # fast's tokens were not taken
+
+
+def test_unlimited_by_default(tmp_path, clock):
+    rl = RateLimiter(_limits(tmp_path, {}))
+    assert rl.take({"t": 1_000_000}) is None
+
+
+@pytest.fixture
+def client(tmp_path, clock, monkeypatch):
+    from app import main
+
+    limits = _limits(tmp_path, {"default": {"rate": 1, "burst": 2}})
+    monkeypatch.setattr(main, "rate_limiter", RateLimiter(limits))
+    # no lifespan: nothing is flushed, rows just queue up
+    return TestClient(main.app)
+
+
+def _event(i=0):
+    return {"tenantId": "t1", "source": "svc", "environment": "dev", "level": "info", "type": "app", "message": f"m{i}"}
+
+
+H = {"Authorization": "Bearer dev-token"}
+
+
+def test_http_429_with_retry_after(client):
+    assert client.post("/v1/logs/batch", json=[_event(0), _event(1)], headers=H).status_code == 202
+    r = client.post("/v1/logs", json=_event(2), headers=H)
+    assert r.status_code == 429
+    assert r.headers["Retry-After"] == "1"
+
+
+def test_http_413_when_batch_exceeds_burst(client):
+    r = client.post("/v1/logs/batch", json=[_event(i) for i in range(3)], headers=H)
+    assert r.status_code == 413
+    assert "burst" in r.json()["detail"]
+    assert "Retry-After" not in r.headers